@@ -0,0 +1,67 @@
+""" Micro-benchmark of the collision engines of `FlappyBirdLogic`.
+
+Plays the same games (same pipes and actions) with each collision engine,
+pinned to a single core, and reports how many `check_crash` and
+`update_state` calls per second each engine achieves.
+
+Usage:
+    python -m benchmarks.collision [--steps 200000]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from flappy_bird_gym.envs.game_logic import COLLISION_MODES
+from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+
+
+def _play(collision_mode: str, steps: int, seed: int = 0):
+    """ Plays games until `steps` frames are run. Returns the time spent in
+    `check_crash`, the total time and the number of crashes. """
+    rng = np.random.default_rng(seed)
+    game = FlappyBirdLogic(screen_size=(288, 512), rng=rng,
+                           collision_mode=collision_mode)
+    crash_time = total_time = 0.0
+    crashes = 0
+    for _ in range(steps):
+        # simple agent: flaps when below the next gap
+        next_gap = next(lower_y for pipe_x, _, lower_y in game.pipes
+                        if pipe_x + 52 >= game.player_x)
+        action = int(game.player_y + 36 > next_gap)
+
+        t0 = time.perf_counter()
+        game.check_crash()
+        t1 = time.perf_counter()
+        alive = game.update_state(action)
+        t2 = time.perf_counter()
+
+        crash_time += t1 - t0
+        total_time += t2 - t1
+        if not alive:
+            crashes += 1
+            game = FlappyBirdLogic(screen_size=(288, 512), rng=rng,
+                                   collision_mode=collision_mode)
+    return crash_time, total_time, crashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    print(f"{'engine':<12}{'check_crash/s':>16}{'update_state/s':>16}"
+          f"{'crashes':>10}")
+    for mode in COLLISION_MODES:
+        crash_time, total_time, crashes = _play(mode, args.steps)
+        print(f"{mode:<12}{args.steps / crash_time:>16,.0f}"
+              f"{args.steps / total_time:>16,.0f}{crashes:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+""" Benchmark of the time it takes to import `flappy_bird_gym`.
+
+Each measurement runs in a fresh Python process (as a training worker would),
+so nothing is cached between them. Reports the median wall time of:
+
+    * importing the package;
+    * importing the package and creating/stepping a simple env;
+    * importing the package and loading the RGB env (which imports pygame).
+
+It also checks that the first two work with pygame absent.
+
+Usage:
+    python -m benchmarks.import_time [--runs 10]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+#: Makes `import pygame` fail, as if pygame wasn't installed.
+_BLOCK_PYGAME = "import sys; sys.modules['pygame'] = None\n"
+
+_CASES = {
+    "import": (
+        "import flappy_bird_gym\n"
+    ),
+    "import + simple env step": (
+        "import flappy_bird_gym\n"
+        "env = flappy_bird_gym.FlappyBirdEnvFourObservations()\n"
+        "env.reset()\n"
+        "env.step(0)\n"
+    ),
+    "import + RGB env": (
+        "import flappy_bird_gym\n"
+        "flappy_bird_gym.FlappyBirdEnvRGB\n"
+    ),
+}
+
+_TIMER = (
+    "import time\n"
+    "_t0 = time.perf_counter()\n"
+    "{code}"
+    "print(time.perf_counter() - _t0)\n"
+    "print('pygame' in sys.modules and sys.modules['pygame'] is not None)\n"
+)
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-W", "ignore", "-c", code],
+                          capture_output=True, text=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'case':<28}{'median (ms)':>12}{'pygame loaded':>15}"
+          f"{'works without pygame':>22}")
+    for name, code in _CASES.items():
+        times = []
+        loaded = False
+        for _ in range(args.runs):
+            proc = _run("import sys\n" + _TIMER.format(code=code))
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr)
+            elapsed, loaded = proc.stdout.split()[-2:]
+            times.append(float(elapsed))
+
+        without_pygame = _run(_BLOCK_PYGAME + code).returncode == 0
+        print(f"{name:<28}{1000 * statistics.median(times):>12.1f}"
+              f"{loaded:>15}{str(without_pygame):>22}")
+
+
+if __name__ == "__main__":
+    main()
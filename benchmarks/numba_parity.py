@@ -0,0 +1,199 @@
+""" Parity check and benchmark of the Numba backend of the game logic.
+
+Plays the same games (same seeds and actions) with the kernels of
+`flappy_bird_gym.envs.numba_backend` and with the reference logic, and checks,
+after every step, that the states, observations, rewards and done flags are
+equal:
+
+    * single game: `FlappyBirdNumbaBatchLogic.update_state` (one game) against
+      `FlappyBirdLogic.update_state`;
+    * batched ticks: `FlappyBirdNumbaBatchLogic.update_state` (with random
+      masks, and game parameters changed halfway) against
+      `FlappyBirdBatchLogic.update_state`;
+    * vector environment steps: `FlappyBirdVecEnv*(backend="numba")` against
+      the same environments with `backend="numpy"`, with and without frame
+      skipping and with extra lookahead pipes.
+
+Without Numba, the kernels run as plain Python (the parity checks still hold,
+but slowly, so use fewer steps) and the vector environments are checked by
+driving the kernels directly. Then, the steps per second of both backends are
+reported.
+
+Usage:
+    python -m benchmarks.numba_parity [--steps 2000] [--num-envs 64]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from flappy_bird_gym.envs import flappy_bird_vec_env
+from flappy_bird_gym.envs import numba_backend
+from flappy_bird_gym.envs.batch_logic import FlappyBirdBatchLogic
+from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+from flappy_bird_gym.envs.numba_backend import FlappyBirdNumbaBatchLogic
+
+#: Vector environments checked against the kernels.
+VEC_ENVS = (
+    flappy_bird_vec_env.FlappyBirdVecEnvSimple,
+    flappy_bird_vec_env.FlappyBirdVecEnvAdvance,
+    flappy_bird_vec_env.FlappyBirdVecEnvThreeObservations,
+    flappy_bird_vec_env.FlappyBirdVecEnvFourObservations,
+    flappy_bird_vec_env.FlappyBirdVecEnvFourObsSparse,
+)
+
+#: State arrays compared between the batched logics.
+BATCH_STATE = ("player_y", "player_vel_y", "player_rot", "player_idx",
+               "base_x", "score", "pipe_x", "upper_pipe_y", "lower_pipe_y",
+               "pipe_head", "pipe_count", "next_pipe", "alive", "scored",
+               "last_action")
+
+
+def _actions(rng: np.random.Generator, obs: np.ndarray) -> np.ndarray:
+    """ Flaps when below the next gap (or, sometimes, at random). """
+    return ((obs[:, 1] < -0.05) | (rng.random(len(obs)) < 0.05)).astype(
+        np.int64)
+
+
+def check_single_game(steps: int, seed: int = 0) -> None:
+    """ Checks a single game of the kernels against `FlappyBirdLogic`. """
+    rng = np.random.default_rng(seed)
+    reference = FlappyBirdLogic(screen_size=(288, 512), seed=seed)
+    game = FlappyBirdNumbaBatchLogic(num_games=1, seed=seed)
+    for step in range(steps):
+        action = int(rng.random() < 0.08)
+        alive = reference.update_state(action)
+        assert alive == game.update_state(action)[0], step
+
+        pipes = reference.pipes
+        slots = game.pipe_slot(np.arange(game.pipe_count[0]))
+        assert (reference.player_y, reference.player_vel_y,
+                reference.player_rot, reference.player_idx,
+                reference.base_x, reference.score, reference.next_pipe) == (
+            game.player_y[0], game.player_vel_y[0], game.player_rot[0],
+            game.player_idx[0], game.base_x[0], game.score[0],
+            game.next_pipe[0]), step
+        assert list(pipes) == list(zip(game.pipe_x[0, slots],
+                                       game.upper_pipe_y[0, slots],
+                                       game.lower_pipe_y[0, slots])), step
+        if not alive:
+            reference = FlappyBirdLogic(screen_size=(288, 512),
+                                        seed=seed + step)
+            game = FlappyBirdNumbaBatchLogic(num_games=1, seed=seed + step)
+
+
+def check_batch(steps: int, num_games: int, seed: int = 0) -> None:
+    """ Checks the batched ticks of the kernels against
+    `FlappyBirdBatchLogic`. """
+    rng = np.random.default_rng(seed)
+    reference = FlappyBirdBatchLogic(num_games=num_games, seed=seed)
+    game = FlappyBirdNumbaBatchLogic(num_games=num_games, seed=seed)
+    for step in range(steps):
+        if step == steps // 2:
+            # (a new gap size for all the games, and per-game physics)
+            params = {"pipe_gap_size": 120,
+                      "pipe_vel_x": -rng.integers(2, 8, size=num_games),
+                      "player_acc_y": rng.integers(1, 3, size=num_games)}
+            reference.set_params(**params)
+            game.set_params(**params)
+
+        actions = (rng.random(num_games) < 0.08).astype(np.int64)
+        mask = rng.random(num_games) < 0.9 if step % 2 else None
+        assert (reference.update_state(actions, mask)
+                == game.update_state(actions, mask)).all(), step
+        for name in BATCH_STATE:
+            assert np.array_equal(getattr(reference, name),
+                                  getattr(game, name)), (step, name)
+
+        done = ~reference.alive
+        reference.reset(done)
+        game.reset(done)
+
+
+def check_vec_env(env_cls: type,
+                  steps: int,
+                  num_envs: int,
+                  frame_skip: int,
+                  lookahead_pipes: int = 0,
+                  seed: int = 0) -> None:
+    """ Checks the steps of a vector environment with the "numba" backend
+    against the "numpy" backend. Without Numba, the kernels are driven
+    directly, as the environment would. """
+    rng = np.random.default_rng(seed)
+    reference = env_cls(num_envs=num_envs, frame_skip=frame_skip,
+                        lookahead_pipes=lookahead_pipes)
+    obs = reference.reset(seed=seed)
+    if numba_backend.NUMBA_AVAILABLE:
+        env = env_cls(num_envs=num_envs, frame_skip=frame_skip,
+                      backend="numba", lookahead_pipes=lookahead_pipes)
+        assert np.array_equal(obs, env.reset(seed=seed))
+    else:
+        game = FlappyBirdNumbaBatchLogic(num_games=num_envs, seed=seed)
+        features = numba_backend.feature_codes(reference.features)
+        kernel_obs = np.zeros_like(obs)
+        game.observe(kernel_obs, features)
+        assert np.array_equal(obs, kernel_obs)
+
+    for step in range(steps):
+        actions = _actions(rng, obs)
+        obs, rewards, dones, info = reference.step(actions)
+        if numba_backend.NUMBA_AVAILABLE:
+            result = env.step(actions)
+        else:
+            kernel_rewards, kernel_dones = game.step(
+                actions, kernel_obs, features, env_cls.kernel_reward,
+                frame_skip=frame_skip)
+            score = game.score.copy()
+            if kernel_dones.any():
+                game.reset(kernel_dones)
+                game.observe(kernel_obs, features, mask=kernel_dones)
+            result = (kernel_obs, kernel_rewards, kernel_dones,
+                      {"score": score})
+
+        assert np.array_equal(obs, result[0]), (env_cls.__name__, step)
+        assert np.array_equal(rewards, result[1]), (env_cls.__name__, step)
+        assert np.array_equal(dones, result[2]), (env_cls.__name__, step)
+        assert np.array_equal(info["score"], result[3]["score"]), step
+
+
+def _steps_per_sec(backend: str, steps: int, num_envs: int) -> float:
+    """ Returns the game steps per second of a vector environment. """
+    env = flappy_bird_vec_env.FlappyBirdVecEnvFourObservations(
+        num_envs=num_envs, backend=backend)
+    rng = np.random.default_rng(0)
+    obs = env.reset(seed=0)
+    env.step(_actions(rng, obs))  # (compiles the kernels)
+    start = time.perf_counter()
+    for _ in range(steps):
+        obs = env.step(_actions(rng, obs))[0]
+    return steps * num_envs / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--num-envs", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"Numba available: {numba_backend.NUMBA_AVAILABLE}")
+    check_single_game(args.steps)
+    print("single game: OK")
+    check_batch(args.steps, args.num_envs)
+    print("batched ticks: OK")
+    for env_cls in VEC_ENVS:
+        for frame_skip in (1, 3):
+            check_vec_env(env_cls, args.steps // 4, args.num_envs,
+                          frame_skip)
+        check_vec_env(env_cls, args.steps // 4, args.num_envs,
+                      frame_skip=1, lookahead_pipes=2)
+        print(f"{env_cls.__name__}: OK")
+
+    if numba_backend.NUMBA_AVAILABLE:
+        for backend in numba_backend.BACKENDS:
+            rate = _steps_per_sec(backend, args.steps, args.num_envs)
+            print(f"{backend:<8}{rate:>14,.0f} steps/s")
+
+
+if __name__ == "__main__":
+    main()
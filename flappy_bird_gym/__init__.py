@@ -1,4 +1,9 @@
 """ Registers the gym environments and exports the `gym.make` function.
+
+Importing this package doesn't import pygame: the environments that yield
+simple observations run without it. The RGB environment and the original game,
+which need pygame, are only imported when they're first accessed (e.g. through
+`flappy_bird_gym.FlappyBirdEnvRGB` or `gym.make("FlappyBird-rgb-v0")`).
 """
 
 # Silencing pygame:
@@ -11,10 +16,12 @@ from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvAdvance
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvThreeObservations
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvFourObservations
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvFourObsSparse
-from flappy_bird_gym.envs.flappy_bird_env_rgb import FlappyBirdEnvRGB
-
-# Exporting original game:
-from flappy_bird_gym import original_game
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvSimple
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvAdvance
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvThreeObservations
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvFourObservations
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvFourObsSparse
+from flappy_bird_gym.envs.flappy_bird_vec_env_rgb import FlappyBirdVecEnvRGB
 
 # Exporting gym.make:
 from gym import make
@@ -53,6 +60,38 @@ register(
     entry_point="flappy_bird_gym:FlappyBirdEnvRGB",
 )
 
+# Vectorized environments (`num_envs` games stepped by a single call):
+register(
+    id="FlappyBird-vec-v0",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvSimple",
+)
+
+register(
+    id="FlappyBird-vec-v1",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvAdvance",
+)
+
+register(
+    id="FlappyBird-vec-v2",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvThreeObservations",
+)
+
+register(
+    id="FlappyBird-vec-v3",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvFourObservations",
+)
+
+register(
+    id="FlappyBird-vec-v4",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvFourObsSparse",
+)
+
+# (the games are run by worker processes, which render into shared memory)
+register(
+    id="FlappyBird-rgb-vec-v0",
+    entry_point="flappy_bird_gym:FlappyBirdVecEnvRGB",
+)
+
 # Main names:
 __all__ = [
     make.__name__,
@@ -61,5 +100,22 @@ __all__ = [
     FlappyBirdEnvThreeObservations.__name__,
     FlappyBirdEnvFourObservations.__name__,
     FlappyBirdEnvFourObsSparse.__name__,
-    FlappyBirdEnvRGB.__name__,
+    "FlappyBirdEnvRGB",
+    FlappyBirdVecEnvSimple.__name__,
+    FlappyBirdVecEnvAdvance.__name__,
+    FlappyBirdVecEnvThreeObservations.__name__,
+    FlappyBirdVecEnvFourObservations.__name__,
+    FlappyBirdVecEnvFourObsSparse.__name__,
+    FlappyBirdVecEnvRGB.__name__,
 ]
+
+
+def __getattr__(name):
+    # Lazily exporting the RGB environment and the original game:
+    if name == "FlappyBirdEnvRGB":
+        from flappy_bird_gym.envs.flappy_bird_env_rgb import FlappyBirdEnvRGB
+        return FlappyBirdEnvRGB
+    if name == "original_game":
+        import importlib
+        return importlib.import_module("flappy_bird_gym.original_game")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,6 @@
+""" Runs the command line interface (`python -m flappy_bird_gym`). """
+
+from flappy_bird_gym.cli import main
+
+if __name__ == "__main__":
+    main()
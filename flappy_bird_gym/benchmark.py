@@ -0,0 +1,412 @@
+""" Throughput benchmark suite of the game's logic, environments and renderer.
+
+Runs each target for a fixed number of steps and reports the steps per second
+and the per-step latency percentiles it achieves when run:
+
+    * "single": by a single worker;
+    * "threads": by N threads of the same process, each with its own copy of
+      the target;
+    * "processes": by N processes, each with its own copy of the target.
+
+The available targets are:
+
+    * "logic": :meth:`.FlappyBirdLogic.update_state`;
+    * "logic_rect" and "logic_pixel": the same, with the "rect" (bounding
+      boxes checked by `pygame.Rect`) and "pixel" (pixel-perfect hitmasks)
+      collision modes;
+    * each registered environment ID (e.g. "FlappyBird-v3"): the environment's
+      `step` method (vector environments are created with `num_envs` games);
+    * "draw_surface": :meth:`.FlappyBirdRenderer.draw_surface`;
+    * "array3d": extraction of the rendered surface as an array, with
+      `pygame.surfarray.array3d`;
+    * "array_renderer": :meth:`.FlappyBirdArrayRenderer.draw_batch`, drawing
+      the `num_envs` games of a :class:`.FlappyBirdBatchLogic` at once.
+
+Only the timed call is measured: the actions are drawn beforehand and the
+games are reset (and, for the renderer targets, advanced) outside of it, and
+the steps per second are computed from the timed calls alone (the wall-clock
+throughput, which includes the rest, is reported separately). Each worker
+first runs a few untimed steps, so that one-off costs (e.g. lazy imports and
+caches) aren't measured. The results can be saved as JSON, to be compared
+between versions.
+
+Usage:
+    flappy_bird_gym bench [--targets logic FlappyBird-v3] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+#: Names of the targets that aren't environments.
+CORE_TARGETS = ("logic", "logic_rect", "logic_pixel", "draw_surface", "array3d",
+                "array_renderer")
+
+#: Ways of running the targets.
+CONFIGS = ("single", "threads", "processes")
+
+#: Latency percentiles reported for each run.
+PERCENTILES = (50, 90, 99)
+
+#: Number of untimed steps each worker runs before the timed ones.
+WARMUP_STEPS = 10
+
+#: Probability of the random actions being "flap".
+_FLAP_PROB = 1 / 8
+
+
+def registered_env_ids() -> List[str]:
+    """ Returns the IDs of the environments registered by this package. """
+    import flappy_bird_gym  # (registers the environments)
+    from gym.envs.registration import registry
+
+    specs = registry.values() if isinstance(registry, dict) else registry.all()
+    return [spec.id for spec in specs
+            if str(spec.entry_point).startswith("flappy_bird_gym")]
+
+
+class _Target:
+    """ Something to benchmark. :meth:`step` is the timed call; :meth:`prepare`
+    and :meth:`reset` run outside of the timing. """
+
+    #: Number of games advanced by each call to :meth:`step`.
+    games_per_step = 1
+
+    def prepare(self, action: Any) -> bool:
+        """ Runs before each step. Returns `True` if the game must be reset.
+        """
+        return False
+
+    def step(self, action: Any) -> bool:
+        """ The benchmarked call. Returns `True` if the game must be reset. """
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """ Starts a new game. """
+
+
+class _LogicTarget(_Target):
+    def __init__(self, seed: int, collision_mode: str = "arithmetic") -> None:
+        from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+        self._logic_cls = FlappyBirdLogic
+        self._collision_mode = collision_mode
+        self._rng = np.random.default_rng(seed)
+        self.reset()
+
+    def step(self, action: int) -> bool:
+        return not self.game.update_state(action)
+
+    def reset(self) -> None:
+        self.game = self._logic_cls(screen_size=(288, 512), rng=self._rng,
+                                    collision_mode=self._collision_mode)
+
+
+class _EnvTarget(_Target):
+    def __init__(self, env_id: str, seed: int, num_envs: int) -> None:
+        from gym.envs.registration import load, registry
+        import flappy_bird_gym  # (registers the environments)
+
+        spec = (registry[env_id] if isinstance(registry, dict)
+                else registry.spec(env_id))
+        env_cls = load(spec.entry_point)
+        kwargs = dict(spec.kwargs or {})
+        self.vectorized = hasattr(env_cls, "step_async")
+        if self.vectorized:
+            kwargs["num_envs"] = num_envs
+            self.games_per_step = num_envs
+
+        # (instantiated directly, to measure the environment without the
+        # wrappers added by `gym.make`)
+        self.env = env_cls(**kwargs)
+        self.env.seed(seed)
+        self.env.reset()
+
+    def step(self, action: Any) -> bool:
+        done = self.env.step(action)[2]
+        return False if self.vectorized else done  # (auto-reset)
+
+    def reset(self) -> None:
+        self.env.reset()
+
+
+class _DrawSurfaceTarget(_Target):
+    def __init__(self, seed: int) -> None:
+        from flappy_bird_gym.envs.renderer import FlappyBirdRenderer
+        self._logic = _LogicTarget(seed)
+        self.renderer = FlappyBirdRenderer(audio_on=False)
+        self.renderer.game = self._logic.game
+
+    def prepare(self, action: int) -> bool:
+        return self._logic.step(action)
+
+    def step(self, action: int) -> bool:
+        self.renderer.draw_surface(show_score=True)
+        return False
+
+    def reset(self) -> None:
+        self._logic.reset()
+        self.renderer.game = self._logic.game
+
+
+class _Array3dTarget(_DrawSurfaceTarget):
+    def __init__(self, seed: int) -> None:
+        super().__init__(seed)
+        from pygame import surfarray
+        self._array3d = surfarray.array3d
+
+    def prepare(self, action: int) -> bool:
+        done = super().prepare(action)
+        self.renderer.draw_surface(show_score=True)
+        return done
+
+    def step(self, action: int) -> bool:
+        self._array3d(self.renderer.surface)
+        return False
+
+
+class _ArrayRendererTarget(_Target):
+    def __init__(self, seed: int, num_envs: int) -> None:
+        from flappy_bird_gym.envs.array_renderer import FlappyBirdArrayRenderer
+        from flappy_bird_gym.envs.batch_logic import FlappyBirdBatchLogic
+        self.games_per_step = num_envs
+        self._batch = FlappyBirdBatchLogic(num_envs, seed=seed)
+        self.renderer = FlappyBirdArrayRenderer()
+        self._out = np.empty((num_envs, *self.renderer.frame_shape),
+                             dtype=np.uint8)
+
+    def prepare(self, action: np.ndarray) -> bool:
+        alive = self._batch.update_state(action)
+        self._batch.reset(~alive)
+        return False
+
+    def step(self, action: np.ndarray) -> bool:
+        self.renderer.draw_batch(self._batch, self._out)
+        return False
+
+
+def _make_target(name: str, seed: int, num_envs: int) -> _Target:
+    if name == "logic":
+        return _LogicTarget(seed)
+    if name in ("logic_rect", "logic_pixel"):
+        return _LogicTarget(seed, collision_mode=name[len("logic_"):])
+    if name == "draw_surface":
+        return _DrawSurfaceTarget(seed)
+    if name == "array3d":
+        return _Array3dTarget(seed)
+    if name == "array_renderer":
+        return _ArrayRendererTarget(seed, num_envs)
+    return _EnvTarget(name, seed, num_envs)
+
+
+def _run_worker(name: str,
+                steps: int,
+                seed: int,
+                num_envs: int) -> Dict[str, Any]:
+    """ Runs a target for :data:`WARMUP_STEPS` untimed steps, then for
+    `steps` timed steps. Returns the latencies of the timed steps (in
+    nanoseconds), the start and end times of the timed run and the number of
+    games advanced per step. """
+    target = _make_target(name, seed, num_envs)
+    rng = np.random.default_rng(seed)
+    total_steps = WARMUP_STEPS + steps
+    if target.games_per_step > 1:
+        actions = (rng.random((total_steps, target.games_per_step))
+                   < _FLAP_PROB).astype(np.int64)
+    else:
+        actions = (rng.random(total_steps) < _FLAP_PROB).tolist()
+
+    prepare, step = target.prepare, target.step
+    for i in range(WARMUP_STEPS):
+        action = actions[i]
+        if prepare(action) | step(action):
+            target.reset()
+
+    latencies = np.empty(steps, dtype=np.int64)
+    clock = time.perf_counter_ns
+    start = time.monotonic()
+    for i in range(steps):
+        action = actions[WARMUP_STEPS + i]
+        done = prepare(action)
+        t0 = clock()
+        done |= step(action)
+        latencies[i] = clock() - t0
+        if done:
+            target.reset()
+    end = time.monotonic()
+
+    return {"latencies": latencies, "start": start, "end": end,
+            "games_per_step": target.games_per_step}
+
+
+def run_benchmark(name: str,
+                  config: str,
+                  steps: int,
+                  workers: int,
+                  num_envs: int,
+                  seed: int = 0) -> Dict[str, Any]:
+    """ Benchmarks a target in the given configuration.
+
+    Args:
+        name (str): Name of the target (see :data:`CORE_TARGETS` and
+            :func:`registered_env_ids`).
+        config (str): One of :data:`CONFIGS`.
+        steps (int): Number of steps run by each worker.
+        workers (int): Number of threads or processes (ignored by the "single"
+            configuration).
+        num_envs (int): Number of games of the vector environments.
+        seed (int): Seed of the first worker (the others use the next seeds).
+
+    Returns:
+        A dictionary with the total steps per second (`"steps_per_sec"`, the
+        sum of the workers' steps per second of timed calls), the games
+        advanced per second (`"games_per_sec"`), the steps per second of wall
+        clock time, including the untimed work between the steps
+        (`"wall_steps_per_sec"`), and the latencies of the steps, in
+        microseconds (`"latency_us"`, with the mean, the percentiles of
+        :data:`PERCENTILES` and the maximum).
+    """
+    if config not in CONFIGS:
+        raise ValueError(f"Invalid configuration: \"{config}\"! "
+                         f"Available configurations: {CONFIGS}.")
+
+    num_workers = 1 if config == "single" else workers
+    args = [(name, steps, seed + i, num_envs) for i in range(num_workers)]
+    if config == "single":
+        results = [_run_worker(*args[0])]
+    else:
+        executor_cls = (ThreadPoolExecutor if config == "threads"
+                        else ProcessPoolExecutor)
+        with executor_cls(max_workers=num_workers) as executor:
+            futures = [executor.submit(_run_worker, *a) for a in args]
+            results = [f.result() for f in futures]
+
+    # (each worker's throughput is measured over its own timed calls, and
+    # the workers run concurrently, so their throughputs add up)
+    steps_per_sec = sum(len(r["latencies"]) / (r["latencies"].sum() / 1e9)
+                        for r in results)
+    latencies = np.concatenate([r["latencies"] for r in results]) / 1000
+    elapsed = (max(r["end"] for r in results)
+               - min(r["start"] for r in results))
+    latency_us = {"mean": float(latencies.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        latency_us[f"p{p}"] = float(value)
+    latency_us["max"] = float(latencies.max())
+
+    return {
+        "target": name,
+        "config": config,
+        "workers": num_workers,
+        "steps": len(latencies),
+        "games_per_step": results[0]["games_per_step"],
+        "steps_per_sec": steps_per_sec,
+        "games_per_sec": steps_per_sec * results[0]["games_per_step"],
+        "wall_steps_per_sec": len(latencies) / elapsed,
+        "latency_us": latency_us,
+    }
+
+
+def _system_info() -> Dict[str, Any]:
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module in ("gym", "pygame"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """ Adds the benchmark's command line arguments to the given parser. """
+    parser.add_argument(
+        "--targets", nargs="+", default=None,
+        help="Targets to benchmark: \"logic\", \"draw_surface\", \"array3d\" "
+             "and/or environment IDs. Defaults to all of them.",
+    )
+    parser.add_argument(
+        "--configs", nargs="+", default=list(CONFIGS), choices=CONFIGS,
+        help="Ways of running the targets.",
+    )
+    parser.add_argument(
+        "--steps", type=int, default=5000,
+        help="Number of steps run by each worker.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Number of threads/processes of the multi-worker configurations.",
+    )
+    parser.add_argument(
+        "--num-envs", type=int, default=64,
+        help="Number of games of the vector environments.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", type=str, default=None, metavar="PATH",
+        help="Saves the results as JSON to the given path (\"-\" for stdout).",
+    )
+
+
+def main(args: Optional[argparse.Namespace] = None) -> List[Dict[str, Any]]:
+    """ Runs the benchmark suite with the parsed command line arguments and
+    returns the results. """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_arguments(parser)
+        args = parser.parse_args()
+
+    targets = args.targets or [*CORE_TARGETS[:3], *registered_env_ids(),
+                               *CORE_TARGETS[3:]]
+    to_stdout = args.json == "-"
+    out = sys.stderr if to_stdout else sys.stdout
+
+    print(f"{'target':<22}{'config':<11}{'steps/s':>12}{'games/s':>13}"
+          f"{'p50 (us)':>10}{'p99 (us)':>10}", file=out)
+    results = []
+    for name in targets:
+        for config in args.configs:
+            try:
+                result = run_benchmark(name, config,
+                                       steps=args.steps,
+                                       workers=args.workers,
+                                       num_envs=args.num_envs,
+                                       seed=args.seed)
+            except Exception as e:
+                result = {"target": name, "config": config,
+                          "error": f"{type(e).__name__}: {e}"}
+                print(f"{name:<22}{config:<11}  {result['error']}",
+                      file=out)
+            else:
+                latency = result["latency_us"]
+                print(f"{name:<22}{config:<11}"
+                      f"{result['steps_per_sec']:>12,.0f}"
+                      f"{result['games_per_sec']:>13,.0f}"
+                      f"{latency['p50']:>10.1f}{latency['p99']:>10.1f}",
+                      file=out)
+            results.append(result)
+
+    if args.json is not None:
+        report = {"system": _system_info(),
+                  "settings": {"steps": args.steps,
+                               "workers": args.workers,
+                               "num_envs": args.num_envs,
+                               "seed": args.seed},
+                  "results": results}
+        if to_stdout:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    return results
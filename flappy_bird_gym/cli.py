@@ -2,6 +2,10 @@ import argparse
 import time
 
 import flappy_bird_gym
+from flappy_bird_gym import benchmark
+from flappy_bird_gym import evaluate
+from flappy_bird_gym import server
+from flappy_bird_gym.envs import profiling
 
 
 def _get_args():
@@ -17,6 +21,53 @@ def _get_args():
         help="The execution mode for the game.",
     )
 
+    # Profiling:
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="cprofile",
+        default=None,
+        choices=["phases", *profiling.PROFILERS],
+        help="Runs the command under cProfile (the default) or pyinstrument "
+             "and reports the time spent in each phase of the environments' "
+             "steps (\"phases\" only reports the phases).",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Saves the profile to this path (and the phases' histograms to "
+             "PATH.phases.json) instead of printing it.",
+    )
+
+    # Subcommands:
+    subparsers = parser.add_subparsers(dest="command")
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Runs the throughput benchmark suite.",
+        description=benchmark.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    benchmark.add_arguments(bench_parser)
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Runs a server hosting many games for concurrent clients.",
+        description=server.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    server.add_arguments(serve_parser)
+
+    evaluate_parser = subparsers.add_parser(
+        "evaluate",
+        help="Evaluates trained models over many headless episodes.",
+        description=evaluate.__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    evaluate.add_arguments(evaluate_parser)
+
     return parser.parse_args()
 
 
@@ -49,7 +100,22 @@ def random_agent_env():
 def main():
     args = _get_args()
 
-    if args.mode == "human":
+    if args.profile is None:
+        _run(args)
+    else:
+        profiler = None if args.profile == "phases" else args.profile
+        with profiling.profile_session(profiler, out=args.profile_out):
+            _run(args)
+
+
+def _run(args):
+    if args.command == "bench":
+        benchmark.main(args)
+    elif args.command == "serve":
+        server.main(args)
+    elif args.command == "evaluate":
+        evaluate.main(args)
+    elif args.mode == "human":
         flappy_bird_gym.original_game.main()
     elif args.mode == "random":
         random_agent_env()
@@ -0,0 +1,256 @@
+""" Curricula of the games' difficulty.
+
+A :class:`DifficultyScheduler` moves the games of an environment through a
+sequence of difficulty levels, from easy to hard, as an agent learns to play
+them. Each level is a set of parameters of the games' physics and pipes (see
+:data:`.GAME_PARAMS`), such as the gap between the pipes and their speed,
+which are changed in place through the environments' `set_difficulty` (the
+environments aren't re-created and the games in progress aren't reset). A
+game moves to the next level once a metric reaches the level's threshold:
+
+    * "steps": the number of steps played on the level;
+    * "success_rate": the fraction of the last `window` episodes played on the
+      level that reached `success_score`;
+    * "score": the mean score of the last `window` episodes played on the
+      level.
+
+By default, all the games share a level. With `per_game=True`, each game of a
+vector environment has its own level, advanced by its own episodes.
+
+Usage:
+    env = VecCurriculumWrapper(
+        flappy_bird_gym.make("FlappyBird-vec-v3", num_envs=64),
+        metric="success_rate", thresholds=0.8,
+    )
+    obs = env.reset()
+    obs, rewards, dones, info = env.step(actions)  # (info["level"])
+"""
+
+from typing import Any, Dict, Sequence, Tuple, Union
+
+import gym
+import numpy as np
+
+from flappy_bird_gym.envs.game_logic import GAME_PARAMS
+
+#: Metrics the levels of a :class:`DifficultyScheduler` can be advanced by.
+CURRICULUM_METRICS = ("steps", "success_rate", "score")
+
+#: Default difficulty levels, from wide and slow pipes to the original game
+#: (the 4th level) and beyond. The parameters a level doesn't set have their
+#: default values (see :data:`.GAME_PARAMS`).
+DEFAULT_LEVELS = (
+    {"pipe_gap_size": 150, "pipe_vel_x": -3},
+    {"pipe_gap_size": 130, "pipe_vel_x": -3},
+    {"pipe_gap_size": 115, "pipe_vel_x": -4},
+    {"pipe_gap_size": 100, "pipe_vel_x": -4},
+    {"pipe_gap_size": 90, "pipe_vel_x": -5},
+    {"pipe_gap_size": 80, "pipe_vel_x": -6},
+)
+
+
+class DifficultyScheduler:
+    """ Advances the games of an environment through difficulty levels.
+
+    :meth:`update` must be called after each step of the environment, with
+    the step's done flags and scores (the wrappers of this module do it).
+    When a level changes, its parameters are applied to the games right away,
+    with the environment's `set_difficulty`.
+
+    Args:
+        env (Any): The environment: any of the package's environments (single
+            or vector), or a wrapper forwarding `set_difficulty` to one.
+        levels (Sequence[Dict[str, int]]): Parameters of the games of each
+            level (see :data:`.GAME_PARAMS`), from the easiest to the hardest.
+        metric (str): Metric the levels are advanced by (see
+            :data:`CURRICULUM_METRICS`).
+        thresholds (Union[float, Sequence[float]]): Value of the metric at
+            which a level is advanced to the next one: a single value, or one
+            value for each level but the last.
+        window (int): Number of episodes the "success_rate" and "score"
+            metrics are computed over. A level is only advanced after this
+            many episodes were played on it.
+        success_score (int): Score at which an episode is a success.
+        per_game (bool): Whether each game of a vector environment has its
+            own level. With the "numba" backend of the vector environments,
+            all the levels must have the same `pipe_gap_size`.
+        start_level (int): Level the games start at.
+
+    Attributes:
+        levels (Tuple[Dict[str, int], ...]): Parameters of the games of each
+            level (with the default values of the parameters they don't set).
+        num_steps (int): Number of steps played by all the games.
+    """
+
+    def __init__(self,
+                 env: Any,
+                 levels: Sequence[Dict[str, int]] = DEFAULT_LEVELS,
+                 metric: str = "success_rate",
+                 thresholds: Union[float, Sequence[float]] = 0.8,
+                 window: int = 100,
+                 success_score: int = 10,
+                 per_game: bool = False,
+                 start_level: int = 0) -> None:
+        if metric not in CURRICULUM_METRICS:
+            raise ValueError(f"Invalid curriculum metric: \"{metric}\"! "
+                             f"Available metrics: {CURRICULUM_METRICS}.")
+        if len(levels) == 0:
+            raise ValueError("At least one level is required!")
+        if not 0 <= start_level < len(levels):
+            raise ValueError(f"The start level must be between 0 and "
+                             f"{len(levels) - 1}!")
+        if window < 1:
+            raise ValueError("The window must have at least 1 episode!")
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        if thresholds.ndim > 0 and len(thresholds) != len(levels) - 1:
+            raise ValueError("A threshold is required for each level but the "
+                             "last!")
+
+        self.env = env
+        self.levels = tuple({**GAME_PARAMS, **level} for level in levels)
+        self.num_steps = 0
+        self._metric = metric
+        self._thresholds = np.broadcast_to(thresholds, (len(levels) - 1,))
+        self._window = window
+        self._success_score = success_score
+
+        num_envs = getattr(env, "num_envs", 1)
+        self._per_game = per_game and num_envs > 1
+        num_units = num_envs if self._per_game else 1
+        self._level = np.full(num_units, start_level, dtype=np.int64)
+        # (steps and episodes played on the current level, and the scores of
+        # the last `window` episodes)
+        self._steps = np.zeros(num_units, dtype=np.int64)
+        self._episodes = np.zeros(num_units, dtype=np.int64)
+        self._scores = np.zeros((num_units, window), dtype=np.float64)
+        self._apply(np.ones(num_units, dtype=bool))
+
+    @property
+    def level(self) -> Union[int, np.ndarray]:
+        """ The current level (or, with `per_game=True`, the level of each
+        game). """
+        return self._level.copy() if self._per_game else int(self._level[0])
+
+    def _apply(self, changed: np.ndarray) -> None:
+        """ Applies the parameters of the current levels of the selected
+        units (games, if the levels are per game) to the environment. """
+        if not self._per_game:
+            self.env.set_difficulty(**self.levels[self._level[0]])
+            return
+
+        for level in np.unique(self._level[changed]):
+            self.env.set_difficulty(mask=changed & (self._level == level),
+                                    **self.levels[level])
+
+    def _metric_values(self) -> np.ndarray:
+        """ Returns the metric of each unit (`NaN` while fewer than `window`
+        episodes were played on its level). """
+        if self._metric == "steps":
+            return self._steps.astype(np.float64)
+
+        if self._metric == "success_rate":
+            values = (self._scores >= self._success_score).mean(axis=1)
+        else:
+            values = self._scores.mean(axis=1)
+        return np.where(self._episodes >= self._window, values, np.nan)
+
+    def update(self,
+               dones: Union[bool, np.ndarray],
+               scores: Union[int, np.ndarray]) -> bool:
+        """ Records a step of the environment and advances the levels whose
+        metric reached its threshold.
+
+        Args:
+            dones (Union[bool, np.ndarray]): The done flags of the step.
+            scores (Union[int, np.ndarray]): The scores of the games after
+                the step (the final scores, for the games that ended).
+
+        Returns:
+            Whether any level changed.
+        """
+        dones = np.atleast_1d(np.asarray(dones, dtype=bool))
+        scores = np.atleast_1d(scores)
+        self.num_steps += len(dones)
+        self._steps += 1 if self._per_game else len(dones)
+
+        ended = np.flatnonzero(dones)
+        units = ended if self._per_game else np.zeros_like(ended)
+        for unit, score in zip(units, scores[ended]):
+            self._scores[unit, self._episodes[unit] % self._window] = score
+            self._episodes[unit] += 1
+
+        last = len(self.levels) - 1
+        if last == 0:
+            return False
+        thresholds = self._thresholds[np.minimum(self._level, last - 1)]
+        # (NaN metrics never reach the thresholds)
+        advance = ((self._level < last)
+                   & (self._metric_values() >= thresholds))
+        if not advance.any():
+            return False
+
+        self._level[advance] += 1
+        self._steps[advance] = 0
+        self._episodes[advance] = 0
+        self._apply(advance)
+        return True
+
+
+class CurriculumWrapper(gym.Wrapper):
+    """ Advances the difficulty of a single environment's games with a
+    :class:`DifficultyScheduler`. The current level is added to the info
+    dictionary of each step (`info["level"]`).
+
+    Args:
+        env (gym.Env): The environment (any of the package's single
+            environments).
+        **scheduler_kwargs: Arguments of the :class:`DifficultyScheduler`.
+    """
+
+    def __init__(self, env: gym.Env, **scheduler_kwargs) -> None:
+        super().__init__(env)
+        self.scheduler = DifficultyScheduler(env.unwrapped,
+                                             **scheduler_kwargs)
+
+    def step(self, action) -> Tuple[np.ndarray, float, bool, Dict]:
+        obs, reward, done, info = self.env.step(action)
+        self.scheduler.update(done, info["score"])
+        info["level"] = self.scheduler.level
+        return obs, reward, done, info
+
+
+class VecCurriculumWrapper:
+    """ Advances the difficulty of a vector environment's games with a
+    :class:`DifficultyScheduler`. The current level (or the level of each
+    game) is added to the info dictionary of each step (`info["level"]`).
+    Other attributes are forwarded to the environment; steps made through its
+    other methods (e.g. `step_games`) aren't counted.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment.
+        **scheduler_kwargs: Arguments of the :class:`DifficultyScheduler`.
+    """
+
+    def __init__(self,
+                 env: gym.vector.VectorEnv,
+                 **scheduler_kwargs) -> None:
+        self.env = env
+        self.scheduler = DifficultyScheduler(env, **scheduler_kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.env, name)
+
+    def reset(self, **kwargs) -> np.ndarray:
+        return self.env.reset(**kwargs)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                                 np.ndarray, Dict]:
+        obs, rewards, dones, info = self.env.step(actions)
+        self.scheduler.update(dones, info["score"])
+        info["level"] = self.scheduler.level
+        return obs, rewards, dones, info
+
+    def close(self, **kwargs) -> None:
+        self.env.close(**kwargs)
@@ -3,5 +3,18 @@ from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvAdvance
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvThreeObservations
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvFourObservations
 from flappy_bird_gym.envs.flappy_bird_env_simple import FlappyBirdEnvFourObsSparse
-from flappy_bird_gym.envs.flappy_bird_env_rgb import FlappyBirdEnvRGB
 
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvSimple
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvAdvance
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvThreeObservations
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvFourObservations
+from flappy_bird_gym.envs.flappy_bird_vec_env import FlappyBirdVecEnvFourObsSparse
+from flappy_bird_gym.envs.flappy_bird_vec_env_rgb import FlappyBirdVecEnvRGB
+
+
+def __getattr__(name):
+    # The RGB environment needs pygame, so it's only imported when requested.
+    if name == "FlappyBirdEnvRGB":
+        from flappy_bird_gym.envs.flappy_bird_env_rgb import FlappyBirdEnvRGB
+        return FlappyBirdEnvRGB
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
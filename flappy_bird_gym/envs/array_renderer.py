@@ -0,0 +1,291 @@
+""" Implements a software renderer that draws the game with NumPy.
+
+Unlike :class:`.FlappyBirdRenderer`, which draws the game on a pygame surface,
+this renderer keeps the sprites as pre-decoded NumPy arrays and composites the
+frames with array slicing. It can draw many game states into a single
+`(N, H, W, C)` array with one call, without creating any pygame surface or
+display (pygame is only used, once, to decode and prepare the sprites).
+"""
+
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from flappy_bird_gym.envs.batch_logic import FlappyBirdBatchLogic
+from flappy_bird_gym.envs.cache import LRUCache
+from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+from flappy_bird_gym.envs.game_logic import PLAYER_ROT_THR
+from flappy_bird_gym.envs.game_logic import visible_rotations
+from flappy_bird_gym.envs.pipes import PIPE_CAPACITY
+
+#: Color to fill the frames' background when no background image was loaded
+#: (same as `renderer.FILL_BACKGROUND_COLOR`).
+FILL_BACKGROUND_COLOR = (200, 200, 200)
+
+
+class _Sprite:
+    """ A sprite decoded into NumPy arrays.
+
+    Args:
+        rgb (np.ndarray): The sprite's colors, with shape `(h, w, C)`.
+        alpha (np.ndarray): The sprite's alpha channel, with shape `(h, w)`.
+    """
+
+    __slots__ = ("height", "width", "opaque", "rgb", "alpha", "inv_alpha")
+
+    def __init__(self, rgb: np.ndarray, alpha: np.ndarray) -> None:
+        self.height, self.width = alpha.shape
+        self.opaque = bool(alpha.min() == 255)
+        if self.opaque:
+            self.rgb = rgb.copy()
+        else:
+            # (premultiplied and kept as int32, so they can be blended without
+            # overflows)
+            self.alpha = alpha.astype(np.int32)[..., None]
+            self.rgb = rgb.astype(np.int32) * self.alpha
+            self.inv_alpha = 255 - self.alpha
+
+    def draw(self, frame: np.ndarray, x: float, y: float) -> None:
+        """ Alpha-blends the sprite into `frame`, with its top-left corner at
+        `(x, y)` (truncated to integers, as pygame does). Parts of the sprite
+        outside of the frame are clipped. """
+        x, y = int(x), int(y)
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + self.width, frame_w), min(y + self.height, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        region = frame[y0:y1, x0:x1]
+        src = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if self.opaque:
+            region[:] = self.rgb[src]
+        else:
+            region[:] = ((self.rgb[src] + region * self.inv_alpha[src] + 127)
+                         // 255)
+
+
+class FlappyBirdArrayRenderer:
+    """ Draws the game with NumPy, into arrays.
+
+    The sprites are loaded with pygame, scaled to the output resolution and
+    (optionally) converted to grayscale once, when the renderer is created.
+    They are then kept as NumPy arrays: the background is copied into each
+    frame and the other sprites are alpha-blended over it with array slicing.
+    The rotated bird sprites are precomputed for every rotation the game can
+    produce, so drawing a frame never rotates an image (a rotation that isn't
+    in the cache, e.g. from a custom game, is computed and cached on first
+    use, within the cache's LRU bound).
+
+    The score isn't drawn.
+
+    Args:
+        screen_size (Tuple[int, int]): The screen's width and height.
+        bird_color (str): Color of the flappy bird.
+        pipe_color (str): Color of the pipes.
+        background (Optional[str]): Type of background image. If `None`, the
+            background is filled with a solid color.
+        output_size (Optional[Tuple[int, int]]): Width and height of the
+            frames. If `None`, the screen's size is used.
+        grayscale (bool): If `True`, the frames have a single (grayscale)
+            channel. Otherwise, they have 3 (RGB) channels.
+        rotation_cache_size (Optional[int]): Maximum number of rotated bird
+            sprites kept in :attr:`rotation_cache` (see
+            :class:`.FlappyBirdRenderer`).
+
+    Attributes:
+        frame_shape (Tuple[int, int, int]): Shape, `(H, W, C)`, of a frame.
+        game (Optional[FlappyBirdLogic]): Game drawn by :meth:`draw`.
+        rotation_cache (LRUCache): Cache of the rotated bird sprites, keyed by
+            `(player_idx, visible_rotation)`.
+    """
+
+    def __init__(self,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 bird_color: str = "yellow",
+                 pipe_color: str = "green",
+                 background: Optional[str] = "day",
+                 output_size: Optional[Tuple[int, int]] = None,
+                 grayscale: bool = False,
+                 rotation_cache_size: Optional[int] = 128) -> None:
+        if output_size is None:
+            output_size = screen_size
+        self._scale_x = output_size[0] / screen_size[0]
+        self._scale_y = output_size[1] / screen_size[1]
+        self._scaled = tuple(output_size) != tuple(screen_size)
+        self._grayscale = grayscale
+        self.frame_shape = (output_size[1], output_size[0],
+                            1 if grayscale else 3)
+        self.game = None
+
+        self._background = self._load_sprites(bird_color, pipe_color,
+                                               background)
+        self.rotation_cache = LRUCache(self._rotate_player,
+                                       maxsize=rotation_cache_size)
+        for idx in range(len(self._player_images)):
+            for rot in visible_rotations():
+                self.rotation_cache.get((idx, rot))
+        self.rotation_cache.reset_counters()
+
+    def _to_arrays(self, surface) -> _Sprite:
+        """ Decodes a pygame surface into a :class:`_Sprite`. """
+        import pygame
+
+        # (surfaces are indexed by (x, y), hence the transpositions)
+        rgb = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+        alpha = pygame.surfarray.array_alpha(surface).T
+        if self._grayscale:
+            rgb = rgb[..., :1]     # (the channels of the sprites are equal)
+        return _Sprite(np.ascontiguousarray(rgb), np.ascontiguousarray(alpha))
+
+    def _load_sprites(self,
+                      bird_color: str,
+                      pipe_color: str,
+                      background: Optional[str]) -> np.ndarray:
+        """ Loads and prepares the sprites. Returns the background frame. """
+        from flappy_bird_gym.envs import utils
+        from flappy_bird_gym.envs.renderer import prepare_sprite
+
+        images = utils.load_images(convert=False,
+                                   bird_color=bird_color,
+                                   pipe_color=pipe_color,
+                                   bg_type=background)
+        scale = (self._scale_x, self._scale_y)
+
+        def prepare(image):
+            return prepare_sprite(image, scale, self._grayscale)
+
+        self._upper_pipe = self._to_arrays(prepare(images["pipe"][0]))
+        self._lower_pipe = self._to_arrays(prepare(images["pipe"][1]))
+        self._base = self._to_arrays(prepare(images["base"]))
+        self._player_images = [prepare(img) for img in images["player"]]
+
+        frame = np.empty(self.frame_shape, dtype=np.uint8)
+        if images["background"] is None:
+            color = np.array(FILL_BACKGROUND_COLOR)
+            if self._grayscale:
+                from flappy_bird_gym.envs.renderer import GRAYSCALE_WEIGHTS
+                color = np.rint(color @ np.array(GRAYSCALE_WEIGHTS))[None]
+            frame[:] = color.astype(np.uint8)
+        else:
+            frame[:] = np.uint8(0)
+            self._to_arrays(prepare(images["background"])).draw(frame, 0, 0)
+        return frame
+
+    def _rotate_player(self, idx: int, rot: int) -> _Sprite:
+        import pygame
+        return self._to_arrays(pygame.transform.rotate(
+            self._player_images[idx], rot))
+
+    def _player_sprite(self, idx: int, rot: int) -> _Sprite:
+        """ Returns the bird's sprite with the given animation index and
+        (game) rotation. """
+        return self.rotation_cache.get(
+            (idx, rot if rot <= PLAYER_ROT_THR else PLAYER_ROT_THR))
+
+    def _to_frame(self, x: float, y: float) -> Tuple[float, float]:
+        """ Converts screen coordinates to coordinates of the frames (as
+        :class:`.FlappyBirdRenderer` does). """
+        if self._scaled:
+            return round(x * self._scale_x), round(y * self._scale_y)
+        return x, y
+
+    def _draw_frame(self,
+                    frame: np.ndarray,
+                    player_x: float,
+                    player_y: float,
+                    player_idx: int,
+                    player_rot: int,
+                    base_x: float,
+                    base_y: float,
+                    pipes: Sequence[Tuple[int, int, int]]) -> None:
+        """ Draws a game state into `frame`. """
+        frame[:] = self._background
+
+        to_frame = self._to_frame
+        upper_pipe, lower_pipe = self._upper_pipe, self._lower_pipe
+        for pipe_x, upper_y, lower_y in pipes:
+            upper_pipe.draw(frame, *to_frame(pipe_x, upper_y))
+            lower_pipe.draw(frame, *to_frame(pipe_x, lower_y))
+
+        self._base.draw(frame, *to_frame(base_x, base_y))
+        self._player_sprite(player_idx, player_rot).draw(
+            frame, *to_frame(player_x, player_y))
+
+    def _output(self, num_frames: int,
+                out: Optional[np.ndarray]) -> np.ndarray:
+        shape = (num_frames, *self.frame_shape)
+        if out is None:
+            return np.empty(shape, dtype=np.uint8)
+        if out.shape != shape or out.dtype != np.uint8:
+            raise ValueError(f"The output must be an uint8 array with shape "
+                             f"{shape}!")
+        return out
+
+    def draw(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Draws the current state of :attr:`game`.
+
+        Args:
+            out (Optional[np.ndarray]): Array with shape :attr:`frame_shape`
+                into which the frame is drawn. If `None`, a new array is
+                allocated.
+
+        Returns:
+            The frame, with shape :attr:`frame_shape` and dtype `uint8`.
+        """
+        if self.game is None:
+            raise ValueError("A game logic must be assigned to the renderer!")
+
+        frames = self.draw_batch([self.game],
+                                 None if out is None else out[None])
+        return frames[0]
+
+    def draw_batch(self,
+                   games: Union[Sequence[FlappyBirdLogic],
+                                FlappyBirdBatchLogic],
+                   out: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Draws the states of many games with a single call.
+
+        Args:
+            games (Union[Sequence[FlappyBirdLogic], FlappyBirdBatchLogic]): The
+                games to draw, either as single games or as the games of a
+                :class:`.FlappyBirdBatchLogic`.
+            out (Optional[np.ndarray]): Array with shape
+                `(N, *frame_shape)` into which the frames are drawn. If
+                `None`, a new array is allocated.
+
+        Returns:
+            The frames, with shape `(N, H, W, C)` and dtype `uint8`.
+        """
+        if isinstance(games, FlappyBirdBatchLogic):
+            return self._draw_batch_logic(games, out)
+
+        out = self._output(len(games), out)
+        for frame, game in zip(out, games):
+            self._draw_frame(frame, game.player_x, game.player_y,
+                             game.player_idx, game.player_rot,
+                             game.base_x, game.base_y, game.pipes)
+        return out
+
+    def _draw_batch_logic(self,
+                          batch: FlappyBirdBatchLogic,
+                          out: Optional[np.ndarray]) -> np.ndarray:
+        out = self._output(batch.num_games, out)
+
+        # (the pipes' arrays are read in the games' order, at once)
+        slots = (batch.pipe_head[:, None]
+                 + np.arange(PIPE_CAPACITY)) % PIPE_CAPACITY
+        rows = np.arange(batch.num_games)[:, None]
+        pipe_x = batch.pipe_x[rows, slots].tolist()
+        upper_y = batch.upper_pipe_y[rows, slots].tolist()
+        lower_y = batch.lower_pipe_y[rows, slots].tolist()
+        counts = batch.pipe_count.tolist()
+
+        for i, (y, idx, rot, base_x) in enumerate(zip(
+                batch.player_y.tolist(), batch.player_idx.tolist(),
+                batch.player_rot.tolist(), batch.base_x.tolist())):
+            n = counts[i]
+            pipes = zip(pipe_x[i][:n], upper_y[i][:n], lower_y[i][:n])
+            self._draw_frame(out[i], batch.player_x, y, idx, rot,
+                             base_x, batch.base_y, pipes)
+        return out
@@ -0,0 +1,362 @@
+""" Implements a batched version of the Flappy Bird game logic.
+
+The games are stored as a structure of NumPy arrays (one entry per game) and
+advanced together by a single vectorized call, instead of running one
+:class:`.FlappyBirdLogic` object (and its Python branches) per game.
+"""
+
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from flappy_bird_gym.envs import collision
+from flappy_bird_gym.envs import game_logic
+from flappy_bird_gym.envs.game_logic import FlappyBirdLogic, GAME_PARAMS
+from flappy_bird_gym.envs.game_logic import validate_params
+from flappy_bird_gym.envs.game_logic import PLAYER_MAX_VEL_Y, PLAYER_VEL_ROT
+from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
+from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
+from flappy_bird_gym.envs.game_logic import BASE_WIDTH, BACKGROUND_WIDTH
+from flappy_bird_gym.envs.pipes import PIPE_CAPACITY
+
+#: Sequence of the bird's animation frames (same as `FlappyBirdLogic`).
+PLAYER_IDX_CYCLE = np.array(game_logic.PLAYER_IDX_CYCLE, dtype=np.int64)
+
+
+class FlappyBirdBatchLogic:
+    """ Handles the logic of N Flappy Bird games at once.
+
+    Each call to :meth:`update_state` advances every game by one frame using
+    masked array operations. The semantics of a single game are the same as the
+    ones of :meth:`.FlappyBirdLogic.update_state`: a game that crashes isn't
+    advanced and keeps reporting a crash until it's reset.
+
+    The pipes of each game are stored in a fixed-capacity ring buffer: the
+    pipe pair in slot `(pipe_head + i) % PIPE_CAPACITY` is the i-th pair of
+    the game (the same order of `FlappyBirdLogic.pipes`), and only the
+    first `pipe_count` pairs are valid.
+
+    The parameters of the games' physics and pipes (see :data:`.GAME_PARAMS`)
+    are stored per game, in the columns of :attr:`game_params`, and can be
+    changed while the games are played (see :meth:`set_params`).
+
+    Args:
+        num_games (int): Number of games to simulate.
+        screen_size (Tuple[int, int]): Tuple with the screen's width and height.
+        pipe_gap_size (int): Space between a lower and an upper pipe.
+        seed (Optional[int]): Seed for the generator of the pipes' heights.
+
+    Attributes:
+        num_games (int): Number of games being simulated.
+        player_x (int): The players' x position (the same for all games).
+        player_y (np.ndarray): The players' y positions.
+        player_vel_y (np.ndarray): The players' vertical velocities.
+        player_rot (np.ndarray): The players' rotation angles.
+        player_idx (np.ndarray): Current indices of the birds' animation cycles.
+        base_x (np.ndarray): The base/ground's x positions.
+        base_y (float): The base/ground's y position.
+        score (np.ndarray): Current scores of the players.
+        pipe_x (np.ndarray): Array with shape `(num_games, PIPE_CAPACITY)`
+            with the x positions of the pipe pairs.
+        upper_pipe_y (np.ndarray): The y positions of the upper pipes.
+        lower_pipe_y (np.ndarray): The y positions of the lower pipes.
+        pipe_head (np.ndarray): Slot of the first pipe pair of each game.
+        pipe_count (np.ndarray): Number of valid pipe pairs of each game.
+        next_pipe (np.ndarray): Index, in the pipe pairs of each game (see
+            :meth:`pipe_slot`), of the first pair the player hasn't passed
+            yet (or of the last pair, if there's none). Kept up to date as the
+            pipes scroll, spawn and are removed (as
+            :attr:`.FlappyBirdLogic.next_pipe`).
+        alive (np.ndarray): Whether each player was alive after the last call
+            to :meth:`update_state`.
+        scored (np.ndarray): Whether each player scored a point in the last
+            call to :meth:`update_state`.
+        last_action (np.ndarray): The last actions taken by the players.
+        game_params (np.ndarray): Array with shape
+            `(num_games, len(GAME_PARAMS))` with the parameters of each game,
+            in the order of :data:`.GAME_PARAMS`. Its columns are also
+            available as the attributes `pipe_gap_size`, `pipe_vel_x`,
+            `player_acc_y` and `player_flap_acc`.
+    """
+
+    #: Methods timed by the environments when profiling (see
+    #: :mod:`.profiling`), and their phases.
+    profiled_methods: Dict[str, str] = {"update_state": "update_state",
+                                        "check_crash": "check_crash"}
+
+    def __init__(self,
+                 num_games: int,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 pipe_gap_size: int = 100,
+                 seed: Optional[int] = None) -> None:
+        if num_games < 1:
+            raise ValueError("The number of games must be at least 1!")
+
+        self.num_games = num_games
+        self._screen_width = screen_size[0]
+        self._screen_height = screen_size[1]
+        self._rng = np.random.default_rng(seed)
+
+        self.player_x = int(self._screen_width * 0.2)
+        self.base_y = self._screen_height * 0.79
+        self._base_shift = BASE_WIDTH - BACKGROUND_WIDTH
+        self._player_mid_x = self.player_x + PLAYER_WIDTH / 2
+        # a pair of pipes is passed once its x position is below this one
+        # (extra distance to compensate for the buggy hit-box)
+        self._passed_pipe_x = (self.player_x - PLAYER_WIDTH / 2
+                               - PIPE_WIDTH / 2 - 3)
+
+        n = num_games
+        self.player_y = np.zeros(n, dtype=np.float64)
+        self.player_vel_y = np.zeros(n, dtype=np.int64)
+        self.player_rot = np.zeros(n, dtype=np.int64)
+        self.player_idx = np.zeros(n, dtype=np.int64)
+        self._player_idx_pos = np.zeros(n, dtype=np.int64)
+        self._player_flapped = np.zeros(n, dtype=bool)
+        self._loop_iter = np.zeros(n, dtype=np.int64)
+        self.base_x = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+
+        self.pipe_x = np.zeros((n, PIPE_CAPACITY), dtype=np.int64)
+        self.upper_pipe_y = np.zeros((n, PIPE_CAPACITY), dtype=np.int64)
+        self.lower_pipe_y = np.zeros((n, PIPE_CAPACITY), dtype=np.int64)
+        self.pipe_head = np.zeros(n, dtype=np.int64)
+        self.pipe_count = np.zeros(n, dtype=np.int64)
+        self.next_pipe = np.zeros(n, dtype=np.int64)
+
+        self.alive = np.ones(n, dtype=bool)
+        self.scored = np.zeros(n, dtype=bool)
+        self.last_action = np.zeros(n, dtype=np.int64)
+
+        self.game_params = np.array([list(GAME_PARAMS.values())] * n,
+                                    dtype=np.int64)
+        (self.pipe_gap_size, self.pipe_vel_x, self.player_acc_y,
+         self.player_flap_acc) = self.game_params.T
+
+        self._all = np.arange(n)
+        self._slots = np.arange(PIPE_CAPACITY)
+        self.set_params(pipe_gap_size=pipe_gap_size)
+        self.reset()
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        """ Seeds the generator of the pipes' heights. """
+        self._rng = np.random.default_rng(seed)
+
+    def _random_gap_y(self, gap_size: np.ndarray) -> np.ndarray:
+        """ Returns the y positions of randomly generated gaps, one for each
+        of the given gap sizes. """
+        # (the same stream as draws with a scalar bound, if the sizes match)
+        gap_y = self._rng.integers(
+            0, (self.base_y * 0.6 - gap_size).astype(np.int64),
+        )
+        return gap_y + int(self.base_y * 0.2)
+
+    def get_params(self) -> Dict[str, np.ndarray]:
+        """ Returns copies of the parameters of the games (see
+        :data:`.GAME_PARAMS`), by name. """
+        return {name: self.game_params[:, i].copy()
+                for i, name in enumerate(GAME_PARAMS)}
+
+    def set_params(self,
+                   mask: Optional[np.ndarray] = None,
+                   **params: Union[int, np.ndarray]) -> None:
+        """ Changes parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`) in place, e.g.
+        `set_params(pipe_gap_size=80, pipe_vel_x=-5)`. The new velocities
+        apply from the next tick on, and the new gap sizes to the pipes that
+        spawn next (as :meth:`.FlappyBirdLogic.set_params`).
+
+        Args:
+            mask (Optional[np.ndarray]): Boolean array selecting the games to
+                be changed. If `None`, all the games are changed.
+            **params (Union[int, np.ndarray]): The parameters' new values: a
+                single value or an array with a value for each of the selected
+                games.
+        """
+        validate_params(params, self.base_y)
+        idx = self._all if mask is None else np.flatnonzero(mask)
+        for name, value in params.items():
+            column = list(GAME_PARAMS).index(name)
+            self.game_params[idx, column] = value
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> None:
+        """ Starts new games.
+
+        Args:
+            mask (Optional[np.ndarray]): Boolean array selecting the games to be
+                reset. If `None`, all the games are reset.
+        """
+        idx = self._all if mask is None else np.flatnonzero(mask)
+        if len(idx) == 0:
+            return
+
+        self.player_y[idx] = int((self._screen_height - PLAYER_HEIGHT) / 2)
+        self.player_vel_y[idx] = -9
+        self.player_rot[idx] = 45
+        self.player_idx[idx] = 0
+        self._player_idx_pos[idx] = 0
+        self._player_flapped[idx] = False
+        self._loop_iter[idx] = 0
+        self.base_x[idx] = 0
+        self.score[idx] = 0
+
+        gap_size = self.pipe_gap_size[idx, None]
+        gap_y = self._random_gap_y(np.repeat(gap_size, 2, axis=1))
+        first_x = self._screen_width + 200
+        self.pipe_x[idx, 0] = first_x
+        self.pipe_x[idx, 1] = int(first_x + self._screen_width / 2)
+        self.upper_pipe_y[idx, :2] = gap_y - PIPE_HEIGHT
+        self.lower_pipe_y[idx, :2] = gap_y + gap_size
+        self.pipe_head[idx] = 0
+        self.pipe_count[idx] = 2
+        # (the first pair of pipes spawns ahead of the player)
+        self.next_pipe[idx] = 0
+
+        self.alive[idx] = True
+        self.scored[idx] = False
+        self.last_action[idx] = 0
+
+    def valid_pipes(self) -> np.ndarray:
+        """ Returns a boolean array, with shape `(num_games, PIPE_CAPACITY)`,
+        indicating which pipe slots hold valid pipe pairs. """
+        offset = (self._slots[None, :] - self.pipe_head[:, None]) % PIPE_CAPACITY
+        return offset < self.pipe_count[:, None]
+
+    def pipe_slot(self, i: Union[int, np.ndarray]) -> np.ndarray:
+        """ Returns the slots of the i-th pipe pair of each game. """
+        return (self.pipe_head + i) % PIPE_CAPACITY
+
+    def check_crash(self, valid: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Returns a boolean array indicating which players collide with the
+        ground (base) or a pipe.
+
+        The collision test is the same as the one made by
+        :meth:`.FlappyBirdLogic.check_crash`, but with the rects' overlaps
+        computed arithmetically for all the games and pipes at once.
+        """
+        if valid is None:
+            valid = self.valid_pipes()
+
+        ground = self.player_y + PLAYER_HEIGHT >= self.base_y - 1
+
+        # rects have integer coordinates:
+        player_y = np.trunc(self.player_y)[:, None]
+        pipe = (valid & collision.player_hits_pipes(self.player_x, player_y,
+                                                    self.pipe_x,
+                                                    self.upper_pipe_y,
+                                                    self.lower_pipe_y)
+                ).any(axis=1)
+        return ground | pipe
+
+    def update_state(self,
+                     actions: Union[np.ndarray, int],
+                     mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Given the actions taken by the players, updates the games' states.
+
+        Args:
+            actions (Union[np.ndarray, int]): Array with the action taken by
+                each player (or a single action for all of them).
+            mask (Optional[np.ndarray]): Boolean array selecting the games to
+                be updated. The other games are left untouched (their actions
+                are ignored). If `None`, all the games are updated.
+
+        Returns:
+            A boolean array with `True` for the players that are alive and
+            `False` for the others.
+        """
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64),
+                                  (self.num_games,))
+        flap = ((actions == FlappyBirdLogic.Actions.FLAP)
+                & (self.player_y > -2 * PLAYER_HEIGHT))
+        if mask is not None:
+            flap &= mask
+        self.player_vel_y[flap] = self.player_flap_acc[flap]
+        self._player_flapped |= flap
+        if mask is None:
+            self.last_action[:] = actions
+        else:
+            self.last_action[mask] = actions[mask]
+
+        valid = self.valid_pipes()
+        alive = ~self.check_crash(valid)
+        if mask is not None:
+            alive = np.where(mask, alive, self.alive)
+        self.alive = alive
+        # (the games that are advanced)
+        moving = alive if mask is None else alive & mask
+        valid &= moving[:, None]
+
+        # check for score (once, on the tick the pipe's middle passes the
+        # player's middle)
+        pipe_vel_x = self.pipe_vel_x[:, None]
+        pipe_mid_pos = self.pipe_x + PIPE_WIDTH / 2
+        scores = (valid
+                  & (pipe_mid_pos <= self._player_mid_x)
+                  & (self._player_mid_x < pipe_mid_pos - pipe_vel_x)
+                  ).sum(axis=1)
+        self.score += scores
+        self.scored = scores > 0
+
+        # player_index base_x change
+        change_idx = moving & ((self._loop_iter + 1) % 3 == 0)
+        self.player_idx[change_idx] = PLAYER_IDX_CYCLE[
+            self._player_idx_pos[change_idx]]
+        self._player_idx_pos[change_idx] += 1
+        self._player_idx_pos[change_idx] %= len(PLAYER_IDX_CYCLE)
+
+        self._loop_iter[moving] = (self._loop_iter[moving] + 1) % 30
+        self.base_x[moving] = -((-self.base_x[moving] + 100) % self._base_shift)
+
+        # rotate the player
+        self.player_rot[moving & (self.player_rot > -90)] -= PLAYER_VEL_ROT
+
+        # player's movement
+        flapped = self._player_flapped & moving
+        fall = moving & ~flapped & (self.player_vel_y < PLAYER_MAX_VEL_Y)
+        self.player_vel_y[fall] += self.player_acc_y[fall]
+        self.player_rot[flapped] = 45
+        self._player_flapped &= ~moving
+
+        self.player_y[moving] += np.minimum(
+            self.player_vel_y[moving],
+            self.base_y - self.player_y[moving] - PLAYER_HEIGHT,
+        )
+
+        # move pipes to left
+        self.pipe_x[moving] += pipe_vel_x[moving]
+
+        # add new pipe when first pipe is about to touch left of screen
+        # (on the tick it moves past x = 5)
+        first_x = self.pipe_x[self._all, self.pipe_head]
+        has_pipes = moving & (self.pipe_count > 0)
+        spawn = np.flatnonzero(has_pipes & (first_x < 5)
+                               & (first_x - self.pipe_vel_x >= 5))
+        if len(spawn) > 0:
+            gap_size = self.pipe_gap_size[spawn]
+            gap_y = self._random_gap_y(gap_size)
+            slot = ((self.pipe_head[spawn] + self.pipe_count[spawn])
+                    % PIPE_CAPACITY)
+            self.pipe_x[spawn, slot] = self._screen_width + 10
+            self.upper_pipe_y[spawn, slot] = gap_y - PIPE_HEIGHT
+            self.lower_pipe_y[spawn, slot] = gap_y + gap_size
+            self.pipe_count[spawn] += 1
+
+        # remove first pipe if its out of the screen
+        remove = has_pipes & (first_x < -PIPE_WIDTH)
+        self.pipe_head[remove] = (self.pipe_head[remove] + 1) % PIPE_CAPACITY
+        self.pipe_count[remove] -= 1
+        self.next_pipe[remove & (self.next_pipe > 0)] -= 1
+
+        self._update_next_pipe()
+        return alive
+
+    def _update_next_pipe(self) -> None:
+        """ Advances :attr:`next_pipe` past the pairs of pipes the players
+        have passed (see :meth:`.FlappyBirdLogic._update_next_pipe`). """
+        for _ in range(PIPE_CAPACITY - 1):
+            next_x = self.pipe_x[self._all, self.pipe_slot(self.next_pipe)]
+            passed = ((self.next_pipe < self.pipe_count - 1)
+                      & (next_x < self._passed_pipe_x))
+            if not passed.any():
+                break
+            self.next_pipe[passed] += 1
@@ -0,0 +1,77 @@
+""" Implements a bounded cache of values computed on demand, used by the
+renderers to keep their prepared sprites. """
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """ Cache of the values returned by a function, with a least recently used
+    (LRU) eviction policy.
+
+    Similar to `functools.lru_cache`, but bound to an object (so each renderer
+    has its own cache, which dies with it) and with counters that can be read
+    and reset at any time.
+
+    Args:
+        factory (Callable): Function that computes the value of a missing key.
+            Called with the key's items as arguments (tuple keys are unpacked).
+        maxsize (Optional[int]): Maximum number of cached values. When it's
+            exceeded, the least recently used value is evicted. If `None`, the
+            cache is unbounded.
+
+    Attributes:
+        hits (int): Number of lookups that found their key in the cache.
+        misses (int): Number of lookups that had to call the factory.
+    """
+
+    __slots__ = ("_factory", "_maxsize", "_data", "hits", "misses")
+
+    def __init__(self,
+                 factory: Callable[..., Any],
+                 maxsize: Optional[int] = 128) -> None:
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("The maximum size must be at least 1 (or None)!")
+
+        self._factory = factory
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Any:
+        """ Returns the value of the key, computing (and caching) it if it
+        isn't in the cache. """
+        data = self._data
+        try:
+            value = data[key]
+        except KeyError:
+            self.misses += 1
+            value = (self._factory(*key) if type(key) is tuple
+                     else self._factory(key))
+            data[key] = value
+            if self._maxsize is not None and len(data) > self._maxsize:
+                data.popitem(last=False)
+        else:
+            self.hits += 1
+            data.move_to_end(key)
+        return value
+
+    def clear(self) -> None:
+        """ Removes all the cached values (the counters are kept). """
+        self._data.clear()
+
+    def reset_counters(self) -> None:
+        """ Sets the hit and miss counters to zero. """
+        self.hits = self.misses = 0
+
+    def info(self) -> Dict[str, Optional[int]]:
+        """ Returns the cache's counters and sizes. """
+        return {"hits": self.hits, "misses": self.misses,
+                "maxsize": self._maxsize, "currsize": len(self._data)}
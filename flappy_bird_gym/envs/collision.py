@@ -0,0 +1,68 @@
+""" Collision tests between the player and the pipes.
+
+The tests are made with plain integer arithmetic on the objects' axis-aligned
+bounding boxes, with the same semantics as `pygame.Rect.colliderect` (two rects
+collide if they overlap by at least one pixel; rects that only touch each
+other's edges don't collide). No `pygame.Rect` is allocated and pygame doesn't
+need to be imported.
+"""
+
+from typing import Union
+
+import numpy as np
+
+from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
+from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
+
+ArrayOrInt = Union[np.ndarray, int]
+
+
+def rects_overlap(x1: ArrayOrInt, y1: ArrayOrInt, w1: ArrayOrInt,
+                  h1: ArrayOrInt, x2: ArrayOrInt, y2: ArrayOrInt,
+                  w2: ArrayOrInt, h2: ArrayOrInt) -> Union[np.ndarray, bool]:
+    """ Checks if two rects overlap.
+
+    Works both with scalars and with NumPy arrays (in which case the arguments
+    are broadcast against each other and a boolean array is returned).
+    """
+    return (x1 < x2 + w2) & (x1 + w1 > x2) & (y1 < y2 + h2) & (y1 + h1 > y2)
+
+
+def player_hits_pipe(player_x: int,
+                     player_y: int,
+                     pipe_x: int,
+                     upper_pipe_y: int,
+                     lower_pipe_y: int) -> bool:
+    """ Checks if the player collides with a pair of pipes (upper and lower).
+    """
+    if not (player_x < pipe_x + PIPE_WIDTH and player_x + PLAYER_WIDTH > pipe_x):
+        return False
+
+    return ((player_y < upper_pipe_y + PIPE_HEIGHT
+             and player_y + PLAYER_HEIGHT > upper_pipe_y)
+            or (player_y < lower_pipe_y + PIPE_HEIGHT
+                and player_y + PLAYER_HEIGHT > lower_pipe_y))
+
+
+def player_hits_pipes(player_x: ArrayOrInt,
+                      player_y: ArrayOrInt,
+                      pipe_x: np.ndarray,
+                      upper_pipe_y: np.ndarray,
+                      lower_pipe_y: np.ndarray) -> np.ndarray:
+    """ Vectorized version of :func:`player_hits_pipe`.
+
+    Checks the player against many pairs of pipes at once. The arguments are
+    broadcast against each other, so this function can also be used to check
+    many players (e.g. with shape `(N, 1)`) against their own pipes (e.g. with
+    shape `(N, num_pipes)`).
+
+    Returns:
+        A boolean array with `True` for each pair of pipes the player hits.
+    """
+    x_overlap = ((player_x < pipe_x + PIPE_WIDTH)
+                 & (player_x + PLAYER_WIDTH > pipe_x))
+    up_overlap = ((player_y < upper_pipe_y + PIPE_HEIGHT)
+                  & (player_y + PLAYER_HEIGHT > upper_pipe_y))
+    low_overlap = ((player_y < lower_pipe_y + PIPE_HEIGHT)
+                   & (player_y + PLAYER_HEIGHT > lower_pipe_y))
+    return x_overlap & (up_overlap | low_overlap)
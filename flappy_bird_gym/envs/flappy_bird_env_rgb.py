@@ -1,14 +1,16 @@
-from typing import Dict, Tuple, Optional, Union
+from typing import Dict, List, Tuple, Optional, Union
 
 import gym
 import numpy as np
 import pygame
 
-from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+from flappy_bird_gym.envs.game_logic import COLLISION_MODES, FlappyBirdLogic
+from flappy_bird_gym.envs.game_logic import GAME_PARAMS, validate_params
+from flappy_bird_gym.envs.profiling import ProfilingMixin
 from flappy_bird_gym.envs.renderer import FlappyBirdRenderer
 
 
-class FlappyBirdEnvRGB(gym.Env):
+class FlappyBirdEnvRGB(gym.Env, ProfilingMixin):
     """  Flappy Bird Gym environment that yields images as observations.
     The observations yielded by this environment are RGB-arrays (images)
     representing the game's screen.
@@ -25,43 +27,255 @@ class FlappyBirdEnvRGB(gym.Env):
         background (Optional[str]): Type of background image. The currently
             available types are "day" and "night". If `None`, no background will
             be drawn.
+        pipe_schedule_size (int): If greater than 0, the heights of the pipes
+            are drawn in blocks of this size, with a single call to the random
+            generator (see :class:`.FlappyBirdLogic`).
+        frame_skip (int): Number of game ticks each call to :meth:`step`
+            advances the game by, repeating the action on each of them. Only
+            the last frame is rendered, and the reward is the sum of the
+            rewards of all the ticks. The step ends early if the player
+            crashes.
+        max_pool_frames (bool): If `True` (and `frame_skip` is greater than
+            1), the observation is the pixel-wise maximum of the last two
+            frames, instead of the last frame only.
+        copy_obs (bool): If `True`, each observation is a new array. If
+            `False`, the frames are copied into an array allocated once by the
+            environment, which is returned by every call to :meth:`step`,
+            :meth:`reset` and :meth:`set_state` (see below).
+        obs_buffer (Optional[np.ndarray]): Array, allocated by the caller,
+            into which the frames are copied (instead of an array allocated by
+            the environment). Must be a `uint8` array with the observations'
+            shape; it may be a view (e.g. a slot of a rollout buffer).
+            Implies `copy_obs=False`.
+        obs_size (Optional[Tuple[int, int]]): Width and height of the
+            observations. The renderer scales its sprites once and draws the
+            game directly at this resolution. If `None`, the screen's size is
+            used.
+        grayscale (bool): If `True`, the observations are grayscale images,
+            with shape `(height, width, frame_stack)` (or `(height, width)`,
+            if `channel_dim` is `False`). The renderer converts its sprites to
+            grayscale once, so no color conversion is done per frame.
+            Otherwise, the observations are RGB arrays with shape
+            `(width, height, 3)`.
+        frame_stack (int): Number of consecutive (grayscale) frames stacked
+            along the channel dimension of the observations, from the oldest
+            to the newest. The stack is kept in a ring buffer.
+        channel_dim (bool): Whether grayscale observations that aren't stacked
+            keep a channel dimension of size 1.
+        collision_mode (str): Engine used to check for collisions between the
+            player and the pipes (see :class:`.FlappyBirdLogic`). Use "pixel"
+            for pixel-perfect collisions with the sprites' hitmasks, instead
+            of their bounding boxes.
+
+    Lifetime and aliasing of the observations: when `copy_obs` is `False` or
+    an `obs_buffer` is given, the returned observation is the output buffer
+    itself. It is overwritten in place by the next call to :meth:`step`,
+    :meth:`reset` or :meth:`set_state`, so any observation that must outlive
+    the next call must be copied by the caller. The buffer is never
+    reallocated, so it can be read (e.g. by a stacking wrapper) without
+    calling the environment again. The buffer is a copy of the rendered
+    pixels, not a view of the renderer's surface: the surface itself is
+    never locked, and writing to the buffer doesn't affect the game. With
+    `grayscale=True` and `copy_obs=False`, the returned observation is a view
+    of the frame stack's ring buffer, with the same rules.
+
+    The time spent in each phase of the steps (the game's update, the
+    collision checks, the drawing of the frames and their extraction as
+    arrays) can be recorded with :meth:`enable_profiling` and read with
+    :meth:`get_perf_stats` (see :mod:`.profiling`).
     """
 
     metadata = {"render.modes": ["human", "rgb_array"]}
 
+    profiled_methods = {"step": "step",
+                        "_get_observation": "observation",
+                        "_surface_array": "array3d"}
+
     def __init__(self,
                  screen_size: Tuple[int, int] = (288, 512),
                  pipe_gap: int = 100,
                  bird_color: str = "yellow",
                  pipe_color: str = "green",
-                 background: Optional[str] = None) -> None:
+                 background: Optional[str] = None,
+                 pipe_schedule_size: int = 0,
+                 frame_skip: int = 1,
+                 max_pool_frames: bool = False,
+                 copy_obs: bool = True,
+                 obs_buffer: Optional[np.ndarray] = None,
+                 obs_size: Optional[Tuple[int, int]] = None,
+                 grayscale: bool = False,
+                 frame_stack: int = 1,
+                 channel_dim: bool = True,
+                 collision_mode: str = "arithmetic") -> None:
+        if frame_skip < 1:
+            raise ValueError("The frame skip must be at least 1!")
+        if collision_mode not in COLLISION_MODES:
+            raise ValueError(f"Invalid collision mode: \"{collision_mode}\"! "
+                             f"Available modes: {COLLISION_MODES}.")
+        if frame_stack < 1:
+            raise ValueError("The frame stack must be at least 1!")
+        if not grayscale and (frame_stack > 1 or not channel_dim):
+            raise ValueError("Frame stacking and observations without a "
+                             "channel dimension require `grayscale=True`!")
+        if frame_stack > 1 and not channel_dim:
+            raise ValueError("Stacked frames require a channel dimension!")
+
+        if obs_size is None:
+            obs_size = screen_size
+        width, height = obs_size
+        frame_shape = (height, width) if grayscale else (width, height, 3)
+        obs_shape = self.observation_shape(screen_size, obs_size, grayscale,
+                                           frame_stack, channel_dim)
+
+        if obs_buffer is not None:
+            if obs_buffer.shape != obs_shape or obs_buffer.dtype != np.uint8:
+                raise ValueError(f"The observation buffer must be an uint8 "
+                                 f"array with shape {obs_shape}!")
+        elif not copy_obs and not grayscale:
+            obs_buffer = np.empty(obs_shape, dtype=np.uint8)
+
         self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(0, 255, [*screen_size, 3])
+        if grayscale:
+            self.observation_space = gym.spaces.Box(0, 255, obs_shape,
+                                                    dtype=np.uint8)
+        else:
+            self.observation_space = gym.spaces.Box(0, 255, obs_shape)
 
         self._screen_size = screen_size
-        self._pipe_gap = pipe_gap
+        self._game_params = {"pipe_gap_size": pipe_gap}
+        self._pipe_schedule_size = pipe_schedule_size
+        self._frame_skip = frame_skip
+        self._collision_mode = collision_mode
+        self._max_pool_frames = max_pool_frames and frame_skip > 1
+        self._copy_obs = copy_obs
+        self._obs_buffer = obs_buffer
+        self._prev_frame = (np.empty(frame_shape, dtype=np.uint8)
+                            if self._max_pool_frames else None)
+        self._grayscale = grayscale
+        self._channel_dim = channel_dim
+        self._frame_stack = frame_stack
+
+        # Ring buffer of the (grayscale) stacked frames. Each frame is written
+        # to two slots, `i` and `i + frame_stack`, so the last `frame_stack`
+        # frames are always the contiguous slots `i + 1, ..., i + frame_stack`
+        # and the stack is a view of the buffer (no concatenation).
+        self._frames = (np.zeros((2 * frame_stack, *frame_shape),
+                                 dtype=np.uint8)
+                        if grayscale else None)
+        self._frame_idx = 0
+        self._rng = np.random.default_rng()
 
         self._game = None
         self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
+                                            audio_on=False,
                                             bird_color=bird_color,
                                             pipe_color=pipe_color,
-                                            background=background)
+                                            background=background,
+                                            output_size=obs_size,
+                                            grayscale=grayscale)
         self.curr_score = 0
 
-    def _get_observation(self):
+    @staticmethod
+    def observation_shape(screen_size: Tuple[int, int] = (288, 512),
+                          obs_size: Optional[Tuple[int, int]] = None,
+                          grayscale: bool = False,
+                          frame_stack: int = 1,
+                          channel_dim: bool = True) -> Tuple[int, ...]:
+        """ Returns the shape of the observations of an environment created
+        with the given arguments (without creating it). """
+        width, height = screen_size if obs_size is None else obs_size
+        if not grayscale:
+            return width, height, 3
+        return (height, width, frame_stack) if channel_dim else (height, width)
+
+    def _instrument(self) -> None:
+        super()._instrument()
+        if self._game is not None:
+            self._time_methods(self._game, self._game.profiled_methods)
+        self._time_methods(self._renderer, self._renderer.profiled_methods)
+
+    def _render_frame(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Renders the current frame and copies it into `out` (or into a new
+        array, if `None`). """
         self._renderer.draw_surface(show_score=False)
-        arr = pygame.surfarray.array3d(self._renderer.surface)
-        return arr
+        if self._grayscale:
+            return self._renderer.gray_frame(out)
+        return self._surface_array(out)
+
+    def _surface_array(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Copies the renderer's surface into `out` (or into a new array,
+        if `None`). """
+        if out is None:
+            return pygame.surfarray.array3d(self._renderer.surface)
+
+        pygame.pixelcopy.surface_to_array(out, self._renderer.surface)
+        return out
+
+    def _get_observation(self,
+                         prev_frame: Optional[np.ndarray] = None,
+                         reset: bool = False) -> np.ndarray:
+        """ Renders the current frame and returns the observation.
+
+        Args:
+            prev_frame (Optional[np.ndarray]): If given, the rendered frame is
+                max-pooled with it.
+            reset (bool): Whether this is the first frame of a game (which
+                then fills the whole frame stack).
+        """
+        if not self._grayscale:
+            obs = self._render_frame(self._obs_buffer)
+            if prev_frame is not None:
+                np.maximum(obs, prev_frame, out=obs)
+            return obs
+
+        frames, k = self._frames, self._frame_stack
+        i = 0 if reset else self._frame_idx
+        frame = self._render_frame(frames[i])
+        if prev_frame is not None:
+            np.maximum(frame, prev_frame, out=frame)
+        if reset:
+            frames[:] = frame
+        else:
+            frames[i + k] = frame
+        self._frame_idx = (i + 1) % k
 
-    def reset(self):
+        stack = frames[i + 1:i + 1 + k]
+        obs = stack.transpose(1, 2, 0) if self._channel_dim else stack[0]
+        if self._obs_buffer is not None:
+            np.copyto(self._obs_buffer, obs)
+            return self._obs_buffer
+        return obs.copy() if self._copy_obs else obs
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """ Seeds the generator of the pipes' heights. The following games
+        (started by :meth:`reset`) continue the generator's stream.
+        """
+        self._rng = np.random.default_rng(seed)
+        return [seed]
+
+    def reset(self, seed: Optional[int] = None):
         """ Resets the environment (starts a new game).
+        Args:
+            seed (Optional[int]): If not `None`, the environment is seeded with
+                it (see :meth:`seed`) before the new game starts.
         """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
+        if seed is not None:
+            self.seed(seed)
+
+        self._game = FlappyBirdLogic(
+            screen_size=self._screen_size,
+            rng=self._rng,
+            pipe_schedule_size=self._pipe_schedule_size,
+            frame_skip=self._frame_skip,
+            collision_mode=self._collision_mode,
+            **self._game_params,
+        )
 
         self._renderer.game = self._game
+        self._refresh_profiling()
+
         self.curr_score = 0
-        return self._get_observation()
+        return self._get_observation(reset=True)
 
     def step(self,
              action: Union[FlappyBirdLogic.Actions, int],
@@ -78,21 +292,66 @@ class FlappyBirdEnvRGB(gym.Env):
                   otherwise);
                 * an info dictionary.
         """
-        alive = self._game.update_state(action)
-        obs = self._get_observation()
-
-        # reward = 1
-        if self._game.score - self.curr_score == 1:
-            reward = 2          # sparse + dense
-            self.curr_score += 1
+        game = self._game
+        if self._max_pool_frames:
+            alive = game.advance(action, self._frame_skip - 1)
+            ticks = game.last_ticks
+            if alive:
+                prev_frame = self._render_frame(self._prev_frame)
+                alive = game.advance(action, 1)
+                ticks += 1
+                obs = self._get_observation(prev_frame=prev_frame)
+            else:
+                obs = self._get_observation()
         else:
-            reward = 1      # sparse + dense
+            alive = game.update_state(action)
+            ticks = game.last_ticks
+            obs = self._get_observation()
+
+        # 1 for each tick, plus 1 for each point scored (sparse + dense)
+        reward = ticks + game.score - self.curr_score
+        self.curr_score = game.score
 
         done = not alive
         info = {"score": self._game.score}
 
         return obs, reward, done, info
 
+    def get_state(self) -> bytes:
+        """ Returns a snapshot of the current game (see
+        :meth:`.FlappyBirdLogic.get_state`).
+        """
+        return self._game.get_state()
+
+    def set_state(self, state: bytes) -> np.ndarray:
+        """ Restores a snapshot made by :meth:`get_state` and returns the
+        observation of the restored game.
+        """
+        if self._game is None:
+            self.reset()
+
+        self._game.set_state(state)
+        self.curr_score = self._game.score
+        return self._get_observation(reset=True)
+
+    def get_difficulty(self) -> Dict[str, int]:
+        """ Returns the parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`).
+        """
+        return {**GAME_PARAMS, **self._game_params}
+
+    def set_difficulty(self, **params: int) -> None:
+        """ Changes parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`), e.g. `set_difficulty(pipe_gap_size=80)`,
+        without re-creating the environment. The game in progress is changed
+        in place (see :meth:`.FlappyBirdLogic.set_params`) and the following
+        games start with the new parameters.
+        """
+        validate_params(params, self._screen_size[1] * 0.79)
+        self._game_params.update(params)
+        if self._game is not None:
+            self._game.set_params(**params)
+
     def render(self, mode="human") -> Optional[np.ndarray]:
         """ Renders the environment.
         If ``mode`` is:
@@ -112,10 +371,12 @@ class FlappyBirdEnvRGB(gym.Env):
 
         self._renderer.draw_surface(show_score=True)
         if mode == "rgb_array":
-            return pygame.surfarray.array3d(self._renderer.surface)
+            return self._surface_array()
         else:
             if self._renderer.display is None:
                 self._renderer.make_display()
+                # (the audio is only played in the human mode)
+                self._renderer.audio_on = True
 
             self._renderer.update_display()
 
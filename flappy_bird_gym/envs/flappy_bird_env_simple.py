@@ -1,33 +1,47 @@
 """ Implementation of a Flappy Bird OpenAI Gym environment that yields simple
 numerical information about the game's state as observations.
+
+A single configurable environment, :class:`FlappyBirdEnvSimple`, builds the
+observations and rewards of all the simple environments. The other classes of
+this module are presets of it, kept for the registered environment IDs.
 """
 
-from typing import Dict, Tuple, Optional, Union
+from typing import Dict, List, Tuple, Optional, Sequence, Union
 
 import gym
 import numpy as np
-import pygame
 
-from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
-from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
-from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
-# from flappy_bird_gym.envs.game_logic import 
-from flappy_bird_gym.envs.renderer import FlappyBirdRenderer
+from flappy_bird_gym.envs.game_logic import COLLISION_MODES, FlappyBirdLogic
+from flappy_bird_gym.envs.game_logic import GAME_PARAMS, validate_params
+from flappy_bird_gym.envs.observations import ObservationBuilder
+from flappy_bird_gym.envs.observations import with_lookahead
+from flappy_bird_gym.envs.profiling import ProfilingMixin
+from flappy_bird_gym.envs.rewards import REWARD_FUNCTIONS, RewardFunction
 
 
-class FlappyBirdEnvSimple(gym.Env):
+class FlappyBirdEnvSimple(gym.Env, ProfilingMixin):
     """ Flappy Bird Gym environment that yields simple observations.
 
     The observations yielded by this environment are simple numerical
-    information about the game's state. Specifically, the observations are:
+    information about the game's state. By default, the observations are:
 
         * Horizontal distance to the next pipe;
         * Difference between the player's y position and the next hole's y
           position.
 
-    The reward received by the agent in each step is equal to the score obtained
-    by the agent in that step. A score point is obtained every time the bird
-    passes a pipe.
+    Other features can be chosen through the `observations` argument (see
+    :mod:`.observations`). The observations are computed in a single pass and
+    written into a preallocated `float32` buffer.
+
+    By default, the reward received by the agent in each step is
+    `1 - |v_dist|`, where `v_dist` is the (normalized) difference between the
+    player's y position and the next hole's y position. Other reward functions
+    can be chosen through the `reward` argument (see :mod:`.rewards`).
+
+    The time spent in each phase of the steps (the game's update, the
+    collision checks, the observations, the rewards and the rendering) can be
+    recorded with :meth:`enable_profiling` and read with
+    :meth:`get_perf_stats` (see :mod:`.profiling`).
 
     Args:
         screen_size (Tuple[int, int]): The screen's width and height.
@@ -41,58 +55,121 @@ class FlappyBirdEnvSimple(gym.Env):
         background (Optional[str]): Type of background image. The currently
             available types are "day" and "night". If `None`, no background will
             be drawn.
+        pipe_schedule_size (int): If greater than 0, the heights of the pipes
+            are drawn in blocks of this size, with a single call to the random
+            generator (see :class:`.FlappyBirdLogic`).
+        observations (Optional[Sequence[str]]): Names of the observation
+            features (see :data:`.OBSERVATION_FEATURES`). If `None`, the
+            class' :attr:`default_observations` are used.
+        reward (Union[str, RewardFunction, None]): Name of a reward function
+            (see :data:`.REWARD_FUNCTIONS`) or a custom reward function. If
+            `None`, the class' :attr:`default_reward` is used.
+        copy_obs (bool): If `True`, a new array is returned as the observation
+            of each step. If `False`, the environment's observation buffer is
+            returned instead, which is overwritten by the next call to
+            :meth:`step` or :meth:`reset`.
+        frame_skip (int): Number of game ticks each call to :meth:`step`
+            advances the game by, repeating the action on each of them. The
+            observation is only computed after the last tick, while the reward
+            is the sum of the rewards of all the ticks. The step ends early if
+            the player crashes.
+        dirty_rects (bool): If `True`, :meth:`render` only redraws and updates
+            the areas of the display that changed since the last frame (see
+            :class:`.FlappyBirdRenderer`).
+        collision_mode (str): Engine used to check for collisions between the
+            player and the pipes (see :class:`.FlappyBirdLogic`). Use "pixel"
+            for pixel-perfect collisions with the sprites' hitmasks, instead
+            of their bounding boxes.
+        lookahead_pipes (int): Number of gaps, after the next one, whose
+            distances are appended to the observations (e.g. 2 appends the
+            features "h_dist_2", "v_dist_2", "h_dist_3" and "v_dist_3", except
+            the ones already observed; see :func:`.lookahead_features`).
     """
 
     metadata = {'render.modes': ['human']}
 
+    #: Observation features used when none are given.
+    default_observations: Tuple[str, ...] = ("h_dist", "v_dist")
+
+    #: Reward function used when none is given.
+    default_reward: str = "dense"
+
+    profiled_methods = {"step": "step",
+                        "_get_observation": "observation",
+                        "_reward_fn": "reward"}
+
     def __init__(self,
                  screen_size: Tuple[int, int] = (288, 512),
                  normalize_obs: bool = True,
                  pipe_gap: int = 100,
                  bird_color: str = "yellow",
                  pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
+                 background: Optional[str] = "day",
+                 pipe_schedule_size: int = 0,
+                 observations: Optional[Sequence[str]] = None,
+                 reward: Union[str, RewardFunction, None] = None,
+                 copy_obs: bool = True,
+                 frame_skip: int = 1,
+                 dirty_rects: bool = False,
+                 collision_mode: str = "arithmetic",
+                 lookahead_pipes: int = 0) -> None:
+        if frame_skip < 1:
+            raise ValueError("The frame skip must be at least 1!")
+        if collision_mode not in COLLISION_MODES:
+            raise ValueError(f"Invalid collision mode: \"{collision_mode}\"! "
+                             f"Available modes: {COLLISION_MODES}.")
+        if observations is None:
+            observations = self.default_observations
+        observations = with_lookahead(observations, lookahead_pipes)
+        if reward is None:
+            reward = self.default_reward
+        if isinstance(reward, str):
+            if reward not in REWARD_FUNCTIONS:
+                raise ValueError(f"Invalid reward function: \"{reward}\"! "
+                                 f"Available functions: "
+                                 f"{tuple(REWARD_FUNCTIONS)}.")
+            reward = REWARD_FUNCTIONS[reward]
+
+        self._obs_builder = ObservationBuilder(observations,
+                                               screen_size=screen_size,
+                                               normalize=normalize_obs)
+        self._reward_fn = reward
+        self._copy_obs = copy_obs
+        self._frame_skip = frame_skip
+
         self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf,
-                                                shape=(2,),
-                                                dtype=np.float32)
+        self.observation_space = gym.spaces.Box(
+            -np.inf, np.inf,
+            shape=(self._obs_builder.size,),
+            dtype=np.float32,
+        )
         self._screen_size = screen_size
         self._normalize_obs = normalize_obs
-        self._pipe_gap = pipe_gap
+        self._game_params = {"pipe_gap_size": pipe_gap}
+        self._pipe_schedule_size = pipe_schedule_size
+        self._rng = np.random.default_rng()
 
         self._game = None
         self._renderer = None
+        self.curr_score = 0
 
         self._bird_color = bird_color
         self._pipe_color = pipe_color
         self._bg_type = background
+        self._dirty_rects = dirty_rects
+        self._collision_mode = collision_mode
 
-    def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
-                break
-
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
-        player_y = self._game.player_y
-
-        v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT/2)
-
-        if self._normalize_obs:
-            h_dist /= self._screen_size[0]
-            v_dist /= self._screen_size[1]
+    def _instrument(self) -> None:
+        super()._instrument()
+        if self._game is not None:
+            self._time_methods(self._game, self._game.profiled_methods)
+        if self._renderer is not None:
+            self._time_methods(self._renderer,
+                               self._renderer.profiled_methods)
 
-        return np.array([
-            h_dist,
-            v_dist,
-        ])
+    def _get_observation(self) -> np.ndarray:
+        obs = self._obs_builder(self._game)
+        return obs.copy() if self._copy_obs else obs
 
     def step(self,
              action: Union[FlappyBirdLogic.Actions, int],
@@ -106,379 +183,107 @@ class FlappyBirdEnvSimple(gym.Env):
         Returns:
             A tuple containing, respectively:
 
-                * an observation (horizontal distance to the next pipe;
-                  difference between the player's y position and the next hole's
-                  y position);
+                * an observation (the chosen observation features);
+                * a reward;
                 * a status report (`True` if the game is over and `False`
                   otherwise);
                 * an info dictionary.
         """
-        alive = self._game.update_state(action)
-        obs = self._get_observation()
-
-        reward = 1 - abs(obs[1])
-
-        done = not alive
-        info = {"score": self._game.score}
-
-        return obs, reward, done, info
-
-    def reset(self):
-        """ Resets the environment (starts a new game). """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
-        if self._renderer is not None:
-            self._renderer.game = self._game
-
-        return self._get_observation()
-
-    def render(self, mode='human') -> None:
-        """ Renders the next frame. """
-        if self._renderer is None:
-            self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
-                                                bird_color=self._bird_color,
-                                                pipe_color=self._pipe_color,
-                                                background=self._bg_type)
-            self._renderer.game = self._game
-            self._renderer.make_display()
-
-        self._renderer.draw_surface(show_score=True)
-        self._renderer.update_display()
-
-    def close(self):
-        """ Closes the environment. """
-        if self._renderer is not None:
-            pygame.display.quit()
-            self._renderer = None
-        super().close()
-
-class FlappyBirdEnvAdvance(gym.Env):
-    """ Flappy Bird Gym environment that yields simple observations.
-
-    """
-    metadata = {'render.modes': ['human']}
-
-    def __init__(self,
-                 screen_size: Tuple[int, int] = (288, 512),
-                 normalize_obs: bool = True,
-                 pipe_gap: int = 100,
-                 bird_color: str = "yellow",
-                 pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
-        self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf,
-                                                shape=(2,),
-                                                dtype=np.float32)
-        self._screen_size = screen_size
-        self._normalize_obs = normalize_obs
-        self._pipe_gap = pipe_gap
-
-        self._game = None
-        self._renderer = None
-
-        self._bird_color = bird_color
-        self._pipe_color = pipe_color
-        self._bg_type = background
-        self.curr_score = 0
-
-    def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
+        game = self._game
+        reward_fn = self._reward_fn
+        reward = 0
+        for tick in range(self._frame_skip, 0, -1):
+            alive = game.update_state(action)
+            scored = game.score - self.curr_score == 1
+            if scored:
+                self.curr_score += 1
+
+            if tick == 1 or not alive:
                 break
+            reward += reward_fn(self._obs_builder.v_distance(game), scored)
 
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
-        player_y = self._game.player_y
-
-        v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT/2)
-
-        if self._normalize_obs:
-            h_dist /= self._screen_size[0]
-            v_dist /= self._screen_size[1]
-
-        return np.array([
-            h_dist,
-            v_dist,
-        ])
-
-    def step(self,
-             action: Union[FlappyBirdLogic.Actions, int],
-    ) -> Tuple[np.ndarray, float, bool, Dict]:
-        """ Given an action, updates the game state.
-        """
-        alive = self._game.update_state(action)
         obs = self._get_observation()
-        
-        info = {"score": self._game.score}
-
-        if self._game.score - self.curr_score == 1:
-            reward = 2          # sparse + dense
-            self.curr_score += 1
-        else:
-            reward = 1 - abs(obs[1])      # sparse + dense
+        reward += reward_fn(self._obs_builder.v_dist, scored)
 
         done = not alive
+        info = {"score": self._game.score}
 
         return obs, reward, done, info
 
-    def reset(self):
-        """ Resets the environment (starts a new game). """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
-        if self._renderer is not None:
-            self._renderer.game = self._game
-
-        self.curr_score = 0
-        return self._get_observation()
-
-    def render(self, mode='human') -> None:
-        """ Renders the next frame. """
-        if self._renderer is None:
-            self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
-                                                bird_color=self._bird_color,
-                                                pipe_color=self._pipe_color,
-                                                background=self._bg_type)
-            self._renderer.game = self._game
-            self._renderer.make_display()
-
-        self._renderer.draw_surface(show_score=True)
-        self._renderer.update_display()
-
-    def close(self):
-        """ Closes the environment. """
-        if self._renderer is not None:
-            pygame.display.quit()
-            self._renderer = None
-        super().close()
-
-class FlappyBirdEnvThreeObservations(gym.Env):
-    """ Flappy Bird Gym environment that yields simple observations.
-
-    """
-    metadata = {'render.modes': ['human']}
-
-    def __init__(self,
-                 screen_size: Tuple[int, int] = (288, 512),
-                 normalize_obs: bool = True,
-                 pipe_gap: int = 100,
-                 bird_color: str = "yellow",
-                 pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
-        self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf,
-                                                shape=(3,),
-                                                dtype=np.float32)
-        self._screen_size = screen_size
-        self._normalize_obs = normalize_obs
-        self._pipe_gap = pipe_gap
-
-        self._game = None
-        self._renderer = None
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """ Seeds the generator of the pipes' heights. The following games
+        (started by :meth:`reset`) continue the generator's stream. """
+        self._rng = np.random.default_rng(seed)
+        return [seed]
 
-        self._bird_color = bird_color
-        self._pipe_color = pipe_color
-        self._bg_type = background
-        self.curr_score = 0
-
-    def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
-                break
+    def reset(self, seed: Optional[int] = None):
+        """ Resets the environment (starts a new game).
 
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
-        player_y = self._game.player_y
-
-        v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT / 2)
-
-        if self._normalize_obs:
-            h_dist /= self._screen_size[0]
-            v_dist /= self._screen_size[1]
-
-        return np.array([
-            h_dist,
-            v_dist,
-            self._game.player_vel_y])
-
-    def step(self,
-             action: Union[FlappyBirdLogic.Actions, int],
-             ) -> Tuple[np.ndarray, float, bool, Dict]:
-
-        """ Given an action, updates the game state.
+        Args:
+            seed (Optional[int]): If not `None`, the environment is seeded with
+                it (see :meth:`seed`) before the new game starts.
         """
-        alive = self._game.update_state(action)
-        obs = self._get_observation()
-        info = {"score": self._game.score}
-
-        if self._game.score - self.curr_score == 1:
-            reward = 2  # sparse + dense
-            self.curr_score += 1
-        else:
-            reward = 1 - abs(obs[1])  # sparse + dense
-
-        done = not alive
-
-        return obs, reward, done, info
-
-    def reset(self):
-        """ Resets the environment (starts a new game). """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
+        if seed is not None:
+            self.seed(seed)
+
+        self._game = FlappyBirdLogic(
+            screen_size=self._screen_size,
+            rng=self._rng,
+            pipe_schedule_size=self._pipe_schedule_size,
+            collision_mode=self._collision_mode,
+            **self._game_params,
+        )
         if self._renderer is not None:
             self._renderer.game = self._game
+        self._refresh_profiling()
 
         self.curr_score = 0
         return self._get_observation()
 
-    def render(self, mode='human') -> None:
-        """ Renders the next frame. """
-        if self._renderer is None:
-            self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
-                                                bird_color=self._bird_color,
-                                                pipe_color=self._pipe_color,
-                                                background=self._bg_type)
-            self._renderer.game = self._game
-            self._renderer.make_display()
-
-        self._renderer.draw_surface(show_score=True)
-        self._renderer.update_display()
-
-    def close(self):
-        """ Closes the environment. """
-        if self._renderer is not None:
-            pygame.display.quit()
-            self._renderer = None
-        super().close()
-
-class FlappyBirdEnvFourObservations(gym.Env):
-    """ Flappy Bird Gym environment that yields simple observations.
-
-    """
-    metadata = {'render.modes': ['human']}
-
-    def __init__(self,
-                 screen_size: Tuple[int, int] = (288, 512),
-                 normalize_obs: bool = True,
-                 pipe_gap: int = 100,
-                 bird_color: str = "yellow",
-                 pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
-        self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf,
-                                                shape=(4,),
-                                                dtype=np.float32)
-        self._screen_size = screen_size
-        self._normalize_obs = normalize_obs
-        self._pipe_gap = pipe_gap
-
-        self._game = None
-        self._renderer = None
-
-        self._bird_color = bird_color
-        self._pipe_color = pipe_color
-        self._bg_type = background
-        self.curr_score = 0
-
-    def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
-                break
-
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
-        player_y = self._game.player_y
-
-        v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT / 2)
-
-        if self._normalize_obs:
-            h_dist /= self._screen_size[0]
-            v_dist /= self._screen_size[1]
-
-        up_pipe_2 = low_pipe_2 = None
-        h_dist_2 = 0
-        up_pipe_2 = self._game.upper_pipes[1]
-        low_pipe_2 = self._game.lower_pipes[1]
-        h_dist_2 = (low_pipe_2["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-        h_dist_2 += 3  # extra distance to compensate for the buggy hit-box
-
-        upper_pipe_y = up_pipe_2["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe_2["y"]
-        player_y = self._game.player_y
-
-        v_dist_2 = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT / 2)
-
-        if self._normalize_obs:
-            h_dist_2 /= self._screen_size[0]
-            v_dist_2 /= self._screen_size[1]
-
-        return np.array([
-            h_dist,
-            v_dist,
-            h_dist_2,
-            v_dist_2])
-
-    def step(self,
-             action: Union[FlappyBirdLogic.Actions, int],
-             ) -> Tuple[np.ndarray, float, bool, Dict]:
-
-        """ Given an action, updates the game state.
-        """
-        alive = self._game.update_state(action)
-        obs = self._get_observation()
-        info = {"score": self._game.score}
-
-        if self._game.score - self.curr_score == 1:
-            reward = 2  # sparse + dense
-            self.curr_score += 1
-        else:
-            reward = 1 - abs(obs[1])  # sparse + dense
+    def get_state(self) -> bytes:
+        """ Returns a snapshot of the current game (see
+        :meth:`.FlappyBirdLogic.get_state`). """
+        return self._game.get_state()
 
-        done = not alive
+    def set_state(self, state: bytes) -> np.ndarray:
+        """ Restores a snapshot made by :meth:`get_state` and returns the
+        observation of the restored game. """
+        if self._game is None:
+            self.reset()
 
-        return obs, reward, done, info
-
-    def reset(self):
-        """ Resets the environment (starts a new game). """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
-        if self._renderer is not None:
-            self._renderer.game = self._game
-
-        self.curr_score = 0
+        self._game.set_state(state)
+        self.curr_score = self._game.score
         return self._get_observation()
 
+    def get_difficulty(self) -> Dict[str, int]:
+        """ Returns the parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`). """
+        return {**GAME_PARAMS, **self._game_params}
+
+    def set_difficulty(self, **params: int) -> None:
+        """ Changes parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`), e.g. `set_difficulty(pipe_gap_size=80)`,
+        without re-creating the environment. The game in progress is changed
+        in place (see :meth:`.FlappyBirdLogic.set_params`) and the following
+        games start with the new parameters. """
+        validate_params(params, self._screen_size[1] * 0.79)
+        self._game_params.update(params)
+        if self._game is not None:
+            self._game.set_params(**params)
+
     def render(self, mode='human') -> None:
         """ Renders the next frame. """
         if self._renderer is None:
+            # (imported here, so pygame is only loaded when rendering)
+            from flappy_bird_gym.envs.renderer import FlappyBirdRenderer
             self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
                                                 bird_color=self._bird_color,
                                                 pipe_color=self._pipe_color,
-                                                background=self._bg_type)
+                                                background=self._bg_type,
+                                                dirty_rects=self._dirty_rects)
             self._renderer.game = self._game
             self._renderer.make_display()
+            self._refresh_profiling()
 
         self._renderer.draw_surface(show_score=True)
         self._renderer.update_display()
@@ -486,132 +291,37 @@ class FlappyBirdEnvFourObservations(gym.Env):
     def close(self):
         """ Closes the environment. """
         if self._renderer is not None:
+            import pygame
             pygame.display.quit()
             self._renderer = None
         super().close()
 
-class FlappyBirdEnvFourObsSparse(gym.Env):
-    """ Flappy Bird Gym environment that yields simple observations.
-
-    """
-    metadata = {'render.modes': ['human']}
-
-    def __init__(self,
-                 screen_size: Tuple[int, int] = (288, 512),
-                 normalize_obs: bool = True,
-                 pipe_gap: int = 100,
-                 bird_color: str = "yellow",
-                 pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
-        self.action_space = gym.spaces.Discrete(2)
-        self.observation_space = gym.spaces.Box(-np.inf, np.inf,
-                                                shape=(4,),
-                                                dtype=np.float32)
-        self._screen_size = screen_size
-        self._normalize_obs = normalize_obs
-        self._pipe_gap = pipe_gap
-
-        self._game = None
-        self._renderer = None
-
-        self._bird_color = bird_color
-        self._pipe_color = pipe_color
-        self._bg_type = background
-        self.curr_score = 0
-
-    def _get_observation(self):
-        up_pipe = low_pipe = None
-        h_dist = 0
-        for up_pipe, low_pipe in zip(self._game.upper_pipes,
-                                     self._game.lower_pipes):
-            h_dist = (low_pipe["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-            h_dist += 3  # extra distance to compensate for the buggy hit-box
-            if h_dist >= 0:
-                break
-
-        upper_pipe_y = up_pipe["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe["y"]
-        player_y = self._game.player_y
 
-        v_dist = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT / 2)
+class FlappyBirdEnvAdvance(FlappyBirdEnvSimple):
+    """ :class:`FlappyBirdEnvSimple` preset that rewards each point scored
+    with 2 (and uses the dense reward otherwise). """
 
-        if self._normalize_obs:
-            h_dist /= self._screen_size[0]
-            v_dist /= self._screen_size[1]
+    default_reward = "sparse_dense"
 
-        up_pipe_2 = low_pipe_2 = None
-        h_dist_2 = 0
-        up_pipe_2 = self._game.upper_pipes[1]
-        low_pipe_2 = self._game.lower_pipes[1]
-        h_dist_2 = (low_pipe_2["x"] + PIPE_WIDTH / 2
-                      - (self._game.player_x - PLAYER_WIDTH / 2))
-        h_dist_2 += 3  # extra distance to compensate for the buggy hit-box
 
-        upper_pipe_y = up_pipe_2["y"] + PIPE_HEIGHT
-        lower_pipe_y = low_pipe_2["y"]
-        player_y = self._game.player_y
+class FlappyBirdEnvThreeObservations(FlappyBirdEnvSimple):
+    """ :class:`FlappyBirdEnvAdvance` preset that also observes the player's
+    vertical velocity. """
 
-        v_dist_2 = (upper_pipe_y + lower_pipe_y) / 2 - (player_y
-                                                      + PLAYER_HEIGHT / 2)
+    default_observations = ("h_dist", "v_dist", "vel_y")
+    default_reward = "sparse_dense"
 
-        if self._normalize_obs:
-            h_dist_2 /= self._screen_size[0]
-            v_dist_2 /= self._screen_size[1]
 
-        return np.array([
-            h_dist,
-            v_dist,
-            h_dist_2,
-            v_dist_2])
+class FlappyBirdEnvFourObservations(FlappyBirdEnvSimple):
+    """ :class:`FlappyBirdEnvAdvance` preset that also observes the distances
+    to the pair of pipes after the next one. """
 
-    def step(self,
-             action: Union[FlappyBirdLogic.Actions, int],
-             ) -> Tuple[np.ndarray, float, bool, Dict]:
-
-        """ Given an action, updates the game state.
-        """
-        alive = self._game.update_state(action)
-        obs = self._get_observation()
-        info = {"score": self._game.score}
-
-        if self._game.score - self.curr_score == 1:
-            reward = 3  # sparse
-            self.curr_score += 1
-        else:
-            reward = 1  # dense
-
-        done = not alive
-
-        return obs, reward, done, info
-
-    def reset(self):
-        """ Resets the environment (starts a new game). """
-        self._game = FlappyBirdLogic(screen_size=self._screen_size,
-                                     pipe_gap_size=self._pipe_gap)
-        if self._renderer is not None:
-            self._renderer.game = self._game
-
-        self.curr_score = 0
-        return self._get_observation()
+    default_observations = ("h_dist", "v_dist", "h_dist_2", "v_dist_2")
+    default_reward = "sparse_dense"
 
-    def render(self, mode='human') -> None:
-        """ Renders the next frame. """
-        if self._renderer is None:
-            self._renderer = FlappyBirdRenderer(screen_size=self._screen_size,
-                                                bird_color=self._bird_color,
-                                                pipe_color=self._pipe_color,
-                                                background=self._bg_type)
-            self._renderer.game = self._game
-            self._renderer.make_display()
 
-        self._renderer.draw_surface(show_score=True)
-        self._renderer.update_display()
+class FlappyBirdEnvFourObsSparse(FlappyBirdEnvFourObservations):
+    """ :class:`FlappyBirdEnvFourObservations` preset that rewards each point
+    scored with 3 and each step survived with 1. """
 
-    def close(self):
-        """ Closes the environment. """
-        if self._renderer is not None:
-            pygame.display.quit()
-            self._renderer = None
-        super().close()
+    default_reward = "sparse_survival"
@@ -0,0 +1,357 @@
+""" Implementation of vectorized versions of the Flappy Bird environments that
+yield simple numerical observations.
+
+All the games of a vector environment are simulated by a single
+:class:`.FlappyBirdBatchLogic`, so stepping N games costs one call instead of
+N calls to single environments (as when they're wrapped in a `DummyVecEnv` or
+`SubprocVecEnv`).
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import gym
+import numpy as np
+
+from flappy_bird_gym.envs.batch_logic import FlappyBirdBatchLogic
+from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
+from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
+from flappy_bird_gym.envs.observations import GAP_FEATURES, with_lookahead
+from flappy_bird_gym.envs.profiling import ProfilingMixin
+
+
+class FlappyBirdVecEnvSimple(gym.vector.VectorEnv, ProfilingMixin):
+    """ Vectorized version of :class:`.FlappyBirdEnvSimple`.
+
+    Steps `num_envs` games at once. The observations, rewards and done flags
+    of all the games are returned as stacked arrays, with the observations
+    having shape `(num_envs, obs_dim)` and dtype `float32`. Games that end are
+    automatically reset in place: the observation returned for them is the
+    first observation of the new game, while the last observation of the
+    finished game is stored in `info["terminal_observation"]`.
+
+    The parameters of the games' physics and pipes (see :data:`.GAME_PARAMS`)
+    can be changed in place, per game, with :meth:`set_difficulty` (e.g. by a
+    :class:`.DifficultyScheduler`).
+
+    The time spent in each phase of the steps can be recorded with
+    :meth:`enable_profiling` and read with :meth:`get_perf_stats` (see
+    :mod:`.profiling`).
+
+    Args:
+        num_envs (int): Number of games to simulate.
+        screen_size (Tuple[int, int]): The screen's width and height.
+        normalize_obs (bool): If `True`, the observations will be normalized
+            before being returned.
+        pipe_gap (int): Space between a lower and an upper pipe.
+        seed (Optional[int]): Seed for the generator of the pipes' heights.
+        frame_skip (int): Number of game ticks each step advances the games
+            by, repeating the actions on each of them. The observations are
+            only computed after the last tick, while the rewards are the sums of
+            the rewards of all the ticks. A game that ends during a step isn't
+            advanced by the step's remaining ticks.
+        backend (str): Backend of the game logic: "numpy" (a
+            :class:`.FlappyBirdBatchLogic`) or "numba" (a
+            :class:`.FlappyBirdNumbaBatchLogic`, whose compiled kernels run
+            each whole step, observations and rewards included, in a single
+            call). The "numba" backend falls back, with a warning, to "numpy"
+            if Numba isn't installed. Both backends yield the same games.
+        lookahead_pipes (int): Number of gaps, after the next one, whose
+            distances are appended to the observations (see
+            :class:`.FlappyBirdEnvSimple`).
+
+    Attributes:
+        features (Tuple[str, ...]): Names of the observation features (see
+            :data:`.OBSERVATION_FEATURES`).
+        obs_dim (int): Number of values in the observation of a single game.
+    """
+
+    metadata = {'render.modes': []}
+
+    #: Observation features (see :data:`.OBSERVATION_FEATURES`). The first
+    #: two must be "h_dist" and "v_dist".
+    default_observations: Tuple[str, ...] = ("h_dist", "v_dist")
+
+    #: Reward function (see :data:`.KERNEL_REWARDS`) computed by the kernels
+    #: of the "numba" backend. Must match :meth:`_get_rewards`.
+    kernel_reward: str = "dense"
+
+    profiled_methods = {"step": "step",
+                        "_update_observations": "observation",
+                        "_get_rewards": "reward"}
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 normalize_obs: bool = True,
+                 pipe_gap: int = 100,
+                 seed: Optional[int] = None,
+                 frame_skip: int = 1,
+                 backend: str = "numpy",
+                 lookahead_pipes: int = 0) -> None:
+        if frame_skip < 1:
+            raise ValueError("The frame skip must be at least 1!")
+        self.features = with_lookahead(self.default_observations,
+                                       lookahead_pipes)
+        self.obs_dim = len(self.features)
+
+        super().__init__(
+            num_envs=num_envs,
+            observation_space=gym.spaces.Box(-np.inf, np.inf,
+                                             shape=(self.obs_dim,),
+                                             dtype=np.float32),
+            action_space=gym.spaces.Discrete(2),
+        )
+        self._screen_size = screen_size
+        self._normalize_obs = normalize_obs
+        self._frame_skip = frame_skip
+        # (indices of the kernels' observation features, if they're used)
+        self._kernel_features = None
+        if backend == "numpy":
+            self._game = FlappyBirdBatchLogic(num_games=num_envs,
+                                              screen_size=screen_size,
+                                              pipe_gap_size=pipe_gap,
+                                              seed=seed)
+        else:
+            # (imported here, so Numba is only loaded when it's requested)
+            from flappy_bird_gym.envs import numba_backend
+            self._game = numba_backend.make_batch_logic(
+                backend, num_games=num_envs, screen_size=screen_size,
+                pipe_gap_size=pipe_gap, seed=seed,
+            )
+            if isinstance(self._game,
+                          numba_backend.FlappyBirdNumbaBatchLogic):
+                self._kernel_features = numba_backend.feature_codes(
+                    self.features)
+        self._obs = np.zeros((num_envs, self.obs_dim), dtype=np.float32)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+
+    def _instrument(self) -> None:
+        super()._instrument()
+        self._time_methods(self._game, self._game.profiled_methods)
+
+    def _gap_distances(self, pipe: np.ndarray) -> Tuple[np.ndarray,
+                                                         np.ndarray]:
+        """ Returns the horizontal distances to the given pipes and the
+        differences between the players' y positions and the pipes' gaps.
+
+        Args:
+            pipe (np.ndarray): The index, in each game, of the pipe pair to
+                compute the distances to.
+        """
+        game = self._game
+        slot = game.pipe_slot(pipe)
+        pipe_x = game.pipe_x[game._all, slot]
+        upper_pipe_y = game.upper_pipe_y[game._all, slot] + PIPE_HEIGHT
+        lower_pipe_y = game.lower_pipe_y[game._all, slot]
+
+        h_dist = pipe_x + PIPE_WIDTH / 2 - (game.player_x - PLAYER_WIDTH / 2)
+        h_dist += 3  # extra distance to compensate for the buggy hit-box
+        v_dist = ((upper_pipe_y + lower_pipe_y) / 2
+                  - (game.player_y + PLAYER_HEIGHT / 2))
+
+        if self._normalize_obs:
+            h_dist /= self._screen_size[0]
+            v_dist /= self._screen_size[1]
+
+        return h_dist, v_dist
+
+    def _update_observations(self, idx: Optional[np.ndarray] = None) -> None:
+        """ Writes the games' current observations to the observation buffer.
+        """
+        game = self._game
+        next_pipe = game.next_pipe
+        distances = {}
+        columns = []
+        for name in self.features:
+            if name in GAP_FEATURES:
+                gap = GAP_FEATURES[name]
+                if gap not in distances:
+                    # (the last pipe pair, if there are fewer pairs ahead)
+                    distances[gap] = self._gap_distances(
+                        np.minimum(next_pipe + gap, game.pipe_count - 1))
+                columns.append(distances[gap][name.startswith("v_dist")])
+            elif name == "vel_y":
+                columns.append(game.player_vel_y)
+            else:
+                columns.append(game.player_rot)
+
+        obs = np.stack(columns, axis=1)
+        if idx is None:
+            self._obs[:] = obs
+        else:
+            self._obs[idx] = obs[idx]
+
+    def _get_rewards(self, v_dist: np.ndarray) -> np.ndarray:
+        """ Returns the rewards of the last tick.
+
+        Args:
+            v_dist (np.ndarray): The games' (vertical) distances to the next
+                hole, as in the observations.
+        """
+        return 1 - np.abs(v_dist.astype(np.float64))
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """ Seeds the generator of the pipes' heights of all the games. """
+        self._game.seed(seed)
+        return [seed]
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """ Resets all the games and returns their initial observations.
+
+        Args:
+            seed (Optional[int]): If not `None`, the environment is seeded with
+                it (see :meth:`seed`) before the games are reset.
+        """
+        self.reset_async()
+        return self.reset_wait(seed=seed)
+
+    def reset_async(self, **kwargs) -> None:
+        pass
+
+    def reset_wait(self, seed: Optional[int] = None, **kwargs) -> np.ndarray:
+        if seed is not None:
+            self.seed(seed)
+        self._refresh_profiling()
+
+        self._game.reset()
+        self._update_observations()
+        return self._obs.copy()
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions[:] = actions
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """ Steps all the games with the actions passed to :meth:`step_async`.
+
+        Returns:
+            A tuple containing, respectively, the stacked observations, the
+            rewards, the done flags and an info dictionary. The info dictionary
+            holds the score of each game (`"score"`) and, if any game ended,
+            the last observations of the finished games
+            (`"terminal_observation"`, valid only at the rows of done games).
+        """
+        rewards, dones = self._advance(self._actions)
+        info = {"score": self._game.score.copy()}
+
+        if dones.any():
+            info["terminal_observation"] = self._obs.copy()
+            self._game.reset(dones)
+            self._update_observations(dones)
+
+        return self._obs.copy(), rewards, dones, info
+
+    def _advance(self,
+                 actions: np.ndarray,
+                 mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray,
+                                                             np.ndarray]:
+        """ Advances the games (or the games selected by `mask`) by a step of
+        `frame_skip` ticks and updates the observations. Returns the rewards
+        and the done flags of the step (only meaningful for the selected
+        games). """
+        game = self._game
+        if self._kernel_features is not None:
+            return game.step(actions, self._obs, self._kernel_features,
+                             reward=self.kernel_reward,
+                             frame_skip=self._frame_skip,
+                             normalize=self._normalize_obs,
+                             mask=mask)
+
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        for _ in range(self._frame_skip - 1):
+            alive = game.update_state(actions, mask)
+            v_dist = self._gap_distances(game.next_pipe)[1]
+            rewards += np.where(dones, 0, self._get_rewards(v_dist))
+            dones |= ~alive
+            # (keeps the velocities of the crashed games unchanged)
+            actions = np.where(dones, 0, actions)
+
+        alive = game.update_state(actions, mask)
+        self._update_observations()
+        rewards += np.where(dones, 0, self._get_rewards(self._obs[:, 1]))
+        dones |= ~alive
+        return rewards, dones
+
+    def step_games(self,
+                   actions: np.ndarray,
+                   mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                              np.ndarray, Dict]:
+        """ Steps only the games selected by `mask`, leaving the other games
+        untouched. Unlike :meth:`step`, the games that end aren't reset (see
+        :meth:`reset_games`): they keep reporting `done` until they're reset.
+
+        Args:
+            actions (np.ndarray): The action of each game (ignored for the
+                games that aren't selected).
+            mask (np.ndarray): Boolean array selecting the games to be stepped.
+
+        Returns:
+            The same as :meth:`step_wait`, without terminal observations. Only
+            the rows of the selected games are meaningful.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards, dones = self._advance(np.where(mask, actions, 0), mask)
+        return (self._obs.copy(), rewards, dones,
+                {"score": self._game.score.copy()})
+
+    def reset_games(self, mask: np.ndarray) -> np.ndarray:
+        """ Resets only the games selected by `mask` and returns the
+        observations of all the games (only the rows of the selected games are
+        meaningful). """
+        self._game.reset(mask)
+        self._update_observations(mask)
+        return self._obs.copy()
+
+    def get_difficulty(self) -> Dict[str, np.ndarray]:
+        """ Returns the parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`), with a value per game. """
+        return self._game.get_params()
+
+    def set_difficulty(self,
+                       mask: Optional[np.ndarray] = None,
+                       **params: Union[int, np.ndarray]) -> None:
+        """ Changes parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`) in place, without resetting the games or
+        re-creating the environment (see
+        :meth:`.FlappyBirdBatchLogic.set_params`).
+
+        Args:
+            mask (Optional[np.ndarray]): Boolean array selecting the games to
+                be changed. If `None`, all the games are changed.
+            **params (Union[int, np.ndarray]): The parameters' new values: a
+                single value or an array with a value for each of the selected
+                games. With the "numba" backend, all the games must have the
+                same `pipe_gap_size`.
+        """
+        self._game.set_params(mask, **params)
+
+
+class FlappyBirdVecEnvAdvance(FlappyBirdVecEnvSimple):
+    """ Vectorized version of :class:`.FlappyBirdEnvAdvance`. """
+
+    kernel_reward = "sparse_dense"
+
+    def _get_rewards(self, v_dist: np.ndarray) -> np.ndarray:
+        dense = 1 - np.abs(v_dist.astype(np.float64))
+        return np.where(self._game.scored, 2, dense)     # sparse + dense
+
+
+class FlappyBirdVecEnvThreeObservations(FlappyBirdVecEnvAdvance):
+    """ Vectorized version of :class:`.FlappyBirdEnvThreeObservations`. """
+
+    default_observations = ("h_dist", "v_dist", "vel_y")
+
+
+class FlappyBirdVecEnvFourObservations(FlappyBirdVecEnvAdvance):
+    """ Vectorized version of :class:`.FlappyBirdEnvFourObservations`. """
+
+    default_observations = ("h_dist", "v_dist", "h_dist_2", "v_dist_2")
+
+
+class FlappyBirdVecEnvFourObsSparse(FlappyBirdVecEnvFourObservations):
+    """ Vectorized version of :class:`.FlappyBirdEnvFourObsSparse`. """
+
+    kernel_reward = "sparse_survival"
+
+    def _get_rewards(self, v_dist: np.ndarray) -> np.ndarray:
+        return np.where(self._game.scored, 3.0, 1.0)    # sparse / dense
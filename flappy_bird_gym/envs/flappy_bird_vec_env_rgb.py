@@ -0,0 +1,399 @@
+""" Implementation of a multiprocess vector environment of the Flappy Bird
+environment that yields RGB (or grayscale) observations.
+
+Unlike a `SubprocVecEnv`, which pickles each observation and sends it through a
+pipe, the worker processes of :class:`FlappyBirdVecEnvRGB` render their games
+directly into a block of shared memory (`multiprocessing.shared_memory`) that
+holds the observations of all the games. The actions, rewards, done flags and
+scores are exchanged through a second shared block, so the only messages
+between the processes are the releases of two semaphores per worker and step.
+"""
+
+import os
+import traceback
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import gym
+import numpy as np
+
+from flappy_bird_gym.envs.game_logic import GAME_PARAMS, validate_params
+
+#: Commands sent to the workers (through the shared control block).
+_CMD_STEP, _CMD_RESET, _CMD_RESET_SEEDED, _CMD_SET_PARAMS, _CMD_CLOSE = (
+    range(5))
+
+#: Seconds to wait for a worker to exit before terminating it.
+_JOIN_TIMEOUT = 5
+
+#: Interval, in seconds, at which a waiting main process checks whether the
+#: workers are still alive.
+_POLL_INTERVAL = 1
+
+
+def _control_arrays(buffer, num_envs: int,
+                    num_workers: int) -> Dict[str, np.ndarray]:
+    """ Returns views of the arrays in the shared control block (or the block's
+    size in bytes, under the key "size", if `buffer` is `None`). """
+    layout = (("actions", np.int64, num_envs),
+              ("seeds", np.int64, num_envs),
+              ("rewards", np.float64, num_envs),
+              ("scores", np.int64, num_envs),
+              ("dones", np.bool_, num_envs),
+              ("params", np.int64, num_envs * len(GAME_PARAMS)),
+              ("commands", np.int8, num_workers),
+              ("failed", np.bool_, num_workers))
+    arrays, offset = {}, 0
+    for name, dtype, size in layout:
+        if buffer is not None:
+            arrays[name] = np.ndarray(size, dtype=dtype, buffer=buffer,
+                                      offset=offset)
+        offset += np.dtype(dtype).itemsize * size
+        offset += -offset % 8   # (keeps the arrays aligned)
+    if buffer is not None:
+        arrays["params"] = arrays["params"].reshape(num_envs,
+                                                    len(GAME_PARAMS))
+    arrays["size"] = offset
+    return arrays
+
+
+def _worker(worker_idx: int,
+            env_indices: Sequence[int],
+            env_kwargs: Dict[str, Any],
+            obs_shape: Tuple[int, ...],
+            obs_name: str,
+            terminal_obs_name: str,
+            control_name: str,
+            num_envs: int,
+            num_workers: int,
+            cpu: Optional[int],
+            command_sem,
+            done_sem,
+            errors) -> None:
+    """ Loop of a worker process: steps its games whenever a command is
+    released, writing the results to the shared blocks. """
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+
+    obs_shm = SharedMemory(name=obs_name)
+    terminal_obs_shm = SharedMemory(name=terminal_obs_name)
+    control_shm = SharedMemory(name=control_name)
+    try:
+        obs = np.ndarray((num_envs, *obs_shape), dtype=np.uint8,
+                         buffer=obs_shm.buf)
+        terminal_obs = np.ndarray((num_envs, *obs_shape), dtype=np.uint8,
+                                  buffer=terminal_obs_shm.buf)
+        control = _control_arrays(control_shm.buf, num_envs, num_workers)
+        actions, seeds = control["actions"], control["seeds"]
+        rewards, scores = control["rewards"], control["scores"]
+        dones, commands = control["dones"], control["commands"]
+        params = control["params"]
+
+        try:
+            from flappy_bird_gym.envs.flappy_bird_env_rgb import \
+                FlappyBirdEnvRGB
+            # (each game renders directly into its row of the shared block)
+            envs = [FlappyBirdEnvRGB(**env_kwargs, obs_buffer=obs[i])
+                    for i in env_indices]
+        except Exception:
+            control["failed"][worker_idx] = True
+            errors.put((worker_idx, traceback.format_exc()))
+            return
+        finally:
+            done_sem.release()  # (reports that the worker is ready)
+
+        while True:
+            command_sem.acquire()
+            command = commands[worker_idx]
+            if command == _CMD_CLOSE:
+                break
+
+            try:
+                if command == _CMD_STEP:
+                    for i, env in zip(env_indices, envs):
+                        _, rewards[i], dones[i], info = env.step(actions[i])
+                        scores[i] = info["score"]
+                        if dones[i]:
+                            terminal_obs[i] = obs[i]
+                            env.reset()
+                elif command == _CMD_SET_PARAMS:
+                    for i, env in zip(env_indices, envs):
+                        env.set_difficulty(**dict(zip(GAME_PARAMS,
+                                                      params[i].tolist())))
+                else:
+                    for i, env in zip(env_indices, envs):
+                        env.reset(seed=(int(seeds[i])
+                                        if command == _CMD_RESET_SEEDED
+                                        else None))
+                        scores[i] = 0
+            except Exception:
+                control["failed"][worker_idx] = True
+                errors.put((worker_idx, traceback.format_exc()))
+            done_sem.release()
+
+        for env in envs:
+            env.close()
+    finally:
+        # (the views must be released before the blocks are closed)
+        obs = terminal_obs = control = actions = seeds = None
+        rewards = scores = dones = commands = params = None
+        obs_shm.close()
+        terminal_obs_shm.close()
+        control_shm.close()
+
+
+class FlappyBirdVecEnvRGB(gym.vector.VectorEnv):
+    """ Multiprocess vector version of :class:`.FlappyBirdEnvRGB`.
+
+    The `num_envs` games are split among `num_workers` processes, each owning
+    a contiguous block of games. The workers render the observations directly
+    into a shared memory block with shape `(num_envs, *obs_shape)`, where
+    `obs_shape` is the shape of the observations of a single
+    :class:`.FlappyBirdEnvRGB` (see :meth:`.FlappyBirdEnvRGB.observation_shape`;
+    `(width, height, 3)` for RGB observations and `(height, width,
+    frame_stack)` for grayscale ones). Games that end are automatically reset
+    in place, as in :class:`.FlappyBirdVecEnvSimple`. The parameters of the
+    games' physics and pipes can be changed in place with
+    :meth:`set_difficulty` (they're kept in the shared control block and
+    applied by the workers).
+
+    Lifetime and aliasing of the observations: :meth:`step` and :meth:`reset`
+    return a view of the shared block, without copying it. It's overwritten by
+    the next call to :meth:`step` or :meth:`reset`, so observations that must
+    outlive it must be copied by the caller. The same holds for
+    `info["terminal_observation"]`, which is a view of a second shared block
+    (valid only at the rows of the games that ended).
+
+    Args:
+        num_envs (int): Number of games to simulate.
+        num_workers (Optional[int]): Number of worker processes. If `None`, one
+            worker per available CPU core is used (but no more than
+            `num_envs`).
+        seed (Optional[int]): Seed for the generators of the pipes' heights.
+            The game `i` is seeded with `seed + i`.
+        pin_workers (bool): If `True` (and the platform supports it), each
+            worker is pinned to one of the available CPU cores, in round-robin
+            order.
+        start_method (Optional[str]): Start method of the worker processes
+            ("fork", "spawn" or "forkserver"). If `None`, the platform's
+            default is used.
+        **env_kwargs: Arguments of each :class:`.FlappyBirdEnvRGB` (e.g.
+            `grayscale`, `obs_size` or `frame_skip`). `copy_obs` and
+            `obs_buffer` are set by the vector environment.
+    """
+
+    metadata = {'render.modes': []}
+
+    def __init__(self,
+                 num_envs: int = 1,
+                 num_workers: Optional[int] = None,
+                 seed: Optional[int] = None,
+                 pin_workers: bool = True,
+                 start_method: Optional[str] = None,
+                 **env_kwargs) -> None:
+        from flappy_bird_gym.envs.flappy_bird_env_rgb import FlappyBirdEnvRGB
+
+        for name in ("copy_obs", "obs_buffer"):
+            if name in env_kwargs:
+                raise ValueError(f"The argument \"{name}\" is set by the "
+                                 f"vector environment!")
+
+        cpus = (sorted(os.sched_getaffinity(0))
+                if hasattr(os, "sched_getaffinity")
+                else list(range(os.cpu_count() or 1)))
+        if num_workers is None:
+            num_workers = len(cpus)
+        num_workers = min(num_workers, num_envs)
+        if num_workers < 1:
+            raise ValueError("At least one game and one worker are required!")
+
+        obs_shape = FlappyBirdEnvRGB.observation_shape(**{
+            name: env_kwargs[name]
+            for name in ("screen_size", "obs_size", "grayscale",
+                         "frame_stack", "channel_dim")
+            if name in env_kwargs
+        })
+        super().__init__(
+            num_envs=num_envs,
+            observation_space=gym.spaces.Box(0, 255, obs_shape,
+                                             dtype=np.uint8),
+            action_space=gym.spaces.Discrete(2),
+        )
+        self.num_workers = num_workers
+        self._seed = seed
+        self._workers = []
+
+        obs_size = num_envs * int(np.prod(obs_shape))
+        control_size = _control_arrays(None, num_envs, num_workers)["size"]
+        self._obs_shm = SharedMemory(create=True, size=obs_size)
+        self._terminal_obs_shm = SharedMemory(create=True, size=obs_size)
+        self._control_shm = SharedMemory(create=True, size=control_size)
+        self._obs = np.ndarray((num_envs, *obs_shape), dtype=np.uint8,
+                               buffer=self._obs_shm.buf)
+        self._terminal_obs = np.ndarray((num_envs, *obs_shape),
+                                        dtype=np.uint8,
+                                        buffer=self._terminal_obs_shm.buf)
+        self._control = _control_arrays(self._control_shm.buf, num_envs,
+                                        num_workers)
+        self._base_y = env_kwargs.get("screen_size", (288, 512))[1] * 0.79
+        self._control["params"][:] = list({
+            **GAME_PARAMS, "pipe_gap_size": env_kwargs.get("pipe_gap", 100),
+        }.values())
+
+        ctx = get_context(start_method)
+        self._errors = ctx.SimpleQueue()
+        self._command_sems = [ctx.Semaphore(0) for _ in range(num_workers)]
+        self._done_sems = [ctx.Semaphore(0) for _ in range(num_workers)]
+        pin_workers = pin_workers and hasattr(os, "sched_setaffinity")
+        for worker_idx, env_indices in enumerate(
+                np.array_split(np.arange(num_envs), num_workers)):
+            worker = ctx.Process(
+                target=_worker,
+                args=(worker_idx, env_indices.tolist(), env_kwargs,
+                      obs_shape, self._obs_shm.name,
+                      self._terminal_obs_shm.name, self._control_shm.name,
+                      num_envs, num_workers,
+                      cpus[worker_idx % len(cpus)] if pin_workers else None,
+                      self._command_sems[worker_idx],
+                      self._done_sems[worker_idx], self._errors),
+                name=f"FlappyBirdVecEnvRGB-{worker_idx}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+        try:
+            self._wait()
+        except RuntimeError:
+            self.close()
+            raise
+
+    def _send(self, command: int) -> None:
+        """ Sends a command to all the workers. """
+        self._control["commands"][:] = command
+        for sem in self._command_sems:
+            sem.release()
+
+    def _wait(self) -> None:
+        """ Waits for all the workers to finish their command, raising an error
+        if any of them failed. """
+        for worker, sem in zip(self._workers, self._done_sems):
+            while not sem.acquire(timeout=_POLL_INTERVAL):
+                if not worker.is_alive():
+                    raise RuntimeError(f"The worker process {worker.name} "
+                                       f"died (exit code {worker.exitcode})!")
+
+        if self._control["failed"].any():
+            messages = []
+            while not self._errors.empty():
+                worker_idx, message = self._errors.get()
+                messages.append(f"Worker {worker_idx}:\n{message}")
+            self._control["failed"][:] = False
+            raise RuntimeError("A worker of the vector environment failed!\n"
+                               + "\n".join(messages))
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        """ Sets the seed used by the next call to :meth:`reset` (the game `i`
+        is seeded with `seed + i`). """
+        self._seed = seed
+        return [seed]
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """ Resets all the games and returns their initial observations.
+
+        Args:
+            seed (Optional[int]): If not `None`, the environment is seeded with
+                it (see :meth:`seed`) before the games are reset.
+        """
+        self.reset_async(seed=seed)
+        return self.reset_wait()
+
+    def reset_async(self, seed: Optional[int] = None, **kwargs) -> None:
+        if seed is not None:
+            self.seed(seed)
+
+        if self._seed is None:
+            self._send(_CMD_RESET)
+        else:
+            self._control["seeds"][:] = self._seed + np.arange(self.num_envs)
+            self._seed = None
+            self._send(_CMD_RESET_SEEDED)
+
+    def reset_wait(self, **kwargs) -> np.ndarray:
+        self._wait()
+        return self._obs
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._control["actions"][:] = actions
+        self._send(_CMD_STEP)
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict]:
+        """ Waits for the workers to step all the games with the actions passed
+        to :meth:`step_async`.
+
+        Returns:
+            A tuple containing, respectively, the stacked observations (a view
+            of the shared block), the rewards, the done flags and an info
+            dictionary. The info dictionary holds the score of each game
+            (`"score"`) and, if any game ended, the last observations of the
+            finished games (`"terminal_observation"`, valid only at the rows of
+            done games).
+        """
+        self._wait()
+        control = self._control
+        dones = control["dones"].copy()
+        info = {"score": control["scores"].copy()}
+        if dones.any():
+            info["terminal_observation"] = self._terminal_obs
+        return self._obs, control["rewards"].copy(), dones, info
+
+    def get_difficulty(self) -> Dict[str, np.ndarray]:
+        """ Returns the parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`), with a value per game. """
+        return {name: self._control["params"][:, i].copy()
+                for i, name in enumerate(GAME_PARAMS)}
+
+    def set_difficulty(self,
+                       mask: Optional[np.ndarray] = None,
+                       **params: Union[int, np.ndarray]) -> None:
+        """ Changes parameters of the games' physics and pipes (see
+        :data:`.GAME_PARAMS`) in place, without restarting the workers (see
+        :meth:`.FlappyBirdEnvRGB.set_difficulty`). Waits for the workers,
+        so it shouldn't be called between :meth:`step_async` and
+        :meth:`step_wait`.
+
+        Args:
+            mask (Optional[np.ndarray]): Boolean array selecting the games to
+                be changed. If `None`, all the games are changed.
+            **params (Union[int, np.ndarray]): The parameters' new values: a
+                single value or an array with a value for each of the selected
+                games.
+        """
+        validate_params(params, self._base_y)
+        rows = slice(None) if mask is None else np.flatnonzero(mask)
+        for name, value in params.items():
+            self._control["params"][rows, list(GAME_PARAMS).index(name)] = (
+                value)
+        self._send(_CMD_SET_PARAMS)
+        self._wait()
+
+    def close_extras(self, **kwargs) -> None:
+        """ Stops the workers and releases the shared memory blocks. """
+        if self._obs_shm is None:
+            return
+
+        workers, self._workers = self._workers, []
+        if any(worker.is_alive() for worker in workers):
+            self._send(_CMD_CLOSE)
+        for worker in workers:
+            worker.join(_JOIN_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+
+        # (the views must be released before the blocks are closed)
+        self._obs = self._terminal_obs = self._control = None
+        for shm in (self._obs_shm, self._terminal_obs_shm, self._control_shm):
+            shm.close()
+            shm.unlink()
+        self._obs_shm = self._terminal_obs_shm = self._control_shm = None
@@ -5,13 +5,13 @@ GitHub repository by `sourahbhv` (https://github.com/sourabhv/FlapPyBird),
 released under the MIT license.
 """
 
-
-import random
+import struct
 from enum import IntEnum
-from itertools import cycle
-from typing import Dict, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
 
-import pygame
+from flappy_bird_gym.envs.pipes import PipeBuffer, PIPE_CAPACITY
 
 ############################ Speed and Acceleration ############################
 PIPE_VEL_X = -4
@@ -21,6 +21,8 @@ PLAYER_MIN_VEL_Y = -8  # min vel along Y, max ascend speed
 
 PLAYER_ACC_Y = 1       # players downward acceleration
 PLAYER_VEL_ROT = 3     # angular speed
+PLAYER_ROT_THR = 20    # rotation threshold, beyond which the bird is drawn
+                       # at this rotation
 
 PLAYER_FLAP_ACC = -9   # players speed on flapping
 ################################################################################
@@ -40,6 +42,67 @@ BACKGROUND_WIDTH = 288
 BACKGROUND_HEIGHT = 512
 ################################################################################
 
+#: Available engines for the collision checks between the player and the pipes.
+COLLISION_MODES = ("arithmetic", "vectorized", "rect", "pixel")
+
+#: Sequence of the bird's animation frames.
+PLAYER_IDX_CYCLE = (0, 1, 2, 1)
+
+#: Layout of the snapshots made by `FlappyBirdLogic.get_state`: the player's
+#: y position, 9 ints with the player's info, the base's x position, the score
+#: and the last action, the number of pairs of pipes and their positions, and
+#: the state of the generator of the pipes' heights.
+_STATE_STRUCT = struct.Struct(f"<d9qq{3 * PIPE_CAPACITY}qq4QqQq")
+
+#: Size, in bytes, of the snapshots made by `FlappyBirdLogic.get_state`.
+STATE_SIZE = _STATE_STRUCT.size
+
+_UINT64_MASK = (1 << 64) - 1
+
+#: Parameters of a game's physics and pipes that can be changed while it's
+#: played (see :meth:`FlappyBirdLogic.set_params`), and their defaults.
+GAME_PARAMS = {"pipe_gap_size": 100,
+               "pipe_vel_x": PIPE_VEL_X,
+               "player_acc_y": PLAYER_ACC_Y,
+               "player_flap_acc": PLAYER_FLAP_ACC}
+
+
+def validate_params(params: Dict[str, Any], base_y: float) -> None:
+    """ Checks the names and values of game parameters (see
+    :data:`GAME_PARAMS`), which can be integers or arrays of integers (one
+    per game). Raises a `ValueError` if any of them is invalid.
+
+    Args:
+        params (Dict[str, Any]): The parameters' values, by name.
+        base_y (float): The y position of the base/ground of the games.
+    """
+    for name, value in params.items():
+        if name not in GAME_PARAMS:
+            raise ValueError(f"Invalid game parameter: \"{name}\"! "
+                             f"Available parameters: {tuple(GAME_PARAMS)}.")
+        if np.any(np.asarray(value) % 1 != 0):
+            raise ValueError(f"The game parameter \"{name}\" must be an "
+                             f"integer!")
+
+    if np.any(np.asarray(params.get("pipe_vel_x", -1)) >= 0):
+        raise ValueError("The pipes' velocity (\"pipe_vel_x\") must be "
+                         "negative!")
+    gap_size = np.asarray(params.get("pipe_gap_size", 1))
+    if np.any(gap_size < 1) or np.any(base_y * 0.6 - gap_size < 1):
+        raise ValueError(f"The gap between the pipes (\"pipe_gap_size\") "
+                         f"must be between 1 and {int(base_y * 0.6) - 1}!")
+
+
+def visible_rotations() -> Iterator[int]:
+    """ Yields the visible rotations the bird can have in a game (its
+    rotation, capped at :data:`PLAYER_ROT_THR`). """
+    yield PLAYER_ROT_THR
+    rot = 45
+    while rot > -90:
+        rot -= PLAYER_VEL_ROT
+        if rot < PLAYER_ROT_THR:
+            yield rot
+
 
 class FlappyBirdLogic:
     """ Handles the logic of the Flappy Bird game.
@@ -50,6 +113,32 @@ class FlappyBirdLogic:
     Args:
         screen_size (Tuple[int, int]): Tuple with the screen's width and height.
         pipe_gap_size (int): Space between a lower and an upper pipe.
+        collision_mode (str): Engine used to check for collisions between the
+            player and the pipes. Can be "arithmetic" (overlaps computed with
+            plain integer arithmetic; the default), "vectorized" (overlaps with
+            all the pipes computed at once by NumPy) or "rect" (overlaps
+            computed by `pygame.Rect`, which requires pygame). These engines
+            test the bounding boxes of the player and the pipes and yield the
+            same results. The "pixel" engine refines the bounding-box tests
+            with the hitmasks of the sprites (the bird's unrotated frames, as
+            in the original game; see :mod:`.hitmasks`, which requires
+            pygame): the player only crashes into a pipe if their visible
+            pixels overlap, so it never crashes where the bounding boxes
+            don't.
+        seed (Optional[int]): Seed for the generator of the pipes' heights.
+            Ignored if `rng` is given.
+        rng (Optional[np.random.Generator]): Generator of the pipes' heights.
+            Passing the same generator to consecutive games makes them continue
+            its stream. If `None`, a new generator is created from `seed`.
+        pipe_schedule_size (int): If greater than 0, the heights of the pipes
+            are drawn in blocks of `pipe_schedule_size` by a single call to the
+            generator (a new block is drawn only if a game outlasts the current
+            one). Otherwise, each height is drawn when its pipe spawns.
+        frame_skip (int): Number of ticks :meth:`update_state` advances the game
+            by. The action is repeated on every tick.
+        pipe_vel_x (int): Horizontal velocity of the pipes (negative).
+        player_acc_y (int): The player's downward acceleration.
+        player_flap_acc (int): The player's vertical velocity after a flap.
 
     Attributes:
         player_x (int): The player's x position.
@@ -57,12 +146,13 @@ class FlappyBirdLogic:
         base_x (int): The base/ground's x position.
         base_y (int): The base/ground's y position.
         score (int): Current score of the player.
-        upper_pipes (List[Dict[str, int]): List with the upper pipes. Each pipe
-            is represented by a dictionary containing two keys: "x" (the pipe's
-            x position) and "y" (the pipe's y position).
-        lower_pipes (List[Dict[str, int]): List with the lower pipes. Each pipe
-            is represented by a dictionary containing two keys: "x" (the pipe's
-            x position) and "y" (the pipe's y position).
+        pipes (PipeBuffer): Ring buffer with the pairs of pipes (upper and
+            lower) currently in the game, from left to right. Renderers and
+            observation builders should only read it.
+        next_pipe (int): Index, in :attr:`pipes`, of the first pair of pipes
+            the player hasn't passed yet (or of the last pair, if there's
+            none). Kept up to date as the pipes scroll and spawn (see
+            :meth:`gap_slot`).
         player_vel_y (int): The player's vertical velocity.
         player_rot (int): The player's rotation angle.
         last_action (Optional[FlappyBirdLogic.Actions]): The last action taken
@@ -70,11 +160,41 @@ class FlappyBirdLogic:
         sound_cache (Optional[str]): Stores the name of the next sound to be
             played. If `None`, then no sound should be played.
         player_idx (int): Current index of the bird's animation cycle.
+        pipe_gap_size (int): Space between the lower and the upper pipes that
+            spawn.
+        pipe_vel_x (int): Horizontal velocity of the pipes.
+        player_acc_y (int): The player's downward acceleration.
+        player_flap_acc (int): The player's vertical velocity after a flap.
+        frame_skip (int): Number of ticks :meth:`update_state` advances the game
+            by.
+        last_ticks (int): Number of ticks the last call to
+            :meth:`update_state` or :meth:`advance` ran (less than requested
+            if the player crashed; the tick of the crash is counted).
     """
 
+    #: Methods timed by the environments when profiling (see
+    #: :mod:`.profiling`), and their phases.
+    profiled_methods: Dict[str, str] = {"update_state": "update_state",
+                                        "advance": "advance",
+                                        "check_crash": "check_crash"}
+
     def __init__(self,
                  screen_size: Tuple[int, int],
-                 pipe_gap_size: int = 100) -> None:
+                 pipe_gap_size: int = 100,
+                 collision_mode: str = "arithmetic",
+                 seed: Optional[int] = None,
+                 rng: Optional[np.random.Generator] = None,
+                 pipe_schedule_size: int = 0,
+                 frame_skip: int = 1,
+                 pipe_vel_x: int = PIPE_VEL_X,
+                 player_acc_y: int = PLAYER_ACC_Y,
+                 player_flap_acc: int = PLAYER_FLAP_ACC) -> None:
+        if collision_mode not in COLLISION_MODES:
+            raise ValueError(f"Invalid collision mode: \"{collision_mode}\"! "
+                             f"Available modes: {COLLISION_MODES}.")
+        if frame_skip < 1:
+            raise ValueError("The frame skip must be at least 1!")
+
         self._screen_width = screen_size[0]
         self._screen_height = screen_size[1]
 
@@ -86,27 +206,32 @@ class FlappyBirdLogic:
         self._base_shift = BASE_WIDTH - BACKGROUND_WIDTH
 
         self.score = 0
-        self._pipe_gap_size = pipe_gap_size
-
-        # Generate 2 new pipes to add to upper_pipes and lower_pipes lists
-        new_pipe1 = self._get_random_pipe()
-        new_pipe2 = self._get_random_pipe()
-
-        # List of upper pipes:
-        self.upper_pipes = [
-            {"x": self._screen_width + 200,
-             "y": new_pipe1[0]["y"]},
-            {"x": self._screen_width + 200 + (self._screen_width / 2),
-             "y": new_pipe2[0]["y"]},
-        ]
-
-        # List of lower pipes:
-        self.lower_pipes = [
-            {"x": self._screen_width + 200,
-             "y": new_pipe1[1]["y"]},
-            {"x": self._screen_width + 200 + (self._screen_width / 2),
-             "y": new_pipe2[1]["y"]},
-        ]
+        validate_params({"pipe_gap_size": pipe_gap_size,
+                         "pipe_vel_x": pipe_vel_x}, self.base_y)
+        self.pipe_gap_size = int(pipe_gap_size)
+        self.pipe_vel_x = int(pipe_vel_x)
+        self.player_acc_y = int(player_acc_y)
+        self.player_flap_acc = int(player_flap_acc)
+
+        self._rng = rng if rng is not None else np.random.default_rng(seed)
+        self._pipe_schedule_size = pipe_schedule_size
+        self._pipe_schedule = []
+        self._pipe_schedule_idx = 0
+        self._pipe_schedule_rng_state = None
+        self._pipe_schedule_next_rng_state = None
+
+        # Generate 2 new pairs of pipes
+        self.pipes = PipeBuffer()
+        self.pipes.push(self._screen_width + 200, *self._get_random_pipe())
+        self.pipes.push(int(self._screen_width + 200 + self._screen_width / 2),
+                        *self._get_random_pipe())
+
+        # a pair of pipes is passed once its x position is below this one
+        # (extra distance to compensate for the buggy hit-box)
+        self._passed_pipe_x = (self.player_x - PLAYER_WIDTH / 2
+                               - PIPE_WIDTH / 2 - 3)
+        self.next_pipe = 0
+        self._update_next_pipe()
 
         # Player's info:
         self.player_vel_y = -9  # player"s velocity along Y
@@ -114,28 +239,288 @@ class FlappyBirdLogic:
 
         self.last_action = None
         self.sound_cache = None
+        self.frame_skip = frame_skip
+        self.last_ticks = 0
 
         self._player_flapped = False
         self.player_idx = 0
-        self._player_idx_gen = cycle([0, 1, 2, 1])
+        self._player_idx_pos = 0
         self._loop_iter = 0
 
+        # (imported here because the collision module depends on this one)
+        from flappy_bird_gym.envs import collision
+        self._collision = collision
+        self._check_pipes_crash = {
+            "arithmetic": self._check_pipes_crash_arithmetic,
+            "vectorized": self._check_pipes_crash_vectorized,
+            "rect": self._check_pipes_crash_rect,
+            "pixel": self._check_pipes_crash_pixel,
+        }[collision_mode]
+        if collision_mode == "pixel":
+            # (imported here, so pygame is only loaded when it's needed)
+            from flappy_bird_gym.envs import hitmasks
+            self._hitmasks = hitmasks
+
     class Actions(IntEnum):
         """ Possible actions for the player to take. """
         IDLE, FLAP = 0, 1
 
-    def _get_random_pipe(self) -> Dict[str, int]:
-        """ Returns a randomly generated pipe. """
+    @property
+    def upper_pipes(self) -> List[Dict[str, int]]:
+        """ List with the upper pipes. Each pipe is represented by a dictionary
+        containing two keys: "x" (the pipe's x position) and "y" (the pipe's y
+        position).
+
+        This is a copy of the pipes' positions, built on every access; prefer
+        reading :attr:`pipes` directly.
+        """
+        return [{"x": x, "y": upper_y} for x, upper_y, _ in self.pipes]
+
+    @property
+    def lower_pipes(self) -> List[Dict[str, int]]:
+        """ List with the lower pipes (see :attr:`upper_pipes`). """
+        return [{"x": x, "y": lower_y} for x, _, lower_y in self.pipes]
+
+    def _update_next_pipe(self) -> None:
+        """ Advances :attr:`next_pipe` past the pairs of pipes the player has
+        passed. The pipes only move left, so the index never moves back (except
+        when the first pair is popped). """
+        pipes = self.pipes
+        xs, start = pipes.xs, pipes.start
+        last = pipes.stop - start - 1
+        next_pipe = self.next_pipe
+        while next_pipe < last and xs[start + next_pipe] < self._passed_pipe_x:
+            next_pipe += 1
+        self.next_pipe = next_pipe
+
+    def gap_slot(self, i: int = 0) -> int:
+        """ Returns the slot, in :attr:`pipes`, of the i-th gap ahead of the
+        player: the gap of the next pair of pipes if `i` is 0, of the pair
+        after it if `i` is 1, and so on. If the game has fewer pairs ahead of
+        the player, the slot of the last pair is returned. """
+        pipes = self.pipes
+        return min(pipes.start + self.next_pipe + i, pipes.stop - 1)
+
+    def _get_random_pipe(self) -> Tuple[int, int]:
+        """ Returns the y positions of the upper and lower pipes of a
+        randomly generated pair of pipes. """
         # y of gap between upper and lower pipe
-        gap_y = random.randrange(0,
-                                 int(self.base_y * 0.6 - self._pipe_gap_size))
+        max_gap_y = int(self.base_y * 0.6 - self.pipe_gap_size)
+        if self._pipe_schedule_size > 0:
+            if self._pipe_schedule_idx == len(self._pipe_schedule):
+                self._draw_pipe_schedule()
+                self._pipe_schedule_idx = 0
+
+            gap_y = self._pipe_schedule[self._pipe_schedule_idx]
+            self._pipe_schedule_idx += 1
+        else:
+            gap_y = int(self._rng.integers(0, max_gap_y))
         gap_y += int(self.base_y * 0.2)
 
-        pipe_x = self._screen_width + 10
-        return [
-            {"x": pipe_x, "y": gap_y - PIPE_HEIGHT},          # upper pipe
-            {"x": pipe_x, "y": gap_y + self._pipe_gap_size},  # lower pipe
-        ]
+        return gap_y - PIPE_HEIGHT, gap_y + self.pipe_gap_size
+
+    def _draw_pipe_schedule(self) -> None:
+        """ Draws a new block of gap heights. The generator's states before
+        and after the draw are kept, so snapshots can refer to the block. """
+        self._pipe_schedule_rng_state = self._rng.bit_generator.state
+        self._pipe_schedule = self._rng.integers(
+            0, int(self.base_y * 0.6 - self.pipe_gap_size),
+            size=self._pipe_schedule_size,
+        ).tolist()
+        self._pipe_schedule_next_rng_state = self._rng.bit_generator.state
+
+    def get_params(self) -> Dict[str, int]:
+        """ Returns the game's parameters (see :data:`GAME_PARAMS`). """
+        return {name: getattr(self, name) for name in GAME_PARAMS}
+
+    def set_params(self, **params: int) -> None:
+        """ Changes parameters of the game's physics and pipes (see
+        :data:`GAME_PARAMS`) while it's played, e.g.
+        `set_params(pipe_gap_size=80, pipe_vel_x=-5)`. The new velocities
+        apply from the next tick on, and the new gap size to the pipes that
+        spawn next (the pipes in the game keep their gaps).
+
+        The parameters aren't part of the game's snapshots (see
+        :meth:`get_state`), so a snapshot should be restored into a game with
+        the same parameters.
+        """
+        validate_params(params, self.base_y)
+        gap_size = params.get("pipe_gap_size", self.pipe_gap_size)
+        if gap_size != self.pipe_gap_size and self._pipe_schedule_size > 0:
+            # (the heights left in the block were drawn for the old gap)
+            self._pipe_schedule_idx = len(self._pipe_schedule)
+        for name, value in params.items():
+            setattr(self, name, int(value))
+
+    def get_state(self,
+                  out: Optional[Union[bytearray, memoryview,
+                                      np.ndarray]] = None,
+                  include_rng: bool = True) -> Optional[bytes]:
+        """ Makes a snapshot of the game's state.
+
+        The snapshot is a fixed-size buffer (with :data:`STATE_SIZE` bytes)
+        holding the player's state, the pipes, the base's position, the score,
+        the animation index, the loop iteration and, optionally, the state of
+        the generator of the pipes' heights. It can be restored into any game
+        with the same settings through :meth:`set_state`.
+
+        Args:
+            out (Optional[Union[bytearray, memoryview, np.ndarray]]): Writable
+                buffer, with at least :data:`STATE_SIZE` bytes, where the
+                snapshot will be written (e.g. a row of a `uint8` array holding
+                many snapshots). If `None`, a new `bytes` object is returned.
+            include_rng (bool): Whether to include the state of the generator
+                of the pipes' heights (which must be a `PCG64` generator).
+                Restoring it makes the game spawn the same pipes again.
+
+        Returns:
+            The snapshot if `out` is `None` and `None` otherwise.
+        """
+        pipes = self.pipes
+        start, stop = pipes.start, pipes.stop
+        padding = (0,) * (PIPE_CAPACITY - (stop - start))
+
+        if include_rng:
+            rng_state = (self._pipe_schedule_rng_state
+                         if self._pipe_schedule_size > 0
+                         else self._rng.bit_generator.state)
+            if rng_state["bit_generator"] != "PCG64":
+                raise ValueError("Only the state of PCG64 generators can be "
+                                 "included in a snapshot!")
+            state, inc = rng_state["state"]["state"], rng_state["state"]["inc"]
+            rng_values = (1, state >> 64, state & _UINT64_MASK,
+                          inc >> 64, inc & _UINT64_MASK,
+                          rng_state["has_uint32"], rng_state["uinteger"])
+        else:
+            rng_values = (0, 0, 0, 0, 0, 0, 0)
+
+        last_action = -1 if self.last_action is None else int(self.last_action)
+        values = (
+            self.player_y, self.player_vel_y, self.player_rot,
+            self._player_flapped, self.player_idx, self._player_idx_pos,
+            self._loop_iter, self.base_x, self.score, last_action,
+            stop - start,
+            *pipes.xs[start:stop], *padding,
+            *pipes.upper_ys[start:stop], *padding,
+            *pipes.lower_ys[start:stop], *padding,
+            *rng_values,
+            self._pipe_schedule_idx,
+        )
+
+        if out is None:
+            return _STATE_STRUCT.pack(*values)
+        _STATE_STRUCT.pack_into(out, 0, *values)
+        return None
+
+    def set_state(self,
+                  state: Union[bytes, bytearray, memoryview,
+                               np.ndarray]) -> None:
+        """ Restores a snapshot made by :meth:`get_state`.
+
+        If the snapshot includes the state of the generator of the pipes'
+        heights, the generator is restored too (when the generator is shared
+        with other games, they're affected as well).
+        """
+        values = _STATE_STRUCT.unpack_from(state)
+        (self.player_y, self.player_vel_y, self.player_rot,
+         player_flapped, self.player_idx, self._player_idx_pos,
+         self._loop_iter, self.base_x, self.score, last_action,
+         num_pipes) = values[:11]
+        self._player_flapped = bool(player_flapped)
+        self.last_action = (None if last_action == -1
+                            else FlappyBirdLogic.Actions(last_action))
+        self.sound_cache = None
+
+        pipes = self.pipes
+        pipes.clear()
+        xs = values[11:11 + PIPE_CAPACITY]
+        upper_ys = values[11 + PIPE_CAPACITY:11 + 2 * PIPE_CAPACITY]
+        lower_ys = values[11 + 2 * PIPE_CAPACITY:11 + 3 * PIPE_CAPACITY]
+        for i in range(num_pipes):
+            pipes.push(xs[i], upper_ys[i], lower_ys[i])
+        self.next_pipe = 0
+        self._update_next_pipe()
+
+        (has_rng, state_hi, state_lo, inc_hi, inc_lo,
+         has_uint32, uinteger, schedule_idx) = values[11 + 3 * PIPE_CAPACITY:]
+        if not has_rng:
+            return
+
+        rng_state = {
+            "bit_generator": "PCG64",
+            "state": {"state": (state_hi << 64) | state_lo,
+                      "inc": (inc_hi << 64) | inc_lo},
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+        if self._pipe_schedule_size > 0:
+            if rng_state == self._pipe_schedule_rng_state:
+                self._rng.bit_generator.state = (
+                    self._pipe_schedule_next_rng_state
+                )
+            else:
+                self._rng.bit_generator.state = rng_state
+                self._draw_pipe_schedule()
+            self._pipe_schedule_idx = schedule_idx
+        else:
+            self._rng.bit_generator.state = rng_state
+
+    def _check_pipes_crash_arithmetic(self, player_y: int) -> bool:
+        """ Checks the collisions with the pipes one by one. """
+        hits_pipe = self._collision.player_hits_pipe
+        pipes = self.pipes
+        xs, upper_ys, lower_ys = pipes.xs, pipes.upper_ys, pipes.lower_ys
+        for i in range(pipes.start, pipes.stop):
+            if hits_pipe(self.player_x, player_y,
+                         xs[i], upper_ys[i], lower_ys[i]):
+                return True
+        return False
+
+    def _check_pipes_crash_vectorized(self, player_y: int) -> bool:
+        """ Checks the collisions with all the pipes at once. """
+        pipes = self.pipes
+        pipe_slots = slice(pipes.start, pipes.stop)
+        return bool(self._collision.player_hits_pipes(
+            self.player_x, player_y,
+            np.frombuffer(pipes.xs, dtype=np.int32)[pipe_slots],
+            np.frombuffer(pipes.upper_ys, dtype=np.int32)[pipe_slots],
+            np.frombuffer(pipes.lower_ys, dtype=np.int32)[pipe_slots],
+        ).any())
+
+    def _check_pipes_crash_rect(self, player_y: int) -> bool:
+        """ Checks the collisions with the pipes using `pygame.Rect`. """
+        import pygame
+
+        player_rect = pygame.Rect(self.player_x, player_y,
+                                  PLAYER_WIDTH, PLAYER_HEIGHT)
+
+        for pipe_x, upper_y, lower_y in self.pipes:
+            # upper and lower pipe rects
+            up_pipe_rect = pygame.Rect(pipe_x, upper_y,
+                                       PIPE_WIDTH, PIPE_HEIGHT)
+            low_pipe_rect = pygame.Rect(pipe_x, lower_y,
+                                        PIPE_WIDTH, PIPE_HEIGHT)
+
+            # check collision
+            up_collide = player_rect.colliderect(up_pipe_rect)
+            low_collide = player_rect.colliderect(low_pipe_rect)
+
+            if up_collide or low_collide:
+                return True
+
+        return False
+
+    def _check_pipes_crash_pixel(self, player_y: int) -> bool:
+        """ Checks the collisions with the pipes pixel by pixel. """
+        hits_pipe = self._hitmasks.player_hits_pipe
+        player = self._hitmasks.player_hitmask(self.player_idx)
+        pipes = self.pipes
+        xs, upper_ys, lower_ys = pipes.xs, pipes.upper_ys, pipes.lower_ys
+        for i in range(pipes.start, pipes.stop):
+            if hits_pipe(player, self.player_x, player_y,
+                         xs[i], upper_ys[i], lower_ys[i]):
+                return True
+        return False
 
     def check_crash(self) -> bool:
         """ Returns True if player collides with the ground (base) or a pipe.
@@ -143,40 +528,51 @@ class FlappyBirdLogic:
         # if player crashes into ground
         if self.player_y + PLAYER_HEIGHT >= self.base_y - 1:
             return True
-        else:
-            player_rect = pygame.Rect(self.player_x, self.player_y,
-                                      PLAYER_WIDTH, PLAYER_HEIGHT)
 
-            for up_pipe, low_pipe in zip(self.upper_pipes, self.lower_pipes):
-                # upper and lower pipe rects
-                up_pipe_rect = pygame.Rect(up_pipe['x'], up_pipe['y'],
-                                           PIPE_WIDTH, PIPE_HEIGHT)
-                low_pipe_rect = pygame.Rect(low_pipe['x'], low_pipe['y'],
-                                            PIPE_WIDTH, PIPE_HEIGHT)
+        # (rects have integer coordinates)
+        return self._check_pipes_crash(int(self.player_y))
 
-                # check collision
-                up_collide = player_rect.colliderect(up_pipe_rect)
-                low_collide = player_rect.colliderect(low_pipe_rect)
+    def update_state(self, action: Union[Actions, int]) -> bool:
+        """ Given an action taken by the player, updates the game's state.
 
-                if up_collide or low_collide:
-                    return True
+        The game is advanced by :attr:`frame_skip` ticks (see :meth:`advance`).
 
-        return False
+        Args:
+            action (Union[FlappyBirdLogic.Actions, int]): The action taken by
+                the player.
 
-    def update_state(self, action: Union[Actions, int]) -> bool:
-        """ Given an action taken by the player, updates the game's state.
+        Returns:
+            `True` if the player is alive and `False` otherwise.
+        """
+        return self.advance(action, self.frame_skip)
+
+    def advance(self, action: Union[Actions, int], num_ticks: int) -> bool:
+        """ Advances the game by `num_ticks` ticks, repeating the given action
+        on each of them. Stops early if the player crashes; the number of ticks
+        run is stored in :attr:`last_ticks`.
 
         Args:
             action (Union[FlappyBirdLogic.Actions, int]): The action taken by
                 the player.
+            num_ticks (int): Number of ticks to advance the game by.
 
         Returns:
             `True` if the player is alive and `False` otherwise.
         """
+        tick = self._tick
+        for i in range(num_ticks):
+            if not tick(action):
+                self.last_ticks = i + 1
+                return False
+        self.last_ticks = num_ticks
+        return True
+
+    def _tick(self, action: Union[Actions, int]) -> bool:
+        """ Advances the game by a single tick. """
         self.sound_cache = None
         if action == FlappyBirdLogic.Actions.FLAP:
             if self.player_y > -2 * PLAYER_HEIGHT:
-                self.player_vel_y = PLAYER_FLAP_ACC
+                self.player_vel_y = self.player_flap_acc
                 self._player_flapped = True
                 self.sound_cache = "wing"
 
@@ -185,17 +581,23 @@ class FlappyBirdLogic:
             self.sound_cache = "hit"
             return False
 
-        # check for score
+        # check for score (once, on the tick the pipe's middle passes the
+        # player's middle)
         player_mid_pos = self.player_x + PLAYER_WIDTH / 2
-        for pipe in self.upper_pipes:
-            pipe_mid_pos = pipe['x'] + PIPE_WIDTH / 2
-            if pipe_mid_pos <= player_mid_pos < pipe_mid_pos + 4:
+        pipe_vel_x = self.pipe_vel_x
+        pipes = self.pipes
+        xs = pipes.xs
+        for i in range(pipes.start, pipes.stop):
+            pipe_mid_pos = xs[i] + PIPE_WIDTH / 2
+            if pipe_mid_pos <= player_mid_pos < pipe_mid_pos - pipe_vel_x:
                 self.score += 1
                 self.sound_cache = "point"
 
         # player_index base_x change
         if (self._loop_iter + 1) % 3 == 0:
-            self.player_idx = next(self._player_idx_gen)
+            self.player_idx = PLAYER_IDX_CYCLE[self._player_idx_pos]
+            self._player_idx_pos = ((self._player_idx_pos + 1)
+                                    % len(PLAYER_IDX_CYCLE))
 
         self._loop_iter = (self._loop_iter + 1) % 30
         self.base_x = -((-self.base_x + 100) % self._base_shift)
@@ -206,7 +608,7 @@ class FlappyBirdLogic:
 
         # player's movement
         if self.player_vel_y < PLAYER_MAX_VEL_Y and not self._player_flapped:
-            self.player_vel_y += PLAYER_ACC_Y
+            self.player_vel_y += self.player_acc_y
 
         if self._player_flapped:
             self._player_flapped = False
@@ -219,20 +621,30 @@ class FlappyBirdLogic:
                              self.base_y - self.player_y - PLAYER_HEIGHT)
 
         # move pipes to left
-        for up_pipe, low_pipe in zip(self.upper_pipes, self.lower_pipes):
-            up_pipe['x'] += PIPE_VEL_X
-            low_pipe['x'] += PIPE_VEL_X
-
-        # add new pipe when first pipe is about to touch left of screen
-        if len(self.upper_pipes) > 0 and 0 < self.upper_pipes[0]['x'] < 5:
-            new_pipe = self._get_random_pipe()
-            self.upper_pipes.append(new_pipe[0])
-            self.lower_pipes.append(new_pipe[1])
-
-        # remove first pipe if its out of the screen
-        if (len(self.upper_pipes) > 0 and
-                self.upper_pipes[0]['x'] < -PIPE_WIDTH):
-            self.upper_pipes.pop(0)
-            self.lower_pipes.pop(0)
+        pipes.move(pipe_vel_x)
+
+        if pipes.stop > pipes.start:
+            first_pipe_x = xs[pipes.start]
+
+            # add new pipe when first pipe is about to touch left of screen
+            # (on the tick it moves past x = 5)
+            if first_pipe_x < 5 <= first_pipe_x - pipe_vel_x:
+                pipes.push(self._screen_width + 10, *self._get_random_pipe())
+
+            # remove first pipe if its out of the screen
+            next_pipe = self.next_pipe
+            if first_pipe_x < -PIPE_WIDTH:
+                pipes.pop()
+                if next_pipe > 0:
+                    next_pipe -= 1
+
+            # skip the pipes the player has passed (see `_update_next_pipe`;
+            # inlined, since it runs on every tick)
+            start = pipes.start
+            last = pipes.stop - start - 1
+            while (next_pipe < last
+                   and xs[start + next_pipe] < self._passed_pipe_x):
+                next_pipe += 1
+            self.next_pipe = next_pipe
 
         return True
@@ -0,0 +1,117 @@
+""" Pixel-perfect collision tests between the player and the pipes.
+
+The hitmasks of the sprites (their pixels that aren't fully transparent) are
+computed once, when this module is imported: one for each frame of the bird's
+animation and one for each pipe. Each hitmask
+is packed into a NumPy array with one `uint64` per row of the sprite, in which
+the bit `j` is set if the pixel in the column `j` is opaque. Two hitmasks are
+tested for overlap by shifting the rows of one of them to align the columns
+and AND-ing, in one vectorized operation, the rows of the clipped region.
+
+As in the original game's `check_crash`, the bird's hitmasks are the ones of
+its unrotated frames, which exactly cover the player's bounding box
+(`PLAYER_WIDTH` x `PLAYER_HEIGHT`). The pixel tests only refine the
+bounding-box tests: the player never crashes into a pipe whose box it doesn't
+overlap. Loading the sprites requires pygame; no display is needed.
+"""
+
+import numpy as np
+import pygame
+
+from flappy_bird_gym.envs.collision import rects_overlap
+from flappy_bird_gym.envs.renderer import prepare_sprite
+from flappy_bird_gym.envs.utils import load_images
+
+#: Maximum width of a hitmask (the number of bits in a packed row).
+MAX_HITMASK_WIDTH = 64
+
+
+class Hitmask:
+    """ Packed hitmask of a sprite.
+
+    Args:
+        surface (pygame.Surface): The sprite.
+
+    Attributes:
+        width (int): The sprite's width.
+        height (int): The sprite's height.
+        rows (np.ndarray): The packed rows of the hitmask (a `uint64` array
+            with shape `(height,)`).
+    """
+
+    __slots__ = ("width", "height", "rows")
+
+    def __init__(self, surface: pygame.Surface) -> None:
+        self.width, self.height = surface.get_size()
+        if self.width > MAX_HITMASK_WIDTH:
+            raise ValueError(f"Sprites wider than {MAX_HITMASK_WIDTH} pixels "
+                             f"can't be packed into a hitmask!")
+
+        # (surfaces are indexed by (x, y), hence the transposition)
+        opaque = pygame.surfarray.array_alpha(surface).T > 0
+        weights = np.left_shift(np.uint64(1),
+                                np.arange(self.width, dtype=np.uint64))
+        self.rows = (opaque * weights).sum(axis=1, dtype=np.uint64)
+
+    def overlaps(self, x: int, y: int,
+                 other: "Hitmask", other_x: int, other_y: int) -> bool:
+        """ Checks if the hitmask, placed at `(x, y)`, has an opaque pixel in
+        common with the other hitmask, placed at `(other_x, other_y)`. """
+        if not rects_overlap(x, y, self.width, self.height,
+                             other_x, other_y, other.width, other.height):
+            return False
+
+        # clipped region, in the rows of each hitmask
+        top = max(y, other_y)
+        bottom = min(y + self.height, other_y + other.height)
+        rows = self.rows[top - y:bottom - y]
+        other_rows = other.rows[top - other_y:bottom - other_y]
+
+        # (columns beyond the 64th are shifted out, but the other sprite
+        # doesn't reach them)
+        dx = x - other_x
+        if dx >= 0:
+            rows = rows << np.uint64(dx)
+        else:
+            rows = rows >> np.uint64(-dx)
+        return bool((rows & other_rows).any())
+
+
+# (the sprites of all the colors have the same shapes)
+_IMAGES = load_images(convert=False, bg_type=None)
+
+#: Hitmasks of the bird's (unrotated) animation frames.
+PLAYER_HITMASKS = tuple(Hitmask(prepare_sprite(img))
+                        for img in _IMAGES["player"])
+
+#: Hitmasks of the upper and lower pipes.
+PIPE_HITMASKS = tuple(Hitmask(prepare_sprite(img)) for img in _IMAGES["pipe"])
+del _IMAGES
+
+
+def player_hitmask(player_idx: int) -> Hitmask:
+    """ Returns the hitmask of the bird's animation frame `player_idx`. """
+    return PLAYER_HITMASKS[player_idx]
+
+
+def player_hits_pipe(player: Hitmask,
+                     player_x: int,
+                     player_y: int,
+                     pipe_x: int,
+                     upper_pipe_y: int,
+                     lower_pipe_y: int) -> bool:
+    """ Checks if the player collides with a pair of pipes (upper and lower),
+    pixel by pixel.
+
+    Args:
+        player (Hitmask): The player's hitmask (see :func:`player_hitmask`).
+        player_x (int): The player's x position.
+        player_y (int): The player's y position.
+        pipe_x (int): The pipes' x position.
+        upper_pipe_y (int): The upper pipe's y position.
+        lower_pipe_y (int): The lower pipe's y position.
+    """
+    upper, lower = PIPE_HITMASKS
+    return (player.overlaps(player_x, player_y, upper, pipe_x, upper_pipe_y)
+            or player.overlaps(player_x, player_y,
+                               lower, pipe_x, lower_pipe_y))
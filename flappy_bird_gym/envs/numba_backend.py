@@ -0,0 +1,592 @@
+""" Optional Numba backend of the batched game logic.
+
+The kernels of this module advance the games stored by a
+:class:`.FlappyBirdBatchLogic` in place, one game and one tick at a time,
+covering the player's physics, the pipes' scrolling and spawning, the
+collisions and the scoring. The step kernels also compute the rewards of the
+ticks and the observation features (see :mod:`.observations`), so a whole
+step of a vector environment is a single call. The semantics are the same as
+the ones of :meth:`.FlappyBirdBatchLogic.update_state` (and, for a single
+game, of :meth:`.FlappyBirdLogic.update_state`), and the games spawn the same
+pipes (see :class:`FlappyBirdNumbaBatchLogic`).
+
+If Numba is installed, the kernels are compiled in nopython mode (and cached
+on disk) the first time they're called. Otherwise, they're plain Python
+functions: they still run, slowly, which is enough to check their results
+(see `benchmarks/numba_parity.py`), and the environments created with
+`backend="numba"` fall back to the NumPy logic (see :func:`make_batch_logic`).
+"""
+
+import warnings
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from flappy_bird_gym.envs.batch_logic import FlappyBirdBatchLogic
+from flappy_bird_gym.envs.batch_logic import PLAYER_IDX_CYCLE
+from flappy_bird_gym.envs.game_logic import GAME_PARAMS
+from flappy_bird_gym.envs.game_logic import PLAYER_MAX_VEL_Y, PLAYER_VEL_ROT
+from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
+from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
+from flappy_bird_gym.envs.observations import GAP_FEATURES
+from flappy_bird_gym.envs.observations import OBSERVATION_FEATURES
+from flappy_bird_gym.envs.pipes import PIPE_CAPACITY
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+#: Whether Numba is installed (otherwise the kernels run as plain Python).
+NUMBA_AVAILABLE = numba is not None
+
+#: Available backends of the vector environments' game logic.
+BACKENDS = ("numpy", "numba")
+
+#: Reward functions the step kernels can compute (see
+#: :data:`.REWARD_FUNCTIONS`).
+KERNEL_REWARDS = ("dense", "sparse_dense", "sparse_survival")
+
+#: Minimum number of gap heights drawn at once for the kernels.
+GAP_BUFFER_SIZE = 4096
+
+# (indices of the kernels' parameters in their `params` array)
+_PLAYER_X, _BASE_Y, _BASE_SHIFT, _SCREEN_WIDTH, _SCREEN_HEIGHT = range(5)
+_GAP_OFFSET = 5
+
+# (columns of the games' parameters, in the order of `GAME_PARAMS`)
+_GAP_SIZE, _VEL_X, _ACC_Y, _FLAP_ACC = (
+    list(GAME_PARAMS).index(name)
+    for name in ("pipe_gap_size", "pipe_vel_x", "player_acc_y",
+                 "player_flap_acc")
+)
+
+_NUM_CYCLE = len(PLAYER_IDX_CYCLE)
+
+# (gap of each observation feature, or -1 if it isn't a distance, and whether
+# it's a vertical distance)
+_FEATURE_GAPS = np.array([GAP_FEATURES.get(name, -1)
+                          for name in OBSERVATION_FEATURES], dtype=np.int64)
+_FEATURE_IS_V = np.array([name.startswith("v_dist")
+                          for name in OBSERVATION_FEATURES])
+_VEL_Y = OBSERVATION_FEATURES.index("vel_y")
+
+
+def _jit(func):
+    """ Compiles a kernel in nopython mode, if Numba is installed. """
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True)(func)
+
+
+@_jit
+def _tick(g, action, player_y, player_vel_y, player_rot, player_idx,
+          player_idx_pos, player_flapped, loop_iter, base_x, score, pipe_x,
+          upper_pipe_y, lower_pipe_y, pipe_head, pipe_count, next_pipe,
+          scored, last_action, idx_cycle, game_params, gaps, gap_pos, params):
+    """ Advances the game `g` by a single tick. Returns whether the player is
+    alive. The gap heights of the spawned pipes are read from `gaps`, from
+    the position `gap_pos[0]` on. The parameters of the game's physics and
+    pipes are read from `game_params[g]`. """
+    player_x = params[_PLAYER_X]
+    base_y = params[_BASE_Y]
+    pipe_vel_x = game_params[g, _VEL_X]
+    scored[g] = False
+
+    if action == 1 and player_y[g] > -2 * PLAYER_HEIGHT:
+        player_vel_y[g] = game_params[g, _FLAP_ACC]
+        player_flapped[g] = True
+    last_action[g] = action
+
+    # crash with the ground or a pipe (rects have integer coordinates)
+    if player_y[g] + PLAYER_HEIGHT >= base_y - 1:
+        return False
+    y = np.trunc(player_y[g])
+    head, count = pipe_head[g], pipe_count[g]
+    for k in range(count):
+        slot = (head + k) % PIPE_CAPACITY
+        x = pipe_x[g, slot]
+        if player_x < x + PIPE_WIDTH and player_x + PLAYER_WIDTH > x:
+            upper, lower = upper_pipe_y[g, slot], lower_pipe_y[g, slot]
+            if ((y < upper + PIPE_HEIGHT and y + PLAYER_HEIGHT > upper)
+                    or (y < lower + PIPE_HEIGHT
+                        and y + PLAYER_HEIGHT > lower)):
+                return False
+
+    # check for score
+    player_mid_pos = player_x + PLAYER_WIDTH / 2
+    for k in range(count):
+        pipe_mid_pos = pipe_x[g, (head + k) % PIPE_CAPACITY] + PIPE_WIDTH / 2
+        if pipe_mid_pos <= player_mid_pos < pipe_mid_pos - pipe_vel_x:
+            score[g] += 1
+            scored[g] = True
+
+    # player_index base_x change
+    if (loop_iter[g] + 1) % 3 == 0:
+        player_idx[g] = idx_cycle[player_idx_pos[g]]
+        player_idx_pos[g] = (player_idx_pos[g] + 1) % _NUM_CYCLE
+    loop_iter[g] = (loop_iter[g] + 1) % 30
+    base_x[g] = -((-base_x[g] + 100) % np.int64(params[_BASE_SHIFT]))
+
+    # rotate the player
+    if player_rot[g] > -90:
+        player_rot[g] -= PLAYER_VEL_ROT
+
+    # player's movement
+    if player_flapped[g]:
+        player_flapped[g] = False
+        player_rot[g] = 45
+    elif player_vel_y[g] < PLAYER_MAX_VEL_Y:
+        player_vel_y[g] += game_params[g, _ACC_Y]
+    player_y[g] += min(player_vel_y[g], base_y - player_y[g] - PLAYER_HEIGHT)
+
+    # move pipes to left
+    for slot in range(PIPE_CAPACITY):
+        pipe_x[g, slot] += pipe_vel_x
+
+    if count > 0:
+        first_x = pipe_x[g, head]
+
+        # add new pipe when first pipe is about to touch left of screen
+        if first_x < 5 <= first_x - pipe_vel_x:
+            gap_y = gaps[gap_pos[0]] + np.int64(params[_GAP_OFFSET])
+            gap_pos[0] += 1
+            slot = (head + count) % PIPE_CAPACITY
+            pipe_x[g, slot] = np.int64(params[_SCREEN_WIDTH]) + 10
+            upper_pipe_y[g, slot] = gap_y - PIPE_HEIGHT
+            lower_pipe_y[g, slot] = gap_y + game_params[g, _GAP_SIZE]
+            pipe_count[g] += 1
+
+        # remove first pipe if its out of the screen
+        if first_x < -PIPE_WIDTH:
+            pipe_head[g] = (head + 1) % PIPE_CAPACITY
+            pipe_count[g] -= 1
+            if next_pipe[g] > 0:
+                next_pipe[g] -= 1
+
+        # skip the pipes the player has passed (see
+        # `FlappyBirdLogic._update_next_pipe`)
+        passed_x = player_x - PLAYER_WIDTH / 2 - PIPE_WIDTH / 2 - 3
+        head, last = pipe_head[g], pipe_count[g] - 1
+        while (next_pipe[g] < last and pipe_x[
+                g, (head + next_pipe[g]) % PIPE_CAPACITY] < passed_x):
+            next_pipe[g] += 1
+
+    return True
+
+
+@_jit
+def _gap_distances(g, k, normalize, player_y, pipe_x, upper_pipe_y,
+                   lower_pipe_y, pipe_head, params):
+    """ Returns the horizontal and vertical distances of the player of the
+    game `g` to the gap of its k-th pipe pair. """
+    slot = (pipe_head[g] + k) % PIPE_CAPACITY
+    h_dist = (pipe_x[g, slot] + PIPE_WIDTH / 2
+              - (params[_PLAYER_X] - PLAYER_WIDTH / 2))
+    h_dist += 3  # extra distance to compensate for the buggy hit-box
+    gap_mid_y = (upper_pipe_y[g, slot] + PIPE_HEIGHT
+                 + lower_pipe_y[g, slot]) / 2
+    v_dist = gap_mid_y - (player_y[g] + PLAYER_HEIGHT / 2)
+    if normalize:
+        h_dist /= params[_SCREEN_WIDTH]
+        v_dist /= params[_SCREEN_HEIGHT]
+    return h_dist, v_dist
+
+
+@_jit
+def _observe(g, obs, features, normalize, player_y, player_vel_y,
+             player_rot, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+             pipe_count, next_pipe, params):
+    """ Writes the observation features (indices of
+    :data:`.OBSERVATION_FEATURES`) of the game `g` to `obs[g]`. Returns the
+    "v_dist" feature (to the next pipe), with full precision. """
+    h_dist, v_dist = _gap_distances(g, next_pipe[g], normalize, player_y,
+                                    pipe_x, upper_pipe_y, lower_pipe_y,
+                                    pipe_head, params)
+    for j in range(len(features)):
+        feature = features[j]
+        gap = _FEATURE_GAPS[feature]
+        if gap == 0:
+            obs[g, j] = v_dist if _FEATURE_IS_V[feature] else h_dist
+        elif gap > 0:
+            # (the last pipe pair, if there are fewer pairs ahead)
+            h_dist_k, v_dist_k = _gap_distances(
+                g, min(next_pipe[g] + gap, pipe_count[g] - 1), normalize,
+                player_y, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+                params,
+            )
+            obs[g, j] = v_dist_k if _FEATURE_IS_V[feature] else h_dist_k
+        elif feature == _VEL_Y:
+            obs[g, j] = player_vel_y[g]
+        else:
+            obs[g, j] = player_rot[g]
+    return v_dist
+
+
+@_jit
+def _reward(reward, v_dist, scored):
+    """ Returns the reward of a tick (`reward` is an index of
+    :data:`KERNEL_REWARDS`). """
+    if reward == 1 and scored:
+        return 2.0
+    if reward == 2:
+        return 3.0 if scored else 1.0
+    return 1 - abs(v_dist)
+
+
+@_jit
+def _update_games(actions, mask, player_y, player_vel_y, player_rot,
+                  player_idx, player_idx_pos, player_flapped, loop_iter,
+                  base_x, score, pipe_x, upper_pipe_y, lower_pipe_y,
+                  pipe_head, pipe_count, next_pipe, alive, scored,
+                  last_action, idx_cycle, game_params, gaps, gap_pos, params):
+    """ Advances the games selected by `mask` by a single tick. """
+    for g in range(len(actions)):
+        if not mask[g]:
+            scored[g] = False
+            continue
+        alive[g] = _tick(g, actions[g], player_y, player_vel_y, player_rot,
+                         player_idx, player_idx_pos, player_flapped,
+                         loop_iter, base_x, score, pipe_x, upper_pipe_y,
+                         lower_pipe_y, pipe_head, pipe_count, next_pipe,
+                         scored, last_action, idx_cycle, game_params, gaps,
+                         gap_pos, params)
+
+
+@_jit
+def _step_tick(g, action, last, reward, normalize, rewards, dones,
+               player_y, player_vel_y, player_rot, player_idx,
+               player_idx_pos, player_flapped, loop_iter, base_x, score,
+               pipe_x, upper_pipe_y, lower_pipe_y, pipe_head, pipe_count,
+               next_pipe, alive, scored, last_action, idx_cycle, game_params,
+               gaps, gap_pos, params):
+    """ Runs a tick of a step of the game `g` and accumulates its reward
+    (as `FlappyBirdVecEnvSimple._advance`). """
+    if dones[g]:
+        # (keeps the velocities of the crashed games unchanged)
+        action = 0
+    alive[g] = _tick(g, action, player_y, player_vel_y, player_rot,
+                     player_idx, player_idx_pos, player_flapped, loop_iter,
+                     base_x, score, pipe_x, upper_pipe_y, lower_pipe_y,
+                     pipe_head, pipe_count, next_pipe, scored, last_action,
+                     idx_cycle, game_params, gaps, gap_pos, params)
+    v_dist = _gap_distances(g, next_pipe[g], normalize, player_y, pipe_x,
+                            upper_pipe_y, lower_pipe_y, pipe_head, params)[1]
+    if last:
+        # (the last tick's reward is computed from the observation)
+        v_dist = np.float64(np.float32(v_dist))
+    if not dones[g]:
+        rewards[g] += _reward(reward, v_dist, scored[g])
+    if not alive[g]:
+        dones[g] = True
+
+
+@_jit
+def _step_games(actions, mask, frame_skip, features, reward, normalize, obs,
+                rewards, dones, player_y, player_vel_y, player_rot,
+                player_idx, player_idx_pos, player_flapped, loop_iter,
+                base_x, score, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+                pipe_count, next_pipe, alive, scored, last_action, idx_cycle,
+                game_params, gaps, gap_pos, params):
+    """ Advances the games selected by `mask` by a step of `frame_skip`
+    ticks, accumulating the rewards and writing the observations. The games
+    are advanced tick by tick (all the games run their first tick, then their
+    second tick, ...), so the spawned pipes get their gaps in the same order
+    as with the NumPy logic. """
+    for t in range(frame_skip):
+        last = t == frame_skip - 1
+        for g in range(len(actions)):
+            if not mask[g]:
+                scored[g] = False
+                continue
+            _step_tick(g, actions[g], last, reward, normalize, rewards, dones,
+                       player_y, player_vel_y, player_rot, player_idx,
+                       player_idx_pos, player_flapped, loop_iter, base_x,
+                       score, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+                       pipe_count, next_pipe, alive, scored, last_action,
+                       idx_cycle, game_params, gaps, gap_pos, params)
+
+    for g in range(len(actions)):
+        if mask[g]:
+            _observe(g, obs, features, normalize, player_y, player_vel_y,
+                     player_rot, pipe_x, upper_pipe_y, lower_pipe_y,
+                     pipe_head, pipe_count, next_pipe, params)
+
+
+@_jit
+def _step_game(g, action, frame_skip, features, reward, normalize, obs,
+               rewards, dones, player_y, player_vel_y, player_rot,
+               player_idx, player_idx_pos, player_flapped, loop_iter, base_x,
+               score, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+               pipe_count, next_pipe, alive, scored, last_action, idx_cycle,
+               game_params, gaps, gap_pos, params):
+    """ Advances only the game `g` by a step of `frame_skip` ticks (see
+    :func:`_step_games`). """
+    rewards[g] = 0.0
+    dones[g] = False
+    for t in range(frame_skip):
+        _step_tick(g, action, t == frame_skip - 1, reward, normalize,
+                   rewards, dones, player_y, player_vel_y, player_rot,
+                   player_idx, player_idx_pos, player_flapped, loop_iter,
+                   base_x, score, pipe_x, upper_pipe_y, lower_pipe_y,
+                   pipe_head, pipe_count, next_pipe, alive, scored,
+                   last_action, idx_cycle, game_params, gaps, gap_pos, params)
+    _observe(g, obs, features, normalize, player_y, player_vel_y, player_rot,
+             pipe_x, upper_pipe_y, lower_pipe_y, pipe_head, pipe_count,
+             next_pipe, params)
+
+
+@_jit
+def _observe_games(mask, features, normalize, obs, player_y, player_vel_y,
+                   player_rot, pipe_x, upper_pipe_y, lower_pipe_y, pipe_head,
+                   pipe_count, next_pipe, params):
+    """ Writes the observations of the games selected by `mask`. """
+    for g in range(len(mask)):
+        if mask[g]:
+            _observe(g, obs, features, normalize, player_y, player_vel_y,
+                     player_rot, pipe_x, upper_pipe_y, lower_pipe_y,
+                     pipe_head, pipe_count, next_pipe, params)
+
+
+def feature_codes(features: Sequence[str]) -> np.ndarray:
+    """ Returns the indices, in :data:`.OBSERVATION_FEATURES`, of the given
+    observation features (as expected by the kernels). """
+    for name in features:
+        if name not in OBSERVATION_FEATURES:
+            raise ValueError(f"Invalid observation feature: \"{name}\"! "
+                             f"Available features: {OBSERVATION_FEATURES}.")
+    return np.array([OBSERVATION_FEATURES.index(name) for name in features],
+                    dtype=np.int64)
+
+
+class FlappyBirdNumbaBatchLogic(FlappyBirdBatchLogic):
+    """ :class:`.FlappyBirdBatchLogic` whose games are advanced by the kernels
+    of this module (compiled by Numba, if it's installed).
+
+    The gap heights of the pipes are drawn, in blocks, into a buffer the
+    kernels read from. The generator's stream is the same, and the games
+    consume it in the same order, so a game seeded like a
+    :class:`.FlappyBirdBatchLogic` (or, with a single game, like a
+    :class:`.FlappyBirdLogic`) spawns the same pipes. Since the buffer is
+    drawn for a single gap size, all the games must have the same
+    `pipe_gap_size` (see :meth:`set_params`); the other parameters can vary
+    between games.
+
+    Besides :meth:`update_state`, which advances the games by a single tick,
+    :meth:`step` and :meth:`step_game` run whole environment steps (many
+    ticks, their rewards and the observation features) in a single call. The
+    state arrays are updated in place, so they must not be replaced.
+
+    Args:
+        num_games (int): Number of games to simulate.
+        screen_size (Tuple[int, int]): Tuple with the screen's width and height.
+        pipe_gap_size (int): Space between a lower and an upper pipe.
+        seed (Optional[int]): Seed for the generator of the pipes' heights.
+    """
+
+    profiled_methods = {"update_state": "update_state",
+                        "step": "kernel_step",
+                        "observe": "kernel_observe"}
+
+    def __init__(self,
+                 num_games: int,
+                 screen_size: Tuple[int, int] = (288, 512),
+                 pipe_gap_size: int = 100,
+                 seed: Optional[int] = None) -> None:
+        self._gaps = np.zeros(0, dtype=np.int64)
+        self._gap_pos = np.zeros(1, dtype=np.int64)
+        # (state of the generator before the buffer was drawn, and the
+        # buffer's bound)
+        self._gaps_rng_state = None
+        self._gaps_high = 0
+        super().__init__(num_games=num_games,
+                         screen_size=screen_size,
+                         pipe_gap_size=pipe_gap_size,
+                         seed=seed)
+
+        params = np.zeros(6, dtype=np.float64)
+        params[_PLAYER_X] = self.player_x
+        params[_BASE_Y] = self.base_y
+        params[_BASE_SHIFT] = self._base_shift
+        params[_SCREEN_WIDTH] = self._screen_width
+        params[_SCREEN_HEIGHT] = self._screen_height
+        params[_GAP_OFFSET] = int(self.base_y * 0.2)
+        self._params = params
+
+        self._all_games = np.ones(num_games, dtype=bool)
+        self._rewards = np.zeros(num_games, dtype=np.float64)
+        self._dones = np.zeros(num_games, dtype=bool)
+        self._state = (self.player_y, self.player_vel_y, self.player_rot,
+                       self.player_idx, self._player_idx_pos,
+                       self._player_flapped, self._loop_iter, self.base_x,
+                       self.score, self.pipe_x, self.upper_pipe_y,
+                       self.lower_pipe_y, self.pipe_head, self.pipe_count,
+                       self.next_pipe, self.alive, self.scored,
+                       self.last_action, PLAYER_IDX_CYCLE, self.game_params)
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        """ Seeds the generator of the pipes' heights (the gaps already drawn
+        are discarded). """
+        super().seed(seed)
+        self._gaps = np.zeros(0, dtype=np.int64)
+        self._gap_pos[0] = 0
+        self._gaps_rng_state = None
+
+    def _discard_gaps(self) -> None:
+        """ Discards the gap heights left in the buffer, rewinding the
+        generator to the first of them (so the stream continues as if only
+        the used heights had been drawn). """
+        if self._gaps_rng_state is not None:
+            self._rng.bit_generator.state = self._gaps_rng_state
+            self._rng.integers(0, self._gaps_high, size=self._gap_pos[0])
+        self._gaps = np.zeros(0, dtype=np.int64)
+        self._gap_pos[0] = 0
+        self._gaps_rng_state = None
+
+    def _reserve_gaps(self, size: int) -> None:
+        """ Makes sure at least `size` gap heights are left in the buffer. """
+        if len(self._gaps) - self._gap_pos[0] >= size:
+            return
+
+        self._discard_gaps()
+        self._gaps_rng_state = self._rng.bit_generator.state
+        self._gaps_high = int(self.base_y * 0.6 - self.pipe_gap_size[0])
+        self._gaps = self._rng.integers(0, self._gaps_high,
+                                        size=max(GAP_BUFFER_SIZE, size))
+
+    def set_params(self,
+                   mask: Optional[np.ndarray] = None,
+                   **params: Union[int, np.ndarray]) -> None:
+        """ Changes parameters of the games in place (see
+        :meth:`.FlappyBirdBatchLogic.set_params`). The gap size must stay the
+        same for all the games; changing it discards the buffered gap
+        heights (the games still spawn the same pipes as a
+        :class:`.FlappyBirdBatchLogic`).
+        """
+        if "pipe_gap_size" in params:
+            gap_size = self.pipe_gap_size.copy()
+            gap_size[self._all if mask is None else mask] = (
+                params["pipe_gap_size"])
+            if (gap_size != gap_size[0]).any():
+                raise ValueError("The games of the Numba backend must have "
+                                 "the same gap size!")
+        super().set_params(mask, **params)
+        if self._gaps_high != int(self.base_y * 0.6 - self.pipe_gap_size[0]):
+            self._discard_gaps()
+
+    def _random_gap_y(self, gap_size: np.ndarray) -> np.ndarray:
+        size = gap_size.size
+        self._reserve_gaps(size)
+        pos = self._gap_pos[0]
+        self._gap_pos[0] += size
+        gap_y = self._gaps[pos:pos + size].reshape(gap_size.shape)
+        return gap_y + int(self.base_y * 0.2)
+
+    def _mask(self, mask: Optional[np.ndarray]) -> np.ndarray:
+        return (self._all_games if mask is None
+                else np.ascontiguousarray(mask, dtype=bool))
+
+    def update_state(self,
+                     actions: Union[np.ndarray, int],
+                     mask: Optional[np.ndarray] = None) -> np.ndarray:
+        actions = np.ascontiguousarray(np.broadcast_to(
+            np.asarray(actions, dtype=np.int64), (self.num_games,)))
+        # (each game spawns at most one pipe per tick)
+        self._reserve_gaps(self.num_games)
+        _update_games(actions, self._mask(mask), *self._state, self._gaps,
+                      self._gap_pos, self._params)
+        return self.alive.copy()
+
+    def observe(self,
+                obs: np.ndarray,
+                features: np.ndarray,
+                normalize: bool = True,
+                mask: Optional[np.ndarray] = None) -> None:
+        """ Writes the observation features of the games (or of the games
+        selected by `mask`) to the rows of `obs`.
+
+        Args:
+            obs (np.ndarray): Array with shape `(num_games, len(features))`.
+            features (np.ndarray): Indices of the features (see
+                :func:`feature_codes`).
+            normalize (bool): Whether the distances should be normalized.
+            mask (Optional[np.ndarray]): Boolean array selecting the games.
+        """
+        _observe_games(self._mask(mask), features, normalize, obs,
+                       self.player_y, self.player_vel_y, self.player_rot,
+                       self.pipe_x,
+                       self.upper_pipe_y, self.lower_pipe_y, self.pipe_head,
+                       self.pipe_count, self.next_pipe, self._params)
+
+    def step(self,
+             actions: np.ndarray,
+             obs: np.ndarray,
+             features: np.ndarray,
+             reward: str = "dense",
+             frame_skip: int = 1,
+             normalize: bool = True,
+             mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray,
+                                                         np.ndarray]:
+        """ Advances the games (or the games selected by `mask`) by a step of
+        `frame_skip` ticks, with the semantics of the vector environments'
+        steps (a game that crashes isn't advanced by the step's remaining
+        ticks), and writes their observations to `obs` (see
+        :meth:`observe`).
+
+        Args:
+            actions (np.ndarray): The action of each game.
+            obs (np.ndarray): Array where the observations are written.
+            features (np.ndarray): Indices of the observation features.
+            reward (str): Name of the reward function (see
+                :data:`KERNEL_REWARDS`).
+            frame_skip (int): Number of ticks of the step.
+            normalize (bool): Whether the distances should be normalized.
+            mask (Optional[np.ndarray]): Boolean array selecting the games.
+
+        Returns:
+            The rewards and the done flags of the step (only meaningful for
+            the selected games).
+        """
+        actions = np.ascontiguousarray(actions, dtype=np.int64)
+        rewards = np.zeros(self.num_games, dtype=np.float64)
+        dones = np.zeros(self.num_games, dtype=bool)
+        self._reserve_gaps(self.num_games * frame_skip)
+        _step_games(actions, self._mask(mask), frame_skip, features,
+                    KERNEL_REWARDS.index(reward), normalize, obs, rewards,
+                    dones, *self._state, self._gaps, self._gap_pos,
+                    self._params)
+        return rewards, dones
+
+    def step_game(self,
+                  game: int,
+                  action: int,
+                  obs: np.ndarray,
+                  features: np.ndarray,
+                  reward: str = "dense",
+                  frame_skip: int = 1,
+                  normalize: bool = True) -> Tuple[float, bool]:
+        """ Advances a single game by a step (see :meth:`step`) and writes
+        its observation to `obs[game]`. Returns the step's reward and done
+        flag. """
+        self._reserve_gaps(frame_skip)
+        _step_game(game, action, frame_skip, features,
+                   KERNEL_REWARDS.index(reward), normalize, obs,
+                   self._rewards, self._dones, *self._state, self._gaps,
+                   self._gap_pos, self._params)
+        return float(self._rewards[game]), bool(self._dones[game])
+
+
+def make_batch_logic(backend: str = "numpy", **kwargs) -> FlappyBirdBatchLogic:
+    """ Creates the batched game logic of the given backend ("numpy" or
+    "numba"). If Numba isn't installed, the "numba" backend falls back, with a
+    warning, to the NumPy logic. The keyword arguments are passed to the
+    logic's constructor. """
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend: \"{backend}\"! "
+                         f"Available backends: {BACKENDS}.")
+    if backend == "numba":
+        if NUMBA_AVAILABLE:
+            return FlappyBirdNumbaBatchLogic(**kwargs)
+        warnings.warn("Numba isn't installed; falling back to the NumPy game "
+                      "logic.", RuntimeWarning, stacklevel=3)
+    return FlappyBirdBatchLogic(**kwargs)
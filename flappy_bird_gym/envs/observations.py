@@ -0,0 +1,172 @@
+""" Builders of the simple numerical observations of the Flappy Bird
+environments.
+
+The available observation features are:
+
+    * "h_dist": horizontal distance to the next pipe (the first one the
+      player hasn't passed yet);
+    * "v_dist": difference between the player's y position and the next
+      hole's y position;
+    * "h_dist_2" and "v_dist_2": the same distances, but to the pair of pipes
+      after the next one ("h_dist_3", "v_dist_3", "h_dist_4" and "v_dist_4"
+      look further ahead; see :func:`lookahead_features`);
+    * "vel_y": the player's vertical velocity;
+    * "rot": the player's rotation angle.
+
+If the observations are normalized, the distances are divided by the screen's
+dimensions (the velocity and the rotation are never normalized).
+"""
+
+from operator import itemgetter
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from flappy_bird_gym.envs.game_logic import FlappyBirdLogic
+from flappy_bird_gym.envs.game_logic import PIPE_WIDTH, PIPE_HEIGHT
+from flappy_bird_gym.envs.game_logic import PLAYER_WIDTH, PLAYER_HEIGHT
+from flappy_bird_gym.envs.pipes import PIPE_CAPACITY
+
+#: Maximum number of gaps, after the next one, the observations can look
+#: ahead.
+MAX_LOOKAHEAD_PIPES = PIPE_CAPACITY - 1
+
+#: Names of the available observation features. New features are only ever
+#: appended, so the indices of the existing ones don't change.
+OBSERVATION_FEATURES = ("h_dist", "v_dist", "h_dist_2", "v_dist_2",
+                        "vel_y", "rot") + tuple(
+    f"{axis}_dist_{i + 1}" for i in range(2, MAX_LOOKAHEAD_PIPES + 1)
+    for axis in ("h", "v")
+)
+
+#: Gap of each distance feature: 0 for the next gap, 1 for the one after it,
+#: and so on.
+GAP_FEATURES = {"h_dist": 0, "v_dist": 0, **{
+    f"{axis}_dist_{i + 1}": i for i in range(1, MAX_LOOKAHEAD_PIPES + 1)
+    for axis in ("h", "v")
+}}
+
+
+def lookahead_features(lookahead_pipes: int) -> Tuple[str, ...]:
+    """ Returns the names of the distance features to the `lookahead_pipes`
+    gaps after the next one ("h_dist_2", "v_dist_2", "h_dist_3", ...). """
+    if not 0 <= lookahead_pipes <= MAX_LOOKAHEAD_PIPES:
+        raise ValueError(f"The number of lookahead pipes must be between 0 "
+                         f"and {MAX_LOOKAHEAD_PIPES}!")
+    return tuple(f"{axis}_dist_{i + 1}"
+                 for i in range(1, lookahead_pipes + 1) for axis in ("h", "v"))
+
+
+def with_lookahead(features: Sequence[str],
+                   lookahead_pipes: int) -> Tuple[str, ...]:
+    """ Appends to `features` the distance features to the `lookahead_pipes`
+    gaps after the next one that aren't among them yet. """
+    return tuple(features) + tuple(name
+                                   for name in lookahead_features(
+                                       lookahead_pipes)
+                                   if name not in features)
+
+
+class ObservationBuilder:
+    """ Computes the observation features of a game.
+
+    The features are chosen when the builder is created. Each call to the
+    builder computes all the chosen features in a single pass over the game's
+    state and writes them into a preallocated `float32` buffer. The gaps are
+    found through the game's index of the next pair of pipes (see
+    :meth:`.FlappyBirdLogic.gap_slot`), so looking further ahead only costs
+    the distances to the extra gaps.
+
+    Args:
+        features (Sequence[str]): Names of the features of the observations, in
+            order (see :data:`OBSERVATION_FEATURES`).
+        screen_size (Tuple[int, int]): The screen's width and height.
+        normalize (bool): Whether the distances should be normalized.
+
+    Attributes:
+        buffer (np.ndarray): The buffer where the observations are written.
+        v_dist (float): The "v_dist" feature computed in the last call, with
+            full (`float64`) precision. Used by the reward functions.
+    """
+
+    def __init__(self,
+                 features: Sequence[str],
+                 screen_size: Tuple[int, int],
+                 normalize: bool = True) -> None:
+        for name in features:
+            if name not in OBSERVATION_FEATURES:
+                raise ValueError(f"Invalid observation feature: \"{name}\"! "
+                                 f"Available features: "
+                                 f"{OBSERVATION_FEATURES}.")
+        if len(features) == 0:
+            raise ValueError("At least one observation feature is required!")
+
+        self.features = tuple(features)
+        self.buffer = np.zeros(len(self.features), dtype=np.float32)
+        self.v_dist = 0.0
+
+        self._h_norm = screen_size[0] if normalize else 1
+        self._v_norm = screen_size[1] if normalize else 1
+        # (the distances to the next gap are always computed, for the rewards)
+        self._num_gaps = 1 + max(GAP_FEATURES.get(name, 0)
+                                 for name in features)
+
+        # (each call computes the values `h_dist, v_dist` of each gap,
+        # followed by `vel_y, rot`, and selects the features from them)
+        indices = []
+        for name in features:
+            if name in GAP_FEATURES:
+                indices.append(2 * GAP_FEATURES[name]
+                               + name.startswith("v_dist"))
+            else:
+                indices.append(2 * self._num_gaps + (name == "rot"))
+        if len(indices) == 1:
+            self._select = lambda values: (values[indices[0]],)
+        else:
+            self._select = itemgetter(*indices)
+
+    @property
+    def size(self) -> int:
+        """ Number of values in an observation. """
+        return len(self.features)
+
+    def v_distance(self, game: FlappyBirdLogic) -> float:
+        """ Computes only the "v_dist" feature of the game's current state.
+        Cheaper than a full observation; used to compute the rewards of the
+        skipped frames. """
+        pipes = game.pipes
+        slot = pipes.start + game.next_pipe
+        gap_mid_y = (pipes.upper_ys[slot] + PIPE_HEIGHT
+                     + pipes.lower_ys[slot]) / 2
+        v_dist = gap_mid_y - (game.player_y + PLAYER_HEIGHT / 2)
+        return v_dist / self._v_norm
+
+    def __call__(self, game: FlappyBirdLogic) -> np.ndarray:
+        """ Computes the observation of the game's current state.
+
+        Returns:
+            The builder's buffer, with the new observation written to it.
+        """
+        pipes = game.pipes
+        xs, upper_ys, lower_ys = pipes.xs, pipes.upper_ys, pipes.lower_ys
+        player_left = game.player_x - PLAYER_WIDTH / 2
+        player_mid_y = game.player_y + PLAYER_HEIGHT / 2
+        h_norm, v_norm = self._h_norm, self._v_norm
+
+        # (same slots as `game.gap_slot(i)`, without the calls)
+        slot = pipes.start + game.next_pipe
+        last = pipes.stop - 1
+        values = []
+        for _ in range(self._num_gaps):
+            # extra distance to compensate for the buggy hit-box
+            h_dist = xs[slot] + PIPE_WIDTH / 2 - player_left + 3
+            v_dist = ((upper_ys[slot] + PIPE_HEIGHT + lower_ys[slot]) / 2
+                      - player_mid_y)
+            values += (h_dist / h_norm, v_dist / v_norm)
+            if slot < last:
+                slot += 1
+        values += (game.player_vel_y, game.player_rot)
+
+        self.v_dist = values[1]
+        self.buffer[:] = self._select(values)
+        return self.buffer
@@ -0,0 +1,119 @@
+""" Implements a compact storage for the pipes of a Flappy Bird game. """
+
+from array import array
+from typing import Iterator, Tuple
+
+#: Maximum number of pipe pairs a single game can hold at the same time. At
+#: most 3 pairs are on the screen at once with the default speed and spacing.
+PIPE_CAPACITY = 4
+
+#: Number of slots of a `PipeBuffer` per pair it can hold. Spare slots make
+#: the buffer compact itself (move its pairs back to the first slots) only once
+#: every few pushes.
+_SLOTS_PER_PIPE = 4
+
+
+class PipeBuffer:
+    """ Fixed-capacity buffer with the pairs of pipes of a game.
+
+    Each pair is made of an upper and a lower pipe, which share the same x
+    position. The positions are stored as integers in three `array('i')`
+    buffers, which are allocated once. The pairs always occupy the contiguous
+    slots `start, start + 1, ..., stop - 1` of the arrays: popping a pair from
+    the front just advances `start` and pushing a pair to the back writes to
+    slot `stop`. When the back of the arrays is reached, the (at most
+    `capacity`) live pairs are moved back to the first slots. Both operations
+    are O(1) and allocate nothing.
+
+    The pairs are indexed from the front (index 0 is the leftmost pair on the
+    screen). Renderers and observation builders should only read the buffer,
+    either through :meth:`__len__`, :meth:`__iter__`, :meth:`x`,
+    :meth:`upper_y` and :meth:`lower_y` or, in hot loops, by indexing the
+    arrays :attr:`xs`, :attr:`upper_ys` and :attr:`lower_ys` directly with the
+    slots in `range(start, stop)`. Only the game's logic should mutate it.
+
+    Args:
+        capacity (int): Maximum number of pairs the buffer can hold.
+
+    Attributes:
+        xs (array): The x positions of the pairs of pipes, by slot.
+        upper_ys (array): The y positions of the upper pipes, by slot.
+        lower_ys (array): The y positions of the lower pipes, by slot.
+        start (int): Slot of the first pair of pipes.
+        stop (int): Slot after the last pair of pipes.
+    """
+
+    __slots__ = ("xs", "upper_ys", "lower_ys", "start", "stop", "_capacity")
+
+    def __init__(self, capacity: int = PIPE_CAPACITY) -> None:
+        num_slots = capacity * _SLOTS_PER_PIPE
+        self.xs = array("i", bytes(4 * num_slots))
+        self.upper_ys = array("i", bytes(4 * num_slots))
+        self.lower_ys = array("i", bytes(4 * num_slots))
+        self.start = 0
+        self.stop = 0
+        self._capacity = capacity
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __iter__(self) -> Iterator[Tuple[int, int, int]]:
+        """ Iterates over the pairs, from the front to the back of the
+        buffer, yielding tuples `(x, upper_y, lower_y)`. """
+        start, stop = self.start, self.stop
+        return zip(self.xs[start:stop],
+                   self.upper_ys[start:stop],
+                   self.lower_ys[start:stop])
+
+    def _slot(self, i: int) -> int:
+        """ Returns the slot of the i-th pair of the buffer. """
+        if not 0 <= i < self.stop - self.start:
+            raise IndexError("Pipe index out of range!")
+        return self.start + i
+
+    def x(self, i: int) -> int:
+        """ Returns the x position of the i-th pair of pipes. """
+        return self.xs[self._slot(i)]
+
+    def upper_y(self, i: int) -> int:
+        """ Returns the y position of the upper pipe of the i-th pair. """
+        return self.upper_ys[self._slot(i)]
+
+    def lower_y(self, i: int) -> int:
+        """ Returns the y position of the lower pipe of the i-th pair. """
+        return self.lower_ys[self._slot(i)]
+
+    def push(self, x: int, upper_y: int, lower_y: int) -> None:
+        """ Adds a pair of pipes to the back of the buffer. """
+        count = self.stop - self.start
+        if count == self._capacity:
+            raise IndexError("The pipe buffer is full!")
+
+        if self.stop == len(self.xs):
+            start, stop = self.start, self.stop
+            self.xs[:count] = self.xs[start:stop]
+            self.upper_ys[:count] = self.upper_ys[start:stop]
+            self.lower_ys[:count] = self.lower_ys[start:stop]
+            self.start, self.stop = 0, count
+
+        slot = self.stop
+        self.xs[slot] = x
+        self.upper_ys[slot] = upper_y
+        self.lower_ys[slot] = lower_y
+        self.stop += 1
+
+    def pop(self) -> None:
+        """ Removes the pair of pipes at the front of the buffer. """
+        if self.stop == self.start:
+            raise IndexError("The pipe buffer is empty!")
+        self.start += 1
+
+    def clear(self) -> None:
+        """ Removes all the pairs of pipes. """
+        self.start = self.stop = 0
+
+    def move(self, dx: int) -> None:
+        """ Moves all the pairs of pipes horizontally by `dx` pixels. """
+        xs = self.xs
+        for slot in range(self.start, self.stop):
+            xs[slot] += dx
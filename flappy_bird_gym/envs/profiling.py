@@ -0,0 +1,368 @@
+""" Opt-in instrumentation of the time spent in each phase of the
+environments' steps.
+
+Environments and renderers that inherit from :class:`ProfilingMixin` can time
+the calls to some of their methods (and to the methods of their games and
+renderers), such as `update_state`, `check_crash`, the computation of the
+observations and rewards, `draw_surface` or the extraction of the frames as
+arrays. The durations are accumulated, per phase, into a
+:class:`PerfCounters`: call counts, totals, extremes and a log2 histogram,
+which can be exported as JSON or CSV.
+
+Profiling is off by default and costs nothing while it's off: the timed
+methods are only wrapped (on the instances) by :meth:`~ProfilingMixin.\
+enable_profiling` and unwrapped by :meth:`~ProfilingMixin.disable_profiling`.
+The phases nest: e.g. the time of "check_crash" is also counted in the time of
+"update_state", which is also counted in the time of "step".
+
+Example:
+    env = FlappyBirdEnvSimple()
+    env.enable_profiling()
+    ...  # (reset and step the environment)
+    print(env.get_perf_stats()["update_state"]["mean_us"])
+
+:func:`profile_session` (used by the `--profile` command line flag) enables
+the counters of all the environments created in the session, runs it under
+cProfile or pyinstrument and prints both reports.
+"""
+
+import contextlib
+import csv
+import functools
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+#: Profilers available to :func:`profile_session`.
+PROFILERS = ("cprofile", "pyinstrument")
+
+#: Percentiles reported by :meth:`PerfCounters.stats`.
+PERCENTILES = (50, 90, 99)
+
+#: Number of buckets of the histograms. The bucket `b` holds the durations
+#: `d`, in nanoseconds, with `d.bit_length() == b` (i.e. `2 ** (b - 1) <= d
+#: < 2 ** b`).
+NUM_BUCKETS = 64
+
+#: Counters used by the environments that haven't enabled their own (see
+#: :func:`enable_global_profiling`).
+_global_counters = None
+
+#: Marks the instance attributes that didn't exist before being wrapped.
+_MISSING = object()
+
+
+class _Phase:
+    """ Running statistics of the durations of a phase. """
+
+    __slots__ = ("calls", "total_ns", "min_ns", "max_ns", "buckets")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+        self.min_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def add(self, elapsed_ns: int) -> None:
+        if self.calls == 0 or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.buckets[elapsed_ns.bit_length()] += 1
+
+    def percentile(self, q: float) -> float:
+        """ Returns an estimate of the q-th percentile of the durations, in
+        nanoseconds (interpolated within the histogram's bucket). """
+        rank = q / 100 * self.calls
+        seen = 0
+        for b, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = 0 if b == 0 else 1 << (b - 1)
+                high = 1 << b
+                value = low + (high - low) * (rank - seen) / count
+                return min(max(value, self.min_ns), self.max_ns)
+            seen += count
+        return float(self.max_ns)
+
+
+class PerfCounters:
+    """ Wall time spent in each phase of the instrumented calls.
+
+    Can be shared by many environments, whose phases are then accumulated
+    together. The counters aren't thread-safe: share them only between
+    environments stepped by the same thread.
+    """
+
+    def __init__(self) -> None:
+        self._phases: Dict[str, _Phase] = {}
+
+    def phase(self, name: str) -> _Phase:
+        """ Returns the statistics of a phase, creating them if needed. """
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase()
+        return phase
+
+    def record(self, name: str, elapsed_ns: int) -> None:
+        """ Adds a duration, in nanoseconds, to a phase. """
+        self.phase(name).add(elapsed_ns)
+
+    def timed(self, func: Callable, name: str) -> Callable:
+        """ Returns a wrapper of `func` that adds the duration of each call to
+        the phase `name`. """
+        add = self.phase(name).add
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(clock() - start)
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """ Context manager that adds the duration of its block to the phase
+        `name` (for code that isn't a method call). """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
+
+    def reset(self) -> None:
+        """ Clears all the phases. """
+        self._phases.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """ Returns, for each phase, the number of calls (`"calls"`), the total
+        time, in milliseconds (`"total_ms"`), and the mean, minimum, maximum
+        and :data:`PERCENTILES` of the calls' durations, in microseconds
+        (`"mean_us"`, `"min_us"`, `"max_us"`, `"p50_us"`, ...). The
+        percentiles are estimated from the histograms. """
+        stats = {}
+        for name, phase in self._phases.items():
+            if phase.calls == 0:
+                continue
+            stats[name] = {
+                "calls": phase.calls,
+                "total_ms": phase.total_ns / 1e6,
+                "mean_us": phase.total_ns / phase.calls / 1e3,
+                "min_us": phase.min_ns / 1e3,
+                "max_us": phase.max_ns / 1e3,
+                **{f"p{q}_us": phase.percentile(q) / 1e3
+                   for q in PERCENTILES},
+            }
+        return stats
+
+    def histograms(self) -> Dict[str, List[Tuple[int, int, int]]]:
+        """ Returns, for each phase, the non-empty buckets of its histogram,
+        as tuples `(low_ns, high_ns, count)` with the bounds of the bucket
+        (`low_ns <= duration < high_ns`) and its number of calls. """
+        return {
+            name: [(0 if b == 0 else 1 << (b - 1), 1 << b, count)
+                   for b, count in enumerate(phase.buckets) if count]
+            for name, phase in self._phases.items() if phase.calls
+        }
+
+    def export_histograms(self, path: str) -> None:
+        """ Writes the statistics and histograms of the phases to a file:
+        JSON if `path` ends with ".json" and CSV (one row per bucket, with the
+        columns "phase", "low_ns", "high_ns" and "count") otherwise. """
+        histograms = self.histograms()
+        if path.endswith(".json"):
+            stats = self.stats()
+            report = {name: {**stats[name],
+                             "histogram": [{"low_ns": low, "high_ns": high,
+                                            "count": count}
+                                           for low, high, count in buckets]}
+                      for name, buckets in histograms.items()}
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("phase", "low_ns", "high_ns", "count"))
+            for name, buckets in histograms.items():
+                writer.writerows((name, *bucket) for bucket in buckets)
+
+    def format_table(self) -> str:
+        """ Returns the statistics of the phases as a text table. """
+        lines = [f"{'phase':<18}{'calls':>10}{'total (ms)':>13}"
+                 f"{'mean (us)':>11}{'p50 (us)':>10}{'p99 (us)':>10}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<18}{s['calls']:>10}{s['total_ms']:>13.1f}"
+                         f"{s['mean_us']:>11.2f}{s['p50_us']:>10.2f}"
+                         f"{s['p99_us']:>10.2f}")
+        return "\n".join(lines)
+
+
+def enable_global_profiling(
+        counters: Optional[PerfCounters] = None) -> PerfCounters:
+    """ Makes the environments that don't have their own counters record
+    their phases into `counters` (or into new counters) from their next reset
+    on. Returns the counters. """
+    global _global_counters
+    _global_counters = counters if counters is not None else PerfCounters()
+    return _global_counters
+
+
+def disable_global_profiling() -> None:
+    """ Stops :func:`enable_global_profiling` from instrumenting new
+    environments (the instrumented ones keep recording until they're
+    disabled). """
+    global _global_counters
+    _global_counters = None
+
+
+class ProfilingMixin:
+    """ Adds opt-in timing of the phases of an object's calls.
+
+    The methods listed in :attr:`profiled_methods` (and the ones added by
+    :meth:`_instrument`, in subclasses) are wrapped, on the instance, by
+    :meth:`enable_profiling`. Objects that replace the instrumented objects
+    (e.g. environments that create a new game on each reset) must call
+    :meth:`_refresh_profiling` after doing so.
+    """
+
+    #: Methods (attribute names) timed when profiling, and their phases.
+    profiled_methods: Dict[str, str] = {}
+
+    _perf: Optional[PerfCounters] = None
+    _perf_patches: Tuple = ()
+
+    def enable_profiling(self,
+                         counters: Optional[PerfCounters] = None,
+                         ) -> PerfCounters:
+        """ Starts timing the phases of the calls.
+
+        Args:
+            counters (Optional[PerfCounters]): Counters where the durations are
+                recorded (e.g. shared with other environments). If `None`, new
+                counters are created.
+
+        Returns:
+            The counters.
+        """
+        self.disable_profiling()
+        self._perf = counters if counters is not None else PerfCounters()
+        self._perf_patches = []
+        self._instrument()
+        return self._perf
+
+    def disable_profiling(self) -> None:
+        """ Stops timing the phases of the calls (unwraps the methods). """
+        for obj, name, original in reversed(self._perf_patches):
+            if original is _MISSING:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self._perf_patches = ()
+        self._perf = None
+
+    def get_perf_stats(self) -> Dict[str, Dict[str, float]]:
+        """ Returns the statistics of each phase (see
+        :meth:`PerfCounters.stats`), or an empty dictionary if profiling isn't
+        enabled. """
+        return {} if self._perf is None else self._perf.stats()
+
+    def _time_methods(self, obj: Any, methods: Dict[str, str]) -> None:
+        """ Wraps the given methods of `obj` (attribute names, mapped to their
+        phases) to record the durations of their calls. """
+        for name, phase in methods.items():
+            original = obj.__dict__.get(name, _MISSING)
+            self._perf_patches.append((obj, name, original))
+            setattr(obj, name, self._perf.timed(getattr(obj, name), phase))
+
+    def _instrument(self) -> None:
+        """ Wraps the timed methods. Subclasses can extend it to time the
+        methods of other objects. """
+        self._time_methods(self, self.profiled_methods)
+
+    def _refresh_profiling(self) -> None:
+        """ Instruments the object again (e.g. after its game was replaced),
+        if profiling is enabled for it or globally. """
+        counters = self._perf if self._perf is not None else _global_counters
+        if counters is not None:
+            self.enable_profiling(counters)
+
+
+@contextlib.contextmanager
+def profile_session(profiler: Optional[str] = None,
+                    out: Optional[str] = None,
+                    file=None) -> Iterator[PerfCounters]:
+    """ Context manager that records the phases of all the environments
+    created (or reset) within it into shared counters and, optionally, runs
+    the block under a profiler. On exit, prints the profiler's report and the
+    phases' statistics.
+
+    Only the environments of the current process are instrumented (the
+    phases of environments stepped in worker processes aren't recorded).
+
+    Args:
+        profiler (Optional[str]): One of :data:`PROFILERS` (pyinstrument must
+            be installed to use it), or `None` to only record the phases.
+        out (Optional[str]): If given, the profile is saved to this path
+            (cProfile's stats, loadable by `pstats`, or pyinstrument's HTML
+            report) and the phases' histograms to `out + ".phases.json"`,
+            instead of being printed.
+        file: Stream where the reports are printed (defaults to stderr).
+
+    Yields:
+        The counters of the session.
+    """
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f"Invalid profiler: \"{profiler}\"! "
+                         f"Available profilers: {PROFILERS}.")
+    file = sys.stderr if file is None else file
+
+    session = None
+    if profiler == "cprofile":
+        import cProfile
+        session = cProfile.Profile()
+        start, stop = session.enable, session.disable
+    elif profiler == "pyinstrument":
+        # (imported here, since it's an optional dependency)
+        from pyinstrument import Profiler
+        session = Profiler()
+        start, stop = session.start, session.stop
+
+    previous = _global_counters
+    counters = enable_global_profiling()
+    if session is not None:
+        start()
+    try:
+        yield counters
+    finally:
+        if session is not None:
+            stop()
+        if previous is not None:
+            enable_global_profiling(previous)
+        else:
+            disable_global_profiling()
+
+        if profiler == "cprofile":
+            if out is not None:
+                session.dump_stats(out)
+            else:
+                import pstats
+                pstats.Stats(session, stream=file).sort_stats(
+                    "cumulative").print_stats(30)
+        elif profiler == "pyinstrument":
+            if out is not None:
+                with open(out, "w") as f:
+                    f.write(session.output_html())
+            else:
+                print(session.output_text(), file=file)
+
+        if out is not None:
+            counters.export_histograms(out + ".phases.json")
+        print(counters.format_table(), file=file)
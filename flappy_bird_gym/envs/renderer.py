@@ -6,56 +6,216 @@ GitHub repository by `sourahbhv` (https://github.com/sourabhv/FlapPyBird),
 released under the MIT license.
 """
 
-from typing import Optional, Tuple
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pygame
 
 from flappy_bird_gym.envs import utils
-
-#: Player's rotation threshold.
-PLAYER_ROT_THR = 20
+from flappy_bird_gym.envs.cache import LRUCache
+from flappy_bird_gym.envs.game_logic import PLAYER_ROT_THR
+from flappy_bird_gym.envs.profiling import ProfilingMixin
 
 #: Color to fill the surface's background when no background image was loaded.
 FILL_BACKGROUND_COLOR = (200, 200, 200)
 
+#: Number of frames whose times are kept for the frame statistics.
+FRAME_STATS_WINDOW = 1000
+
+#: Weights of the red, green and blue channels in the grayscale conversion
+#: (ITU-R BT.601 luma).
+GRAYSCALE_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def prepare_sprite(image: pygame.Surface,
+                   scale: Tuple[float, float] = (1, 1),
+                   grayscale: bool = False) -> pygame.Surface:
+    """ Prepares a sprite to be drawn at a different resolution and/or in
+    grayscale.
+
+    Args:
+        image (pygame.Surface): The sprite, as loaded by `utils.load_images`.
+        scale (Tuple[float, float]): Horizontal and vertical scale factors.
+        grayscale (bool): Whether to convert the sprite to grayscale.
+
+    Returns:
+        A new 32-bit surface with per-pixel alpha (required by `smoothscale`,
+        and which keeps the sprite's transparency).
+    """
+    sprite = pygame.Surface(image.get_size(), pygame.SRCALPHA, 32)
+    sprite.blit(image, (0, 0))
+
+    if tuple(scale) != (1, 1):
+        size = (max(1, round(image.get_width() * scale[0])),
+                max(1, round(image.get_height() * scale[1])))
+        sprite = pygame.transform.smoothscale(sprite, size)
+
+    if grayscale:
+        pixels = pygame.surfarray.pixels3d(sprite)
+        luma = pixels @ np.array(GRAYSCALE_WEIGHTS)
+        pixels[:] = np.rint(luma).astype(np.uint8)[..., None]
+        del pixels  # (unlocks the sprite)
+
+    return sprite
+
+
+def _prepare_images(bird_color: str,
+                    pipe_color: str,
+                    background: Optional[str],
+                    scale: Tuple[float, float],
+                    grayscale: bool) -> Dict[str, Any]:
+    """ Loads the image assets of the game and prepares them (see
+    :func:`prepare_sprite`). """
+    images = utils.load_images(convert=False,
+                               bird_color=bird_color,
+                               pipe_color=pipe_color,
+                               bg_type=background)
+    return {
+        name: (None if value is None
+               else tuple(prepare_sprite(img, scale, grayscale)
+                          for img in value)
+               if type(value) in (tuple, list)
+               else prepare_sprite(value, scale, grayscale))
+        for name, value in images.items()
+    }
+
+
+#: Process-wide cache of the sprites prepared for scaled and/or grayscale
+#: renderers, keyed by `(bird_color, pipe_color, background, scale,
+#: grayscale)`. The prepared surfaces are shared by the renderers.
+PREPARED_IMAGES = LRUCache(_prepare_images, maxsize=32)
+
+
+def merge_rects(rects: List[pygame.Rect]) -> List[pygame.Rect]:
+    """ Merges overlapping rectangles (each group of overlapping rectangles is
+    replaced by their union), so no area is redrawn twice. """
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
 
-class FlappyBirdRenderer:
+
+class FlappyBirdRenderer(ProfilingMixin):
     """ Handles the rendering of the game.
 
     This class implements the game's renderer, responsible from drawing the game
-    on the screen.
+    on the screen. The time spent drawing the frames can be recorded with
+    :meth:`enable_profiling` (see :mod:`.profiling`).
 
     Args:
         screen_size (Tuple[int, int]): The screen's width and height.
-        audio_on (bool): Whether the game's audio is ON or OFF.
+        audio_on (bool): Whether the game's audio is ON or OFF. The mixer is
+            only initialized, and the sounds loaded, when the first sound is
+            played. Renderers that don't draw to a display (e.g. of the RGB
+            environments) should turn it off.
         bird_color (str): Color of the flappy bird.
         pipe_color (str): Color of the pipes.
         background (str): Type of background image.
+        output_size (Optional[Tuple[int, int]]): Width and height of the
+            renderer's surface. If different from `screen_size`, the sprites
+            are scaled once, when the renderer is created, and the game is
+            drawn directly at this resolution. If `None`, the surface has the
+            screen's size.
+        grayscale (bool): If `True`, the sprites are converted to grayscale
+            once, when the renderer is created (the red, green and blue
+            channels of the surface are then always equal, see
+            :meth:`gray_frame`).
+        rotation_cache_size (Optional[int]): Maximum number of rotated bird
+            sprites kept in :attr:`rotation_cache`. The default game produces
+            114 (3 animation frames times 38 visible rotations); if `None`, the
+            cache is unbounded.
+        dirty_rects (bool): If `True`, only the areas that changed since the
+            last frame (the previous and current rectangles of the bird, the
+            pipes, the base and the score) are redrawn on the surface, and only
+            these areas are copied to the display and passed to
+            `pygame.display.update`. Ignored if the surface is scaled.
+
+    Attributes:
+        rotation_cache (LRUCache): Cache of the rotated bird sprites, keyed by
+            `(player_idx, visible_rotation)`. Its `hits` and `misses` counters
+            tell how many rotations were saved.
     """
 
+    profiled_methods = {"draw_surface": "draw_surface",
+                        "gray_frame": "gray_frame",
+                        "update_display": "update_display"}
+
     def __init__(self,
                  screen_size: Tuple[int, int] = (288, 512),
                  audio_on: bool = True,
                  bird_color: str = "yellow",
                  pipe_color: str = "green",
-                 background: Optional[str] = "day") -> None:
+                 background: Optional[str] = "day",
+                 output_size: Optional[Tuple[int, int]] = None,
+                 grayscale: bool = False,
+                 rotation_cache_size: Optional[int] = 128,
+                 dirty_rects: bool = False) -> None:
         self._screen_width = screen_size[0]
         self._screen_height = screen_size[1]
+        if output_size is None:
+            output_size = screen_size
+        self._scale_x = output_size[0] / screen_size[0]
+        self._scale_y = output_size[1] / screen_size[1]
+        self._scaled = tuple(output_size) != tuple(screen_size)
+        self.grayscale = grayscale
 
         self.display = None
-        self.surface = pygame.Surface(screen_size)
-        self.images = utils.load_images(convert=False,
-                                        bird_color=bird_color,
-                                        pipe_color=pipe_color,
-                                        bg_type=background)
+        self.surface = pygame.Surface(output_size)
+        if self._scaled or grayscale:
+            self.images = dict(PREPARED_IMAGES.get((
+                bird_color, pipe_color, background,
+                (self._scale_x, self._scale_y), grayscale,
+            )))
+        else:
+            self.images = utils.load_images(convert=False,
+                                            bird_color=bird_color,
+                                            pipe_color=pipe_color,
+                                            bg_type=background)
         self.audio_on = audio_on
         self._audio_queue = []
-        if audio_on:
-            self.sounds = utils.load_sounds()
+        self._sounds = None
+
+        self.rotation_cache = LRUCache(self._rotate_player,
+                                       maxsize=rotation_cache_size)
+
+        self.dirty_rects = dirty_rects and not self._scaled
+        self._prev_rects = None
+        self._pending_rects = None
+        self._draw_times = deque(maxlen=FRAME_STATS_WINDOW)
+        self._display_times = deque(maxlen=FRAME_STATS_WINDOW)
+        self._updated_fractions = deque(maxlen=FRAME_STATS_WINDOW)
 
         self.game = None
         self._clock = pygame.time.Clock()
 
+    @property
+    def sounds(self) -> Dict[str, pygame.mixer.Sound]:
+        """ The game's sounds (loaded on first access). """
+        if self._sounds is None:
+            self._sounds = utils.load_sounds()
+        return self._sounds
+
+    def _rotate_player(self, idx: int, rot: int) -> pygame.Surface:
+        """ Rotates a frame of the bird's animation (see
+        :attr:`rotation_cache`). """
+        return pygame.transform.rotate(self.images['player'][idx], rot)
+
+    def _to_surface(self, x: float, y: float) -> Tuple[int, int]:
+        """ Converts screen coordinates to coordinates of the surface. """
+        if self._scaled:
+            return round(x * self._scale_x), round(y * self._scale_y)
+        return x, y
+
     def make_display(self) -> None:
         """ Initializes the pygame's display.
 
@@ -74,33 +234,41 @@ class FlappyBirdRenderer:
                 self.images[name] = (value.convert() if name == "background"
                                      else value.convert_alpha())
 
-    def _draw_score(self) -> None:
-        """ Draws the score in the center of the surface. """
-        score_digits = [int(x) for x in list(str(self.game.score))]
-        total_width = 0  # total width of all numbers to be printed
+        # (the cached sprites were rotated from the unconverted images)
+        self.rotation_cache.clear()
+        self._prev_rects = self._pending_rects = None
 
-        for digit in score_digits:
-            total_width += self.images['numbers'][digit].get_width()
+    def _score_layout(self) -> List[Tuple[pygame.Surface, float, float]]:
+        """ Returns the sprites of the score's digits and their positions. """
+        digits = [self.images['numbers'][int(x)] for x in str(self.game.score)]
+        total_width = sum(img.get_width() for img in digits)
 
-        x_offset = (self._screen_width - total_width) / 2
+        x_offset = (self.surface.get_width() - total_width) / 2
+        y_offset = self.surface.get_height() * 0.1
+        layout = []
+        for img in digits:
+            layout.append((img, x_offset, y_offset))
+            x_offset += img.get_width()
+        return layout
 
-        for digit in score_digits:
-            self.surface.blit(self.images['numbers'][digit],
-                              (x_offset, self._screen_height * 0.1))
-            x_offset += self.images['numbers'][digit].get_width()
-
-    def draw_surface(self, show_score: bool = True) -> None:
-        """ Re-draws the renderer's surface.
+    def _draw_score(self) -> None:
+        """ Draws the score in the center of the surface. """
+        for img, x, y in self._score_layout():
+            self.surface.blit(img, (x, y))
 
-        This method updates the renderer's surface by re-drawing it according to
-        the current state of the game.
+    def _player_surface(self) -> pygame.Surface:
+        """ Returns the bird's (rotated) sprite. """
+        visible_rot = PLAYER_ROT_THR
+        if self.game.player_rot <= PLAYER_ROT_THR:
+            visible_rot = self.game.player_rot
 
-        Args:
-            show_score (bool): Whether to draw the player's score or not.
-        """
-        if self.game is None:
-            raise ValueError("A game logic must be assigned to the renderer!")
+        return self.rotation_cache.get((self.game.player_idx, visible_rot))
 
+    def _draw(self,
+              show_score: bool,
+              player_surface: pygame.Surface) -> None:
+        """ Draws the current state of the game (within the surface's clipping
+        area, if one is set). """
         # Background
         if self.images['background'] is not None:
             self.surface.blit(self.images['background'], (0, 0))
@@ -108,35 +276,112 @@ class FlappyBirdRenderer:
             self.surface.fill(FILL_BACKGROUND_COLOR)
 
         # Pipes
-        for up_pipe, low_pipe in zip(self.game.upper_pipes,
-                                     self.game.lower_pipes):
+        to_surface = self._to_surface
+        for pipe_x, upper_y, lower_y in self.game.pipes:
             self.surface.blit(self.images['pipe'][0],
-                              (up_pipe['x'], up_pipe['y']))
+                              to_surface(pipe_x, upper_y))
             self.surface.blit(self.images['pipe'][1],
-                              (low_pipe['x'], low_pipe['y']))
+                              to_surface(pipe_x, lower_y))
 
         # Base (ground)
-        self.surface.blit(self.images['base'], (self.game.base_x,
-                                                self.game.base_y))
+        self.surface.blit(self.images['base'], to_surface(self.game.base_x,
+                                                          self.game.base_y))
 
         # Score
         # (must be drawn before the player, so the player overlaps it)
         if show_score:
             self._draw_score()
 
-        # Getting player's rotation
-        visible_rot = PLAYER_ROT_THR
-        if self.game.player_rot <= PLAYER_ROT_THR:
-            visible_rot = self.game.player_rot
-
         # Player
-        player_surface = pygame.transform.rotate(
-            self.images['player'][self.game.player_idx],
-            visible_rot,
-        )
+        self.surface.blit(player_surface, to_surface(self.game.player_x,
+                                                     self.game.player_y))
+
+    def _sprite_rects(self,
+                      show_score: bool,
+                      player_surface: pygame.Surface) -> List[pygame.Rect]:
+        """ Returns the rectangles covered by the moving parts of the frame:
+        the pipes, the base, the score and the bird. """
+        game = self.game
+        upper_pipe, lower_pipe = self.images['pipe']
+        rects = []
+        for pipe_x, upper_y, lower_y in game.pipes:
+            rects.append(upper_pipe.get_rect(topleft=(pipe_x, upper_y)))
+            rects.append(lower_pipe.get_rect(topleft=(pipe_x, lower_y)))
+
+        # (the base scrolls on every frame, so its whole strip is included)
+        base_y = int(game.base_y)
+        rects.append(pygame.Rect(0, base_y, self.surface.get_width(),
+                                 self.surface.get_height() - base_y))
+
+        if show_score:
+            rects.extend(img.get_rect(topleft=(int(x), int(y)))
+                         for img, x, y in self._score_layout())
+
+        rects.append(player_surface.get_rect(
+            topleft=(int(game.player_x), int(game.player_y))))
+        return rects
+
+    def draw_surface(self, show_score: bool = True) -> None:
+        """ Re-draws the renderer's surface.
+
+        This method updates the renderer's surface by re-drawing it according to
+        the current state of the game. In dirty rectangles mode, only the areas
+        that changed since the last call are re-drawn.
+
+        Args:
+            show_score (bool): Whether to draw the player's score or not.
+        """
+        if self.game is None:
+            raise ValueError("A game logic must be assigned to the renderer!")
+
+        start = time.perf_counter()
+        player_surface = self._player_surface()
+        if not self.dirty_rects:
+            self._draw(show_score, player_surface)
+        else:
+            rects = self._sprite_rects(show_score, player_surface)
+            if self._prev_rects is None:
+                self._draw(show_score, player_surface)
+                self._pending_rects = None      # (full update)
+            else:
+                dirty = merge_rects(rects + self._prev_rects)
+                for rect in dirty:
+                    self.surface.set_clip(rect)
+                    self._draw(show_score, player_surface)
+                self.surface.set_clip(None)
+
+                # (accumulated until the display is updated)
+                if self._pending_rects is not None:
+                    self._pending_rects.extend(dirty)
+            self._prev_rects = rects
+
+        self._draw_times.append(time.perf_counter() - start)
+
+    def gray_frame(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """ Returns the pixels of the renderer's surface as a grayscale image.
 
-        self.surface.blit(player_surface, (self.game.player_x,
-                                           self.game.player_y))
+        Requires the renderer to be in grayscale mode: since the sprites were
+        converted to grayscale beforehand, the image is just a copy of one of
+        the surface's channels (no color conversion is done per frame).
+
+        Args:
+            out (Optional[np.ndarray]): Array with shape `(height, width)` and
+                dtype `uint8` into which the image is copied. If `None`, a new
+                array is allocated.
+
+        Returns:
+            The image, with shape `(height, width)` and dtype `uint8`.
+        """
+        if not self.grayscale:
+            raise RuntimeError("The renderer isn't in grayscale mode!")
+
+        if out is None:
+            width, height = self.surface.get_size()
+            out = np.empty((height, width), dtype=np.uint8)
+
+        # (the surface is indexed by (x, y), hence the transposed view)
+        pygame.pixelcopy.surface_to_array(out.T, self.surface, kind="R")
+        return out
 
     def update_display(self) -> None:
         """ Updates the display with the current surface of the renderer.
@@ -153,10 +398,50 @@ class FlappyBirdRenderer:
                 "call the `make_display()` method."
             )
 
-        self.display.blit(self.surface, [0, 0])
-        pygame.display.update()
+        start = time.perf_counter()
+        if self._scaled:
+            pygame.transform.scale(self.surface, self.display.get_size(),
+                                   self.display)
+            pygame.display.update()
+            updated_fraction = 1.0
+        elif not self.dirty_rects or self._pending_rects is None:
+            self.display.blit(self.surface, [0, 0])
+            pygame.display.update()
+            updated_fraction = 1.0
+            if self.dirty_rects:
+                self._pending_rects = []
+        else:
+            dirty = merge_rects(self._pending_rects)
+            screen = self.surface.get_rect()
+            dirty = [rect.clip(screen) for rect in dirty]
+            for rect in dirty:
+                self.display.blit(self.surface, rect, rect)
+            pygame.display.update(dirty)
+            updated_fraction = (sum(rect.w * rect.h for rect in dirty)
+                                / (screen.w * screen.h))
+            self._pending_rects = []
+
+        self._display_times.append(time.perf_counter() - start)
+        self._updated_fractions.append(updated_fraction)
 
         # Sounds:
         if self.audio_on and self.game.sound_cache is not None:
             sound_name = self.game.sound_cache
             self.sounds[sound_name].play()
+
+    def frame_stats(self) -> Dict[str, float]:
+        """ Returns statistics of the last frames (up to
+        :data:`FRAME_STATS_WINDOW`): the number of frames, the mean, median and
+        95th percentile of the times (in milliseconds) spent drawing the
+        surface and updating the display, and the mean fraction of the display
+        that was updated per frame. """
+        stats = {"frames": len(self._display_times)}
+        for name, times in (("draw", self._draw_times),
+                            ("display", self._display_times)):
+            times_ms = 1000 * np.array(times if times else [np.nan])
+            stats[f"{name}_ms_mean"] = float(times_ms.mean())
+            stats[f"{name}_ms_p50"] = float(np.percentile(times_ms, 50))
+            stats[f"{name}_ms_p95"] = float(np.percentile(times_ms, 95))
+        stats["updated_fraction"] = (float(np.mean(self._updated_fractions))
+                                     if self._updated_fractions else np.nan)
+        return stats
@@ -0,0 +1,36 @@
+""" Reward functions of the Flappy Bird environments that yield simple
+observations.
+
+A reward function receives the "v_dist" observation feature (difference
+between the player's y position and the next hole's y position, normalized if
+the observations are) and whether the player scored a point in the step, and
+returns the step's reward.
+"""
+
+from typing import Callable, Dict
+
+#: Signature of the reward functions.
+RewardFunction = Callable[[float, bool], float]
+
+
+def dense_reward(v_dist: float, scored: bool) -> float:
+    """ Rewards the player for staying close to the next hole. """
+    return 1 - abs(v_dist)
+
+
+def sparse_dense_reward(v_dist: float, scored: bool) -> float:
+    """ Gives 2 when a point is scored and the dense reward otherwise. """
+    return 2 if scored else 1 - abs(v_dist)
+
+
+def sparse_survival_reward(v_dist: float, scored: bool) -> float:
+    """ Gives 3 when a point is scored and 1 for surviving otherwise. """
+    return 3 if scored else 1
+
+
+#: Reward functions available by name.
+REWARD_FUNCTIONS: Dict[str, RewardFunction] = {
+    "dense": dense_reward,
+    "sparse_dense": sparse_dense_reward,
+    "sparse_survival": sparse_survival_reward,
+}
@@ -10,17 +10,29 @@ from pathlib import Path
 import sys
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 from pygame import image as pyg_image
 from pygame import mixer as pyg_mixer
-from pygame import Rect
+from pygame import Rect, SRCALPHA, Surface
 from pygame.transform import flip as img_flip
 
+from flappy_bird_gym.envs.cache import LRUCache
+
 
 _BASE_DIR = Path(os.path.dirname(os.path.realpath(__file__))).parent
 
 SPRITES_PATH = str(_BASE_DIR / "assets/sprites")
 AUDIO_PATH = str(_BASE_DIR / "assets/audio")
 
+#: Environment variable with the path of an asset pack (see
+#: :func:`build_asset_pack`) to load the sprites from. Read when the first
+#: sprite is loaded, so it also applies to worker processes.
+ASSET_PACK_ENV_VAR = "FLAPPY_BIRD_ASSET_PACK"
+
+# (decoded sprites of the asset pack in use, by file name; `False` until the
+# environment variable is read)
+_asset_pack = False
+
 
 def pixel_collision(rect1: Rect,
                     rect2: Rect,
@@ -52,8 +64,47 @@ def get_hitmask(image) -> List[List[bool]]:
     return mask
 
 
+def build_asset_pack(path: str) -> None:
+    """ Decodes all the sprites and saves them, as NumPy arrays, into an asset
+    pack (an uncompressed `.npz` file), which :func:`use_asset_pack` loads
+    without decoding any PNG. The transparent pixels of the sprites (given by
+    a color key in the PNGs) are stored in an alpha channel. """
+    arrays = {}
+    for filename in sorted(os.listdir(SPRITES_PATH)):
+        if not filename.endswith(".png"):
+            continue
+        img = pyg_image.load(f"{SPRITES_PATH}/{filename}")
+        sprite = Surface(img.get_size(), SRCALPHA, 32)
+        sprite.blit(img, (0, 0))
+        arrays[filename] = np.frombuffer(
+            pyg_image.tostring(sprite, "RGBA"), dtype=np.uint8,
+        ).reshape(img.get_height(), img.get_width(), 4)
+    np.savez(path, **arrays)
+
+
+def use_asset_pack(path: Optional[str]) -> None:
+    """ Makes the following loads read the sprites from an asset pack (see
+    :func:`build_asset_pack`), or from the PNG files if `path` is `None`.
+    Clears :data:`IMAGE_CACHE`. """
+    global _asset_pack
+    if path is None:
+        _asset_pack = None
+    else:
+        with np.load(path) as pack:
+            _asset_pack = {name: pack[name] for name in pack.files}
+    IMAGE_CACHE.clear()
+
+
 def _load_sprite(filename, convert, alpha=True):
-    img = pyg_image.load(f"{SPRITES_PATH}/{filename}")
+    if _asset_pack is False:
+        use_asset_pack(os.environ.get(ASSET_PACK_ENV_VAR) or None)
+
+    if _asset_pack is not None and filename in _asset_pack:
+        pixels = _asset_pack[filename]
+        img = pyg_image.frombuffer(pixels.tobytes(),
+                                   pixels.shape[1::-1], "RGBA").copy()
+    else:
+        img = pyg_image.load(f"{SPRITES_PATH}/{filename}")
     return (img.convert_alpha() if convert and alpha
             else img.convert() if convert
             else img)
@@ -63,7 +114,20 @@ def load_images(convert: bool = True,
                 bg_type: Optional[str] = "day",
                 bird_color: str = "yellow",
                 pipe_color: str = "green") -> Dict[str, Any]:
-    """ Loads and returns the image assets of the game. """
+    """ Loads and returns the image assets of the game.
+
+    The images are decoded once per process for each combination of
+    arguments (see :data:`IMAGE_CACHE`). Each call returns a new dictionary,
+    but the surfaces in it are shared, so they must not be modified in place.
+    """
+    return dict(IMAGE_CACHE.get((bird_color, pipe_color, bg_type, convert)))
+
+
+def _decode_images(bird_color: str,
+                   pipe_color: str,
+                   bg_type: Optional[str],
+                   convert: bool) -> Dict[str, Any]:
+    """ Decodes the image assets of the game (see :func:`load_images`). """
     images = {}
 
     try:
@@ -114,8 +178,26 @@ def load_images(convert: bool = True,
     return images
 
 
+#: Process-wide cache of the decoded image assets, keyed by
+#: `(bird_color, pipe_color, bg_type, convert)`, so environments created in
+#: the same process share their sprites.
+IMAGE_CACHE = LRUCache(_decode_images, maxsize=None)
+
+# (loaded by the first call to `load_sounds`)
+_sounds = None
+
+
 def load_sounds() -> Dict[str, pyg_mixer.Sound]:
-    """ Loads and returns the audio assets of the game. """
+    """ Loads and returns the audio assets of the game. The mixer is
+    initialized and the sounds are decoded once per process. """
+    global _sounds
+    if _sounds is None:
+        _sounds = _decode_sounds()
+    return dict(_sounds)
+
+
+def _decode_sounds() -> Dict[str, pyg_mixer.Sound]:
+    """ Initializes the mixer and decodes the audio assets of the game. """
     pyg_mixer.init()
     sounds = {}
 
@@ -0,0 +1,396 @@
+""" Batched evaluation of trained policies.
+
+Plays a number of headless episodes with each given model (a
+`stable-baselines3` zip file, such as the ones at the root of the repository)
+on each given environment, and reports the statistics of the episodes' scores,
+lengths and returns, plus the evaluation's throughput.
+
+Each evaluation runs the vectorized version of the environment (e.g.
+"FlappyBird-vec-v3" for "FlappyBird-v3"), so each call to the model's
+`predict` method chooses the actions of all its games at once. The
+evaluations of the different (model, environment) pairs run in parallel, in a
+process pool.
+
+Usage:
+    flappy_bird_gym evaluate --models PPO_flappy_Four_Obs.zip DQN_flappy.zip
+        --envs FlappyBird-v3 FlappyBird-v0 [--episodes 100] [--json out.json]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+#: Percentiles of the scores reported for each evaluation.
+PERCENTILES = (10, 25, 75, 90)
+
+#: Default maximum length of an episode. Longer episodes are cut (and counted
+#: as truncated), so policies that never crash still finish.
+DEFAULT_MAX_STEPS = 10000
+
+#: `stable-baselines3` algorithms that can load the models, by name.
+ALGORITHMS = ("PPO", "A2C", "DQN")
+
+#: Columns of the CSV reports.
+CSV_COLUMNS = ("model", "env", "episodes", "truncated", "score_mean",
+               "score_std", "score_median",
+               *(f"score_p{p}" for p in PERCENTILES), "score_min",
+               "score_max", "length_mean", "return_mean", "steps",
+               "wall_time", "steps_per_sec", "episodes_per_sec")
+
+
+def vector_env_id(env_id: str) -> str:
+    """ Returns the ID of the vectorized version of an environment (e.g.
+    "FlappyBird-vec-v3" for "FlappyBird-v3"). IDs of vector environments are
+    returned unchanged. """
+    if "-vec-" in env_id:
+        return env_id
+    return re.sub(r"-v(\d+)$", r"-vec-v\1", env_id)
+
+
+def infer_algorithm(path: str) -> str:
+    """ Infers the `stable-baselines3` algorithm of a model, from the prefix of
+    its file name (e.g. "PPO_flappy.zip") or, if there's none, from the
+    module of its policy (DQN policies have their own module; actor-critic
+    policies are assumed to be PPO's). """
+    prefix = os.path.basename(path).split("_")[0].upper()
+    if prefix in ALGORITHMS:
+        return prefix
+
+    with zipfile.ZipFile(path) as archive:
+        data = json.loads(archive.read("data"))
+    module = data.get("policy_class", {}).get("__module__", "")
+    return "DQN" if ".dqn." in module else "PPO"
+
+
+def load_model(path: str, algo: Optional[str] = None) -> Any:
+    """ Loads a `stable-baselines3` model (which requires `stable-baselines3`
+    and PyTorch).
+
+    Args:
+        path (str): Path of the model's zip file.
+        algo (Optional[str]): Name of the model's algorithm (see
+            :data:`ALGORITHMS`). If `None`, it's inferred (see
+            :func:`infer_algorithm`).
+    """
+    import stable_baselines3
+
+    if algo is None:
+        algo = infer_algorithm(path)
+    if algo not in ALGORITHMS:
+        raise ValueError(f"Invalid algorithm: \"{algo}\"! "
+                         f"Available algorithms: {ALGORITHMS}.")
+    return getattr(stable_baselines3, algo).load(path, device="cpu")
+
+
+def run_episodes(policy: Any,
+                 env_id: str,
+                 episodes: int,
+                 num_envs: int = 64,
+                 seed: int = 0,
+                 max_steps: Optional[int] = DEFAULT_MAX_STEPS,
+                 deterministic: bool = True) -> Dict[str, Any]:
+    """ Plays `episodes` episodes with a policy and returns their statistics.
+
+    The episodes are split evenly among the `num_envs` games of the vectorized
+    version of the environment (each game plays a fixed number of episodes,
+    so long episodes don't bias the results).
+
+    Args:
+        policy (Any): Object with a `stable-baselines3`-style `predict(obs,
+            deterministic)` method, which receives the stacked observations
+            of all the games and returns their actions (as the first item of a
+            tuple).
+        env_id (str): ID of a registered environment (or of its vectorized
+            version; see :func:`vector_env_id`).
+        episodes (int): Number of episodes to play.
+        num_envs (int): Number of games played at once (no more than
+            `episodes` are used).
+        seed (int): Seed for the environment.
+        max_steps (Optional[int]): Maximum length of an episode. Longer
+            episodes are cut and counted as truncated. If `None`, episodes
+            only end when the player crashes.
+        deterministic (bool): Passed to the policy's `predict` method.
+
+    Returns:
+        A dictionary with the statistics (see :data:`CSV_COLUMNS`), plus the
+        score, length and return of each episode (`"scores"`, `"lengths"` and
+        `"returns"`).
+    """
+    if episodes < 1:
+        raise ValueError("At least 1 episode must be played!")
+
+    import flappy_bird_gym  # (registers the environments)
+    from gym.envs.registration import load, registry
+
+    vec_id = vector_env_id(env_id)
+    spec = (registry[vec_id] if isinstance(registry, dict)
+            else registry.spec(vec_id))
+    num_envs = max(1, min(num_envs, episodes))
+    env = load(spec.entry_point)(num_envs=num_envs, **(spec.kwargs or {}))
+
+    # (game `i` plays `targets[i]` episodes)
+    targets = np.array([(episodes + i) // num_envs for i in range(num_envs)])
+    counts = np.zeros(num_envs, dtype=np.int64)
+    lengths = np.zeros(num_envs, dtype=np.int64)
+    returns = np.zeros(num_envs)
+    scores, episode_lengths, episode_returns = [], [], []
+    truncated = 0
+    steps = 0
+
+    start = time.monotonic()
+    try:
+        obs = env.reset(seed=seed)
+        while (counts < targets).any():
+            actions = policy.predict(obs, deterministic=deterministic)[0]
+            obs, rewards, dones, info = env.step(actions)
+            steps += num_envs
+            lengths += 1
+            returns += rewards
+
+            cut = (~dones & (lengths >= max_steps) if max_steps is not None
+                   else np.zeros(num_envs, dtype=bool))
+            ended = dones | cut
+            recorded = ended & (counts < targets)
+            for i in np.flatnonzero(recorded):
+                scores.append(int(info["score"][i]))
+                episode_lengths.append(int(lengths[i]))
+                episode_returns.append(float(returns[i]))
+            counts += recorded
+            truncated += int((cut & recorded).sum())
+
+            if cut.any():
+                if hasattr(env, "reset_games"):
+                    obs = env.reset_games(cut)
+                else:
+                    # (the game can't be reset alone, so it stops counting)
+                    targets[cut] = counts[cut]
+            lengths[ended] = 0
+            returns[ended] = 0
+    finally:
+        env.close()
+    wall_time = time.monotonic() - start
+
+    scores = np.array(scores)
+    result = {
+        "env": env_id,
+        "episodes": len(scores),
+        "truncated": truncated,
+        "score_mean": float(scores.mean()),
+        "score_std": float(scores.std()),
+        "score_median": float(np.median(scores)),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(scores, PERCENTILES)):
+        result[f"score_p{p}"] = float(value)
+    result.update({
+        "score_min": int(scores.min()),
+        "score_max": int(scores.max()),
+        "length_mean": float(np.mean(episode_lengths)),
+        "return_mean": float(np.mean(episode_returns)),
+        "steps": steps,
+        "wall_time": wall_time,
+        "steps_per_sec": steps / wall_time,
+        "episodes_per_sec": len(scores) / wall_time,
+        "scores": scores.tolist(),
+        "lengths": episode_lengths,
+        "returns": episode_returns,
+    })
+    return result
+
+
+def _evaluate_model(model_path: str,
+                    env_id: str,
+                    algo: Optional[str],
+                    **kwargs) -> Dict[str, Any]:
+    """ Loads a model and evaluates it (run by the workers of the pool). """
+    try:
+        import torch
+        # (the parallelism comes from the pool)
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    result = run_episodes(load_model(model_path, algo), env_id, **kwargs)
+    return {"model": os.path.basename(model_path), **result}
+
+
+def evaluate(models: Sequence[str],
+             env_ids: Sequence[str],
+             episodes: int = 100,
+             num_envs: int = 64,
+             workers: Optional[int] = None,
+             seed: int = 0,
+             max_steps: Optional[int] = DEFAULT_MAX_STEPS,
+             algo: Optional[str] = None) -> List[Dict[str, Any]]:
+    """ Evaluates many models in parallel.
+
+    Args:
+        models (Sequence[str]): Paths of the models' zip files.
+        env_ids (Sequence[str]): IDs of the environments: either one per model
+            or a single one, used for all the models.
+        episodes (int): Number of episodes played with each model.
+        num_envs (int): Number of games played at once by each evaluation.
+        workers (Optional[int]): Number of processes of the pool. If `None`,
+            one per CPU core is used (but no more than the number of models).
+        seed (int): Seed for the environments (the same for all the models, so
+            they face the same pipes).
+        max_steps (Optional[int]): Maximum length of an episode (see
+            :func:`run_episodes`).
+        algo (Optional[str]): Algorithm of all the models. If `None`, it's
+            inferred for each model (see :func:`infer_algorithm`).
+
+    Returns:
+        The results of :func:`run_episodes` for each model, in order, with
+        the model's file name (`"model"`). Evaluations that fail have an
+        `"error"` instead of statistics.
+    """
+    if episodes < 1:
+        raise ValueError("At least 1 episode must be played!")
+    if len(env_ids) == 1:
+        env_ids = list(env_ids) * len(models)
+    if len(env_ids) != len(models):
+        raise ValueError("Either a single environment or one environment per "
+                         "model must be given!")
+
+    kwargs = {"episodes": episodes, "num_envs": num_envs, "seed": seed,
+              "max_steps": max_steps}
+    workers = min(workers or os.cpu_count() or 1, len(models))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_evaluate_model, model, env_id, algo,
+                                   **kwargs)
+                   for model, env_id in zip(models, env_ids)]
+        results = []
+        for model, env_id, future in zip(models, env_ids, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"model": os.path.basename(model),
+                                "env": env_id,
+                                "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def write_csv(results: Sequence[Dict[str, Any]], path: str) -> None:
+    """ Writes the statistics of the evaluations (without the per-episode
+    values) to a CSV file ("-" for stdout). """
+    file = sys.stdout if path == "-" else open(path, "w", newline="")
+    try:
+        writer = csv.DictWriter(file, fieldnames=[*CSV_COLUMNS, "error"],
+                                extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+    finally:
+        if file is not sys.stdout:
+            file.close()
+
+
+def _positive_int(value: str) -> int:
+    """ Parses a command line argument that must be a positive integer. """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """ Adds the evaluation's command line arguments to the given parser. """
+    parser.add_argument(
+        "--models", nargs="+", required=True, metavar="ZIP",
+        help="Paths of the models' zip files.",
+    )
+    parser.add_argument(
+        "--envs", nargs="+", required=True, metavar="ENV_ID",
+        help="Environment IDs: one per model or a single one for all.",
+    )
+    parser.add_argument(
+        "--algo", choices=ALGORITHMS, default=None,
+        help="Algorithm of the models. Inferred from each model by default.",
+    )
+    parser.add_argument(
+        "--episodes", type=_positive_int, default=100,
+        help="Number of episodes played with each model.",
+    )
+    parser.add_argument(
+        "--num-envs", type=int, default=64,
+        help="Number of games played at once by each evaluation.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of processes (defaults to the number of CPU cores).",
+    )
+    parser.add_argument(
+        "--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+        help="Maximum length of an episode (longer ones are truncated).",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--json", type=str, default=None, metavar="PATH",
+        help="Saves the results, with the score of each episode, as JSON to "
+             "the given path (\"-\" for stdout).",
+    )
+    parser.add_argument(
+        "--csv", type=str, default=None, metavar="PATH",
+        help="Saves the statistics as CSV to the given path (\"-\" for "
+             "stdout).",
+    )
+
+
+def main(args: Optional[argparse.Namespace] = None) -> List[Dict[str, Any]]:
+    """ Runs the evaluation with the parsed command line arguments and returns
+    the results. """
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_arguments(parser)
+        args = parser.parse_args()
+
+    start = time.monotonic()
+    results = evaluate(args.models, args.envs,
+                       episodes=args.episodes,
+                       num_envs=args.num_envs,
+                       workers=args.workers,
+                       seed=args.seed,
+                       max_steps=args.max_steps,
+                       algo=args.algo)
+    elapsed = time.monotonic() - start
+
+    to_stdout = "-" in (args.json, args.csv)
+    out = sys.stderr if to_stdout else sys.stdout
+    print(f"{'model':<30}{'env':<16}{'mean':>8}{'median':>8}"
+          f"{'p10':>7}{'p90':>7}{'max':>6}{'length':>9}{'steps/s':>11}",
+          file=out)
+    for result in results:
+        name = f"{result['model']:<30}{result['env']:<16}"
+        if "error" in result:
+            print(f"{name}  {result['error']}", file=out)
+            continue
+        print(f"{name}{result['score_mean']:>8.2f}"
+              f"{result['score_median']:>8.1f}{result['score_p10']:>7.1f}"
+              f"{result['score_p90']:>7.1f}{result['score_max']:>6}"
+              f"{result['length_mean']:>9.1f}"
+              f"{result['steps_per_sec']:>11,.0f}", file=out)
+    print(f"{len(results)} models evaluated in {elapsed:.1f} s", file=out)
+
+    if args.json is not None:
+        report = {"settings": {"episodes": args.episodes,
+                               "num_envs": args.num_envs,
+                               "seed": args.seed,
+                               "max_steps": args.max_steps},
+                  "wall_time": elapsed,
+                  "results": results}
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+    if args.csv is not None:
+        write_csv(results, args.csv)
+    return results
@@ -0,0 +1,578 @@
+""" Recording of trajectories into on-disk datasets.
+
+The recorders wrap an environment (a single environment or a vector
+environment) and stream every transition it makes into a dataset directory,
+for offline RL or behavior cloning. The dataset is columnar: each field of the
+transitions is stored, with a fixed dtype, in its own `.npy` file, split into
+shards of bounded size:
+
+    dataset/
+        index.json          (columns, shards and metadata)
+        00000/obs.npy       (observation before each step)
+        00000/action.npy
+        00000/reward.npy
+        00000/done.npy      (the game ended in the step)
+        00000/truncated.npy (the episode was cut, e.g. by `reset` or `close`)
+        00000/score.npy     (the game's score after the step)
+        00000/terminal_obs.npy
+        00001/...
+
+The observation after a step is the next row's observation (the row
+`num_envs` rows ahead, for vector environments), except for the last step of
+each episode, whose final observation is kept in the shard's `terminal_*`
+file. The dataset is read by :class:`TrajectoryDataset`, which memory-maps the
+shards, so random minibatches can be sampled from datasets larger than the
+RAM.
+
+The single environments can store snapshots of their games (see
+:meth:`.FlappyBirdLogic.get_state`) instead of, or along with, the
+observations. For RGB environments, this shrinks the dataset from hundreds of
+kilobytes to a few hundred bytes per step; the reader re-renders the frames on
+demand.
+
+Usage:
+    env = TrajectoryRecorder(flappy_bird_gym.make("FlappyBird-rgb-v0"),
+                             "dataset", store_obs=False, store_state=True)
+    ...
+    env.close()
+
+    dataset = TrajectoryDataset("dataset")
+    batch = dataset.sample(256)  # (with "obs" and "next_obs" re-rendered)
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import gym
+import numpy as np
+
+#: Version of the datasets' layout.
+FORMAT_VERSION = 1
+
+#: Default size, in bytes, of the columns of a shard.
+DEFAULT_SHARD_BYTES = 64 * 2 ** 20
+
+#: Dtypes of the columns that don't depend on the environment.
+_SCALAR_DTYPES = {
+    "action": np.int8,
+    "reward": np.float32,
+    "done": np.bool_,
+    "truncated": np.bool_,
+    "score": np.int32,
+}
+
+#: Columns whose value after the last step of an episode is kept in a
+#: `terminal_*` file.
+_STEP_COLUMNS = ("obs", "state")
+
+
+class TrajectoryWriter:
+    """ Writes transitions into a dataset directory, in shards.
+
+    The transitions are added in groups of `num_envs` (one per game, for
+    vector environments). The columns are allocated when the first group is
+    added, and each shard is written once it's full.
+
+    Args:
+        directory (str): Directory of the dataset (created if needed). An
+            existing dataset in it is overwritten.
+        num_envs (int): Number of transitions in each group.
+        shard_bytes (int): Maximum size, in bytes, of the columns of a shard
+            (at least one group is stored in each shard).
+        metadata (Optional[Dict[str, Any]]): Values stored in the dataset's
+            index (e.g. the environment's settings).
+    """
+
+    def __init__(self,
+                 directory: str,
+                 num_envs: int = 1,
+                 shard_bytes: int = DEFAULT_SHARD_BYTES,
+                 metadata: Optional[Dict[str, Any]] = None) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.num_envs = num_envs
+        self._shard_bytes = shard_bytes
+        self._metadata = dict(metadata or {})
+        self._columns = None
+        self._shard_rows = 0
+        self._rows = 0
+        # (row and values of each ended episode's last step, in any order)
+        self._terminals = []
+        self._shards = []
+        self._episodes = 0
+
+    def _allocate(self, columns: Dict[str, np.ndarray]) -> None:
+        """ Allocates the columns' buffers after the shapes and dtypes of the
+        first group. """
+        row_bytes = sum(value[0].nbytes for value in columns.values())
+        groups = max(1, self._shard_bytes // (row_bytes * self.num_envs))
+        self._shard_rows = groups * self.num_envs
+        self._columns = {
+            name: np.zeros((self._shard_rows, *value.shape[1:]),
+                           dtype=value.dtype)
+            for name, value in columns.items()
+        }
+
+    def append(self,
+               action: np.ndarray,
+               reward: np.ndarray,
+               done: np.ndarray,
+               score: np.ndarray,
+               obs: Optional[np.ndarray] = None,
+               state: Optional[np.ndarray] = None) -> None:
+        """ Adds a group of transitions.
+
+        Args:
+            action (np.ndarray): The actions taken.
+            reward (np.ndarray): The rewards received.
+            done (np.ndarray): Whether the games ended.
+            score (np.ndarray): The games' scores after the step.
+            obs (Optional[np.ndarray]): The observations before the step.
+            state (Optional[np.ndarray]): The snapshots of the games before the
+                step (`uint8` arrays).
+        """
+        scalars = {"action": action, "reward": reward, "done": done,
+                   "truncated": False, "score": score}
+        columns = {name: np.asarray(value)
+                   for name, value in (("obs", obs), ("state", state))
+                   if value is not None}
+        for name, dtype in _SCALAR_DTYPES.items():
+            columns[name] = np.broadcast_to(
+                np.asarray(scalars[name], dtype=dtype), (self.num_envs,))
+
+        if self._columns is None:
+            self._allocate(columns)
+        elif self._rows == self._shard_rows:
+            # (the shard is only written when the next group arrives, so the
+            # last group can still be ended by `end_episodes`)
+            self._flush()
+
+        rows = slice(self._rows, self._rows + self.num_envs)
+        for name, buffer in self._columns.items():
+            buffer[rows] = columns[name]
+        self._rows += self.num_envs
+
+    def end_episodes(self,
+                     mask: np.ndarray,
+                     obs: Optional[np.ndarray] = None,
+                     state: Optional[np.ndarray] = None,
+                     truncated: bool = False) -> None:
+        """ Ends the episodes of the games selected by `mask`, whose last
+        transitions are in the last group added.
+
+        Args:
+            mask (np.ndarray): Boolean array selecting the games.
+            obs (Optional[np.ndarray]): The games' final observations (only
+                the selected rows are read).
+            state (Optional[np.ndarray]): The games' final snapshots.
+            truncated (bool): Whether the episodes were cut (instead of ending
+                with the games).
+        """
+        base = self._rows - self.num_envs
+        for i in np.flatnonzero(mask):
+            if truncated:
+                self._columns["truncated"][base + i] = True
+            values = {"obs": obs, "state": state}
+            self._terminals.append((base + i, {
+                name: np.array(value[i]) for name, value in values.items()
+                if value is not None and name in self._columns
+            }))
+            self._episodes += 1
+
+    def _flush(self) -> None:
+        """ Writes the current shard and the index. """
+        if self._rows == 0:
+            return
+
+        shard_dir = os.path.join(self.directory, f"{len(self._shards):05d}")
+        os.makedirs(shard_dir, exist_ok=True)
+        for name, buffer in self._columns.items():
+            np.save(os.path.join(shard_dir, f"{name}.npy"),
+                    buffer[:self._rows])
+
+        self._terminals.sort(key=lambda terminal: terminal[0])
+        for name in _STEP_COLUMNS:
+            if name in self._columns:
+                buffer = self._columns[name]
+                values = np.zeros((len(self._terminals), *buffer.shape[1:]),
+                                  dtype=buffer.dtype)
+                for j, (_, terminal) in enumerate(self._terminals):
+                    values[j] = terminal[name]
+                np.save(os.path.join(shard_dir, f"terminal_{name}.npy"),
+                        values)
+
+        self._shards.append({"rows": self._rows,
+                             "terminals": len(self._terminals)})
+        self._rows = 0
+        self._terminals = []
+        self._write_index()
+
+    def _write_index(self) -> None:
+        index = {
+            "format": FORMAT_VERSION,
+            "num_envs": self.num_envs,
+            "columns": {
+                name: {"dtype": buffer.dtype.str,
+                       "shape": list(buffer.shape[1:])}
+                for name, buffer in (self._columns or {}).items()
+            },
+            "shards": self._shards,
+            "transitions": sum(shard["rows"] for shard in self._shards),
+            "episodes": self._episodes,
+            **self._metadata,
+        }
+        path = os.path.join(self.directory, "index.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(index, file, indent=2)
+        # (readers never see a partially written index)
+        os.replace(path + ".tmp", path)
+
+    def close(self) -> None:
+        """ Writes the last shard and the index. """
+        self._flush()
+        self._write_index()
+
+
+def _env_metadata(env: Any, env_kwargs: Optional[Dict[str, Any]]) -> Dict:
+    """ Returns the metadata of a recorded environment: its ID, its class and
+    the arguments it was created with (so the reader can re-create it). """
+    spec = getattr(env, "spec", None)
+    if env_kwargs is None:
+        env_kwargs = dict(getattr(spec, "kwargs", None) or {})
+    unwrapped = env.unwrapped
+    return {
+        "env_id": getattr(spec, "id", None),
+        "entry_point": (f"{type(unwrapped).__module__}:"
+                        f"{type(unwrapped).__qualname__}"),
+        "env_kwargs": env_kwargs,
+    }
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """ Records the transitions of a single environment into a dataset (see
+    :class:`TrajectoryWriter`).
+
+    The episode in progress is recorded as truncated when the environment is
+    reset before the game ends and when the recorder is closed, which writes
+    the dataset's last shard.
+
+    Args:
+        env (gym.Env): The environment (any of the package's single
+            environments).
+        directory (str): Directory of the dataset.
+        store_obs (bool): Whether to store the observations.
+        store_state (bool): Whether to store the snapshots of the games (see
+            :meth:`.FlappyBirdLogic.get_state`), from which the reader can
+            re-create the observations.
+        shard_bytes (int): Maximum size, in bytes, of the columns of a shard.
+        env_kwargs (Optional[Dict[str, Any]]): Arguments the environment was
+            created with, stored in the dataset's index. Defaults to the
+            arguments in the environment's spec.
+    """
+
+    def __init__(self,
+                 env: gym.Env,
+                 directory: str,
+                 store_obs: bool = True,
+                 store_state: bool = False,
+                 shard_bytes: int = DEFAULT_SHARD_BYTES,
+                 env_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        super().__init__(env)
+        if not store_obs and not store_state:
+            raise ValueError("Either the observations or the games' states "
+                             "must be stored!")
+        if store_state and not hasattr(env.unwrapped, "get_state"):
+            raise ValueError("The environment can't make snapshots of its "
+                             "games!")
+
+        self._store_obs = store_obs
+        self._store_state = store_state
+        self._writer = TrajectoryWriter(directory, num_envs=1,
+                                        shard_bytes=shard_bytes,
+                                        metadata=_env_metadata(env,
+                                                               env_kwargs))
+        self._obs = None
+        self._state = None
+        # (whether the last transition recorded is from an unfinished game)
+        self._pending = False
+
+    def _remember(self, obs: np.ndarray) -> None:
+        """ Keeps the current observation and state, which are recorded with
+        the next step. The observation is copied, since environments may
+        overwrite it in place. """
+        if self._store_obs:
+            self._obs = np.array(obs)[None]
+        if self._store_state:
+            state = self.env.unwrapped.get_state()
+            self._state = np.frombuffer(state, dtype=np.uint8)[None]
+
+    def reset(self, **kwargs) -> np.ndarray:
+        if self._pending:
+            self._writer.end_episodes(np.ones(1, dtype=bool), obs=self._obs,
+                                      state=self._state, truncated=True)
+            self._pending = False
+
+        obs = self.env.reset(**kwargs)
+        self._remember(obs)
+        return obs
+
+    def step(self, action) -> Tuple[np.ndarray, float, bool, Dict]:
+        obs, reward, done, info = self.env.step(action)
+        self._writer.append(action=int(action), reward=reward, done=done,
+                            score=info["score"], obs=self._obs,
+                            state=self._state)
+        self._remember(obs)
+        if done:
+            self._writer.end_episodes(np.ones(1, dtype=bool), obs=self._obs,
+                                      state=self._state)
+        self._pending = not done
+        return obs, reward, done, info
+
+    def close(self) -> None:
+        if self._pending:
+            self._writer.end_episodes(np.ones(1, dtype=bool), obs=self._obs,
+                                      state=self._state, truncated=True)
+            self._pending = False
+        self._writer.close()
+        self.env.close()
+
+
+class VecTrajectoryRecorder:
+    """ Records the transitions of a vector environment into a dataset (see
+    :class:`TrajectoryWriter`), one row per game on each step.
+
+    The final observations of the games that end are read from
+    `info["terminal_observation"]`. Only the observations are stored (vector
+    environments don't make snapshots of their games). Calls to
+    :meth:`reset` and :meth:`close` truncate the episodes in progress. Other
+    attributes are forwarded to the environment; transitions made through its
+    other methods (e.g. `step_games`) aren't recorded.
+
+    Args:
+        env (gym.vector.VectorEnv): The vector environment.
+        directory (str): Directory of the dataset.
+        shard_bytes (int): Maximum size, in bytes, of the columns of a shard.
+        env_kwargs (Optional[Dict[str, Any]]): Arguments the environment was
+            created with, stored in the dataset's index.
+    """
+
+    def __init__(self,
+                 env: gym.vector.VectorEnv,
+                 directory: str,
+                 shard_bytes: int = DEFAULT_SHARD_BYTES,
+                 env_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        self.env = env
+        self._writer = TrajectoryWriter(directory, num_envs=env.num_envs,
+                                        shard_bytes=shard_bytes,
+                                        metadata=_env_metadata(env,
+                                                               env_kwargs))
+        self._obs = None
+        self._pending = np.zeros(env.num_envs, dtype=bool)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.env, name)
+
+    def reset(self, **kwargs) -> np.ndarray:
+        if self._pending.any():
+            self._writer.end_episodes(self._pending, obs=self._obs,
+                                      truncated=True)
+            self._pending[:] = False
+
+        obs = self.env.reset(**kwargs)
+        self._obs = np.array(obs)
+        return obs
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                                 np.ndarray, Dict]:
+        obs, rewards, dones, info = self.env.step(actions)
+        self._writer.append(action=actions, reward=rewards, done=dones,
+                            score=info["score"], obs=self._obs)
+        if dones.any():
+            self._writer.end_episodes(dones,
+                                      obs=info["terminal_observation"])
+        self._obs = np.array(obs)
+        self._pending = ~dones
+        return obs, rewards, dones, info
+
+    def close(self, **kwargs) -> None:
+        if self._pending.any():
+            self._writer.end_episodes(self._pending, obs=self._obs,
+                                      truncated=True)
+            self._pending[:] = False
+        self._writer.close()
+        self.env.close(**kwargs)
+
+
+class TrajectoryDataset:
+    """ Reads a dataset written by the recorders.
+
+    The columns of the shards are memory-mapped, so only the rows that are
+    accessed are read from the disk.
+
+    Args:
+        directory (str): Directory of the dataset.
+
+    Attributes:
+        index (Dict[str, Any]): The dataset's index.
+        num_envs (int): Number of games recorded at once (the distance, in
+            rows, between consecutive transitions of a game).
+        columns (Tuple[str, ...]): Names of the stored columns.
+    """
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, "index.json")) as file:
+            self.index = json.load(file)
+        if self.index["format"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset format: "
+                             f"{self.index['format']}!")
+
+        self.num_envs = self.index["num_envs"]
+        self.columns = tuple(self.index["columns"])
+        self._shards = []
+        for i, shard in enumerate(self.index["shards"]):
+            shard_dir = os.path.join(directory, f"{i:05d}")
+            names = [*self.columns, *(f"terminal_{name}"
+                                      for name in _STEP_COLUMNS
+                                      if name in self.columns)]
+            self._shards.append({
+                name: np.load(os.path.join(shard_dir, f"{name}.npy"),
+                              mmap_mode="r")
+                for name in names
+            })
+        rows = [shard["rows"] for shard in self.index["shards"]]
+        self._offsets = np.concatenate([[0], np.cumsum(rows)]).astype(np.int64)
+        # (rows of the ended episodes' last steps, computed when needed)
+        self._ended_rows = [None] * len(self._shards)
+        self._env = None
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1])
+
+    def _locate(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the shard and the row in the shard of each index. """
+        shards = np.searchsorted(self._offsets, indices, side="right") - 1
+        return shards, indices - self._offsets[shards]
+
+    def _gather(self, name: str, indices: np.ndarray) -> np.ndarray:
+        """ Reads the values of a column at the given indices. """
+        column = self.index["columns"][name.replace("terminal_", "")]
+        out = np.empty((len(indices), *column["shape"]),
+                       dtype=np.dtype(column["dtype"]))
+        shards, rows = self._locate(indices)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            out[selected] = self._shards[shard][name][rows[selected]]
+        return out
+
+    def _ended(self, shard: int) -> np.ndarray:
+        """ Returns the rows of the shard where episodes ended. """
+        if self._ended_rows[shard] is None:
+            columns = self._shards[shard]
+            self._ended_rows[shard] = np.flatnonzero(
+                np.asarray(columns["done"]) | np.asarray(columns["truncated"])
+            )
+        return self._ended_rows[shard]
+
+    def _gather_next(self, name: str, indices: np.ndarray) -> np.ndarray:
+        """ Reads the values of a column after the steps at the given
+        indices (the next row of the game or the episode's final value). """
+        ended = (self._gather("done", indices)
+                 | self._gather("truncated", indices))
+        out = self._gather(name, np.where(ended, indices,
+                                          indices + self.num_envs))
+        if ended.any():
+            shards, rows = self._locate(indices[ended])
+            values = np.empty_like(out[ended])
+            for shard in np.unique(shards):
+                selected = shards == shard
+                ranks = np.searchsorted(self._ended(shard), rows[selected])
+                values[selected] = self._shards[shard][f"terminal_{name}"][
+                    ranks]
+            out[ended] = values
+        return out
+
+    def _valid(self, indices: np.ndarray) -> np.ndarray:
+        """ Checks which indices have a following observation (all of them,
+        unless the recording wasn't closed). """
+        tail = indices + self.num_envs >= len(self)
+        if not tail.any():
+            return ~tail
+        return ~tail | self._gather("done", indices) | self._gather(
+            "truncated", indices)
+
+    def get(self,
+            indices: Sequence[int],
+            render: Optional[bool] = None) -> Dict[str, np.ndarray]:
+        """ Returns the transitions at the given indices.
+
+        Args:
+            indices (Sequence[int]): Indices of the transitions.
+            render (Optional[bool]): Whether to re-create the observations
+                from the stored snapshots (see :meth:`observations`). If
+                `None`, they're re-created only if the observations weren't
+                stored.
+
+        Returns:
+            A dictionary with a batch of each column, plus the observations
+            (`"next_obs"`) and snapshots (`"next_state"`) after the steps.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        batch = {name: self._gather(name, indices) for name in self.columns}
+        for name in _STEP_COLUMNS:
+            if name in self.columns:
+                batch[f"next_{name}"] = self._gather_next(name, indices)
+
+        if render is None:
+            render = "obs" not in self.columns
+        if render:
+            batch["obs"] = self.observations(batch["state"])
+            batch["next_obs"] = self.observations(batch["next_state"])
+        return batch
+
+    def sample(self,
+               batch_size: int,
+               rng: Optional[np.random.Generator] = None,
+               render: Optional[bool] = None) -> Dict[str, np.ndarray]:
+        """ Returns a batch of transitions sampled uniformly (with
+        replacement; see :meth:`get`). """
+        if rng is None:
+            rng = np.random.default_rng()
+        indices = rng.integers(0, len(self), size=batch_size)
+        invalid = ~self._valid(indices)
+        while invalid.any():
+            indices[invalid] = rng.integers(0, len(self),
+                                            size=int(invalid.sum()))
+            invalid = ~self._valid(indices)
+        return self.get(indices, render=render)
+
+    def observations(self, states: np.ndarray) -> np.ndarray:
+        """ Re-creates the observations of the given snapshots, with a new
+        instance of the recorded environment (created with the recorded
+        arguments).
+
+        The observation of each snapshot is the one the environment returns
+        when the snapshot is restored (see `set_state`): stacked frames are
+        all copies of the snapshot's frame, and frames aren't max-pooled.
+        """
+        if self._env is None:
+            from gym.envs.registration import load
+            env = load(self.index["entry_point"])(**self.index["env_kwargs"])
+            env.reset()
+            self._env = env
+
+        obs = [np.array(self._env.set_state(state.tobytes()))
+               for state in states]
+        if not obs:
+            return np.empty((0, *self._env.observation_space.shape))
+        return np.stack(obs)
+
+    def close(self) -> None:
+        """ Closes the environment used to re-create the observations and
+        releases the memory maps. """
+        if self._env is not None:
+            self._env.close()
+            self._env = None
+        self._shards = []
@@ -0,0 +1,412 @@
+""" Asyncio server that hosts many Flappy Bird games for concurrent clients.
+
+The server owns a single vector environment (one of the registered
+`FlappyBird-vec-*` environments), with one game per client session. Clients
+send "reset" and "step" requests, either in-process (through the coroutines of
+a :class:`Session`) or over a local TCP or Unix socket (through a
+:class:`RemoteSession`). The requests of all the sessions are queued and
+executed in batches: a batch is run as soon as every open session has a request
+pending, or when the oldest pending request has waited for `max_delay`
+seconds, so that N latency-bound evaluators cost one vectorized step instead of
+N separate environment steps (and no extra processes).
+
+Socket protocol: each message is a JSON object on its own line. A client sends
+`{"cmd": "reset"}` or `{"cmd": "step", "action": a}` and receives `{"obs":
+[...]}` or `{"obs": [...], "reward": r, "done": d, "score": s}` (or `{"error":
+message}`). Each connection is a session.
+
+Usage:
+    flappy_bird_gym serve [--env FlappyBird-vec-v3] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+#: Default number of games hosted by a server.
+DEFAULT_CAPACITY = 256
+
+#: Default time, in seconds, a pending request waits for other sessions'
+#: requests before its batch is run.
+DEFAULT_MAX_DELAY = 0.002
+
+#: Result of a step: the observation, the reward, the done flag and the info
+#: dictionary.
+StepResult = Tuple[np.ndarray, float, bool, Dict[str, Any]]
+
+
+class Session:
+    """ A client's game in a :class:`FlappyBirdEnvServer`.
+
+    Each session owns one game of the server's vector environment and may have
+    one request pending at a time. Finished games aren't reset automatically:
+    :meth:`step` keeps returning `done=True` until :meth:`reset` is called.
+
+    Attributes:
+        slot (int): Index of the session's game in the vector environment.
+    """
+
+    def __init__(self, server: "FlappyBirdEnvServer", slot: int) -> None:
+        self._server = server
+        self.slot = slot
+        self.closed = False
+
+    async def reset(self) -> np.ndarray:
+        """ Starts a new game and returns its first observation. """
+        return await self._server._submit(self, "reset", 0)
+
+    async def step(self, action: int) -> StepResult:
+        """ Steps the game with the given action. """
+        return await self._server._submit(self, "step", int(action))
+
+    def close(self) -> None:
+        """ Releases the session's game. """
+        if not self.closed:
+            self.closed = True
+            self._server._release(self)
+
+
+class FlappyBirdEnvServer:
+    """ Hosts the games of many clients in a single vector environment and
+    batches their requests.
+
+    Must be used as an async context manager (or started by :meth:`start` and
+    stopped by :meth:`stop`) inside a running event loop.
+
+    Args:
+        env_id (str): ID of a registered vector environment (e.g.
+            "FlappyBird-vec-v3"), which defines the observations and rewards.
+        capacity (int): Maximum number of simultaneous sessions (the number of
+            games of the vector environment).
+        max_delay (float): Maximum time, in seconds, a request waits for the
+            requests of the other sessions before its batch is run.
+        seed (Optional[int]): Seed for the generator of the pipes' heights.
+        **env_kwargs: Other arguments of the vector environment (e.g.
+            `frame_skip`).
+
+    Attributes:
+        num_batches (int): Number of batches run so far.
+        num_requests (int): Number of requests executed so far.
+    """
+
+    def __init__(self,
+                 env_id: str = "FlappyBird-vec-v3",
+                 capacity: int = DEFAULT_CAPACITY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 seed: Optional[int] = None,
+                 **env_kwargs) -> None:
+        import flappy_bird_gym  # (registers the environments)
+        from gym.envs.registration import load, registry
+
+        spec = (registry[env_id] if isinstance(registry, dict)
+                else registry.spec(env_id))
+        env_cls = load(spec.entry_point)
+        if not hasattr(env_cls, "step_games"):
+            raise ValueError(f"\"{env_id}\" isn't a vector environment with "
+                             f"games that can be stepped separately!")
+
+        # (instantiated directly, without the wrappers added by `gym.make`)
+        self.env = env_cls(num_envs=capacity, seed=seed,
+                           **{**(spec.kwargs or {}), **env_kwargs})
+        self.env.reset()
+        self.capacity = capacity
+        self.max_delay = max_delay
+
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._sessions = set()
+        self._pending = {}
+        self._new_request = None
+        self._batch_task = None
+        self._servers = []
+        self.num_batches = 0
+        self.num_requests = 0
+
+    async def __aenter__(self) -> "FlappyBirdEnvServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        """ Starts the task that runs the batches. """
+        self._new_request = asyncio.Event()
+        self._batch_task = asyncio.create_task(self._run_batches())
+
+    async def stop(self) -> None:
+        """ Closes the sockets and stops the batching task (the pending
+        requests are cancelled). """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+
+        for _, _, future in self._pending.values():
+            future.cancel()
+        self._pending = {}
+
+    def connect(self) -> Session:
+        """ Opens a new in-process session. """
+        if not self._free_slots:
+            raise RuntimeError(f"The server is full (it hosts at most "
+                               f"{self.capacity} sessions)!")
+        session = Session(self, self._free_slots.pop())
+        self._sessions.add(session)
+        return session
+
+    def _release(self, session: Session) -> None:
+        """ Frees the game of a closed session. """
+        self._sessions.discard(session)
+        self._free_slots.append(session.slot)
+        request = self._pending.pop(session.slot, None)
+        if request is not None:
+            request[2].cancel()
+        # (the other sessions may be waiting for it)
+        if self._new_request is not None:
+            self._new_request.set()
+
+    def _submit(self, session: Session, kind: str,
+                action: int) -> "asyncio.Future":
+        """ Queues a request and returns the future of its result. """
+        if session.closed:
+            raise RuntimeError("The session is closed!")
+        if session.slot in self._pending:
+            raise RuntimeError("A session can only have one request pending!")
+        if self._batch_task is None:
+            raise RuntimeError("The server hasn't been started!")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[session.slot] = (kind, action, future)
+        self._new_request.set()
+        return future
+
+    async def _run_batches(self) -> None:
+        """ Waits for requests and runs them in batches. """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._new_request.wait()
+            self._new_request.clear()
+            if not self._pending:
+                continue
+
+            # waits for the other sessions, up to `max_delay`
+            deadline = loop.time() + self.max_delay
+            while len(self._pending) < len(self._sessions):
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._new_request.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                self._new_request.clear()
+
+            batch, self._pending = self._pending, {}
+            try:
+                self._run_batch(batch)
+            except Exception as ex:
+                for _, _, future in batch.values():
+                    if not future.done():
+                        future.set_exception(ex)
+
+    def _run_batch(self, batch: Dict[int, Tuple[str, int, Any]]) -> None:
+        """ Executes a batch of requests with (at most) one vectorized reset
+        and one vectorized step. """
+        reset_mask = np.zeros(self.capacity, dtype=bool)
+        step_mask = np.zeros(self.capacity, dtype=bool)
+        actions = np.zeros(self.capacity, dtype=np.int64)
+        for slot, (kind, action, _) in batch.items():
+            if kind == "reset":
+                reset_mask[slot] = True
+            else:
+                step_mask[slot] = True
+                actions[slot] = action
+
+        if reset_mask.any():
+            obs = self.env.reset_games(reset_mask)
+            for slot in np.flatnonzero(reset_mask):
+                _set_result(batch[slot][2], obs[slot])
+        if step_mask.any():
+            obs, rewards, dones, info = self.env.step_games(actions, step_mask)
+            scores = info["score"]
+            for slot in np.flatnonzero(step_mask):
+                _set_result(batch[slot][2], (obs[slot], float(rewards[slot]),
+                                             bool(dones[slot]),
+                                             {"score": int(scores[slot])}))
+
+        self.num_batches += 1
+        self.num_requests += len(batch)
+
+    async def _handle_connection(self,
+                                 reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+        """ Serves a socket connection as a session. """
+        session = None
+        try:
+            session = self.connect()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(await self._handle_message(session, line))
+                await writer.drain()
+        except (RuntimeError, ConnectionError) as ex:
+            writer.write(_encode({"error": str(ex)}))
+        finally:
+            if session is not None:
+                session.close()
+            writer.close()
+
+    async def _handle_message(self, session: Session, line: bytes) -> bytes:
+        """ Executes a request received through a socket and returns the
+        encoded response. """
+        try:
+            message = json.loads(line)
+            if message["cmd"] == "reset":
+                obs = await session.reset()
+                return _encode({"obs": obs.tolist()})
+            if message["cmd"] == "step":
+                obs, reward, done, info = await session.step(message["action"])
+                return _encode({"obs": obs.tolist(), "reward": reward,
+                                "done": done, "score": info["score"]})
+            raise ValueError(f"Invalid command: \"{message['cmd']}\"!")
+        except (ValueError, KeyError, TypeError) as ex:
+            return _encode({"error": f"{type(ex).__name__}: {ex}"})
+
+    async def listen(self,
+                     host: str = "127.0.0.1",
+                     port: int = 8765,
+                     path: Optional[str] = None) -> None:
+        """ Starts accepting connections on a TCP socket (or, if `path` is
+        given, on a Unix socket). Each connection is a session. """
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle_connection,
+                                                     path=path)
+        else:
+            server = await asyncio.start_server(self._handle_connection,
+                                                host=host, port=port)
+        self._servers.append(server)
+
+    def stats(self) -> Dict[str, float]:
+        """ Returns the number of open sessions, batches and requests, and the
+        mean number of requests per batch. """
+        return {"sessions": len(self._sessions),
+                "batches": self.num_batches,
+                "requests": self.num_requests,
+                "mean_batch_size": (self.num_requests
+                                    / max(self.num_batches, 1))}
+
+
+def _set_result(future: "asyncio.Future", result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message).encode() + b"\n"
+
+
+class RemoteSession:
+    """ A session in a :class:`FlappyBirdEnvServer` running in another process,
+    connected through a socket. Has the same interface as :class:`Session`.
+
+    Created by :meth:`connect`.
+    """
+
+    def __init__(self,
+                 reader: asyncio.StreamReader,
+                 writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls,
+                      host: str = "127.0.0.1",
+                      port: int = 8765,
+                      path: Optional[str] = None) -> "RemoteSession":
+        """ Connects to a server's TCP socket (or, if `path` is given, to its
+        Unix socket). """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        self._writer.write(_encode(message))
+        await self._writer.drain()
+        response = json.loads(await self._reader.readline())
+        if "error" in response:
+            raise RuntimeError(f"Server error: {response['error']}")
+        return response
+
+    async def reset(self) -> np.ndarray:
+        """ Starts a new game and returns its first observation. """
+        response = await self._request({"cmd": "reset"})
+        return np.array(response["obs"], dtype=np.float32)
+
+    async def step(self, action: int) -> StepResult:
+        """ Steps the game with the given action. """
+        response = await self._request({"cmd": "step", "action": int(action)})
+        return (np.array(response["obs"], dtype=np.float32),
+                response["reward"], response["done"],
+                {"score": response["score"]})
+
+    async def close(self) -> None:
+        """ Closes the connection (and, with it, the session). """
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """ Adds the server's command line arguments to a parser. """
+    parser.add_argument("--env", default="FlappyBird-vec-v3",
+                        help="ID of the vector environment hosting the games.")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="Maximum number of simultaneous sessions.")
+    parser.add_argument("--max-delay-ms", type=float,
+                        default=1000 * DEFAULT_MAX_DELAY,
+                        help="Maximum time a request waits to be batched.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Host of the TCP socket.")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Port of the TCP socket.")
+    parser.add_argument("--unix", metavar="PATH", default=None,
+                        help="Listen on a Unix socket instead of TCP.")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for the pipes' heights.")
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """ Runs a server until it's cancelled. """
+    server = FlappyBirdEnvServer(args.env, capacity=args.capacity,
+                                 max_delay=args.max_delay_ms / 1000,
+                                 seed=args.seed)
+    async with server:
+        await server.listen(args.host, args.port, path=args.unix)
+        where = args.unix or f"{args.host}:{args.port}"
+        print(f"Serving {args.env} ({args.capacity} games) on {where}")
+        await asyncio.Event().wait()
+
+
+def main(args: Optional[argparse.Namespace] = None) -> None:
+    if args is None:
+        parser = argparse.ArgumentParser(description=__doc__)
+        add_arguments(parser)
+        args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass